@@ -0,0 +1,190 @@
+"""End-to-end benchmark of every read-mostly garden subcommand against the mock API.
+
+For each fleet scale a mock server (garden.mock_server) is started, every
+command below is run in a fresh interpreter, and wall time, API request
+count and peak RSS are reported.
+
+    python benchmarks/commands.py [--scales 10,1000,100000] [--latency-ms 2] [--paginate 500]
+                                 [--save results.json] [--compare results.json --tolerance 0.25]
+
+With --compare the run fails when any command got slower than the saved
+results by more than the tolerance, or made more requests than before.
+
+Editors are replaced by benchmarks' own script (see write_editor), and
+prompts are answered from INPUTS. Commands left out, and why:
+
+    monitor, log-* --follow, watch-* --follow   poll until interrupted; their single
+                                                polls are measured by dashboard --once,
+                                                log-* and watch-*
+    shell                                       interactive; it runs the commands above
+    add-*, remove-*, edit-pick, edit-action,    one request behind a series of prompts,
+    edit-worker, edit-package                   like edit-plant, which stands for them
+    on, off, enable, disable                    the same bulk code path as start and stop
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ENTRY_POINT = 'import sys; from garden.cli import cli; sys.argv[0] = "garden"; cli()'
+
+# Commands are run with --no-cache so every scale measures a cold fetch
+COMMANDS = [
+    ['list-plants'],
+    ['list-plants', '1'],
+    ['list-plants', '--output', 'jsonl'],
+    ['list-actions'],
+    ['list-workers'],
+    ['watch-plant', '1'],
+    ['watch-package', '1'],
+    ['watch-worker', '1'],
+    ['log-plants', '1,2,3', '200'],
+    ['log-packages', '1,2', '200'],
+    ['execute-action', '1', '--params-file', '{params_file}'],
+    ['stop', '1-10', '--rate', '0'],
+    ['start', '1-10', '--rate', '0'],
+    ['edit-plant', '1'],
+    ['edit-picks', '1'],
+    ['sync'],
+    ['who-uses', '1-100'],
+    ['who-uses', '1-100', '--offline'],
+    ['record', '--plant', '1-10', '--interval', '0.1', '--count', '3'],
+    ['history', '--plant', '1'],
+    ['history', '--plant', '1', 'metrics.m0', '--every', '1s'],
+    ['dashboard', '--plants', '1-20', '--once'],
+]
+
+# Answers to the prompts of commands that ask for input: Enter keeps each current value
+INPUTS = {
+    'edit-plant': '\n\n',
+}
+
+EDITOR_SCRIPT = """import sys
+import yaml
+
+path = sys.argv[-1]
+if path.endswith('.yml'):  # edit-picks: toggle a suffix on one path, so every run changes exactly one pick
+    with open(path) as f:
+        picks = yaml.safe_load(f)
+    paths = picks[0]['paths']
+    paths[0] = paths[0][:-len('.bench')] if paths[0].endswith('.bench') else paths[0] + '.bench'
+    with open(path, 'w') as f:
+        yaml.safe_dump(picks, f, sort_keys=False)
+"""
+
+
+def start_mock_server(plants, latency_ms, paginate=0):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'garden.mock_server', '--port', '0', '--plants', str(plants), '--latency-ms', str(latency_ms),
+         '--paginate', str(paginate)],
+        stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    match = re.search(r'(http://\S+)', line)
+    if not match:
+        process.kill()
+        raise RuntimeError(f'Mock server did not start: {line!r}')
+    return process, match.group(1)
+
+
+def run_command(args, env, input=None):
+    """Run one garden command, returning (wall_ms, request_count, peak_rss_mb, exit_code)."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', ENTRY_POINT, '--no-cache', '--count-requests', *args],
+                               stdin=subprocess.DEVNULL if input is None else subprocess.PIPE, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, env=env)
+    if input is not None:
+        process.stdin.write(input.encode())
+        process.stdin.close()
+    stderr = process.stderr.read().decode('utf-8', 'replace')
+    # wait4 gives this child's own peak RSS (in KiB on Linux)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall_ms = (time.perf_counter() - started) * 1000
+    match = re.search(r'API requests: (\d+)', stderr)
+    return wall_ms, int(match.group(1)) if match else None, usage.ru_maxrss / 1024, process.returncode
+
+
+def write_params_file(directory, url, rows=20):
+    """Write a JSONL params file matching action 1's parameters on the mock server."""
+    with urllib.request.urlopen(f'{url}/actions/1/') as response:
+        params = json.load(response)['params']
+    path = os.path.join(directory, 'params.jsonl')
+    with open(path, 'w') as f:
+        for row in range(rows):
+            f.write(json.dumps({param: f'{param}-{row}' for param in params}) + '\n')
+    return path
+
+
+def write_editor(directory):
+    """Write the stand-in for $EDITOR, returning the command that runs it."""
+    path = os.path.join(directory, 'editor.py')
+    with open(path, 'w') as f:
+        f.write(EDITOR_SCRIPT)
+    return f'{sys.executable} {path}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='10,1000,100000', help='comma-separated plant counts')
+    parser.add_argument('--latency-ms', type=float, default=2, help='latency the mock server adds per request')
+    parser.add_argument('--paginate', type=int, default=0, metavar='PAGE_SIZE', help='have the mock server paginate collections')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per command; the fastest is reported')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown with --compare (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'SCALE':>7}  {'COMMAND':<48} {'WALL ms':>9} {'REQS':>6} {'RSS MB':>8}")
+        for scale in [int(scale) for scale in args.scales.split(',')]:
+            server, url = start_mock_server(scale, args.latency_ms, args.paginate)
+            scale_dir = os.path.join(workdir, str(scale))  # A fresh snapshot and history per scale
+            env = dict(os.environ, GARDEN_API_URL=url, XDG_CACHE_HOME=scale_dir, GARDEN_HISTORY=os.path.join(scale_dir, 'history'),
+                       EDITOR=write_editor(workdir))
+            try:
+                params_file = write_params_file(workdir, url)
+                for command in COMMANDS:
+                    command = [arg.format(params_file=params_file) for arg in command]
+                    runs = [run_command(command, env, INPUTS.get(command[0])) for _ in range(args.repeat)]
+                    wall_ms = min(run[0] for run in runs)
+                    _, requests, rss_mb, exit_code = runs[-1]
+                    label = ' '.join(command).replace(params_file, 'PARAMS')
+                    key = f'{scale}:{label}'
+                    results[key] = {'wall_ms': round(wall_ms, 1), 'requests': requests, 'rss_mb': round(rss_mb, 1), 'exit_code': exit_code}
+
+                    notes = []
+                    if exit_code != 0:
+                        notes.append(f'exit {exit_code}')
+                    previous = baseline.get(key)
+                    if previous:
+                        if wall_ms > previous['wall_ms'] * (1 + args.tolerance):
+                            notes.append(f"SLOWER than {previous['wall_ms']} ms")
+                            failed = True
+                        if requests is not None and previous['requests'] is not None and requests > previous['requests']:
+                            notes.append(f"MORE REQUESTS than {previous['requests']}")
+                            failed = True
+                    print(f"{scale:>7}  {label:<48} {wall_ms:>9.1f} {requests if requests is not None else '-':>6} {rss_mb:>8.1f}  {' '.join(notes)}")
+            finally:
+                server.terminate()
+                server.wait()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
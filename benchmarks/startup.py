@@ -0,0 +1,73 @@
+"""Startup latency guard for the garden console script.
+
+Runs `garden --help` and `garden start --help` in fresh interpreters and
+reports the median wall time on top of a bare `python -c pass`, then breaks
+down `import garden.cli` with -X importtime. Exits non-zero when the overhead
+exceeds the budget or a heavy dependency is imported at startup.
+
+    python benchmarks/startup.py [--runs 15] [--budget-ms 100]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Loaded only by the commands that need them; importing any of these at startup is a regression
+LAZY_MODULES = ['requests', 'urllib3', 'yaml', 'tabulate']
+
+ENTRY_POINT = 'import sys; from garden.cli import cli; sys.argv[0] = "garden"; cli()'
+
+
+def time_command(argv, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def import_profile():
+    """Return {module: cumulative_us} from `python -X importtime -c 'import garden.cli'`."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import garden.cli'],
+                            check=True, capture_output=True, text=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        modules[name.strip()] = int(cumulative_us)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=100, help='Allowed startup time on top of a bare interpreter.')
+    args = parser.parse_args()
+
+    baseline_ms = time_command([sys.executable, '-c', 'pass'], args.runs)
+    print(f"python -c pass        median {baseline_ms:7.1f} ms")
+
+    failed = False
+    for command in (['--help'], ['start', '--help']):
+        median_ms = time_command([sys.executable, '-c', ENTRY_POINT, *command], args.runs)
+        overhead_ms = median_ms - baseline_ms
+        over = overhead_ms > args.budget_ms
+        failed |= over
+        print(f"garden {' '.join(command):<14} median {median_ms:7.1f} ms  +{overhead_ms:.1f} ms (budget {args.budget_ms:.0f} ms){'  OVER BUDGET' if over else ''}")
+
+    modules = import_profile()
+    print(f"import garden.cli     {modules.get('garden.cli', 0) / 1000:7.1f} ms cumulative")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        failed = True
+        print(f"Imported at startup but should be lazy: {', '.join(eager)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
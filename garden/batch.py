@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+
+MAX_IDS = 1_000_000  # Most IDs parse_ids expands to; guards against typos such as 1-100000000
+
+
+def read_param_rows(path, params):
+    """Read parameter sets for an action from a CSV (with a header row) or JSONL file.
+
+    Returns a list of (row_number, values, error) tuples. `values` holds the
+    parameter values in the action's order; `error` is set instead when the row
+    doesn't match the action definition.
+    """
+    import csv
+
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        with open(path, 'r') as f:
+            raw_rows = []
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    raw_rows.append((line_number, json.loads(line)))
+                except ValueError as e:
+                    raw_rows.append((line_number, e))
+    else:
+        with open(path, 'r', newline='') as f:
+            # Row numbers count the header as row 1, matching what a spreadsheet shows
+            raw_rows = [(line_number, row) for line_number, row in enumerate(csv.DictReader(f), start=2)]
+
+    return [(row_number, *validate_row(row, params)) for row_number, row in raw_rows]
+
+
+def validate_row(row, params):
+    """Check one parameter set against the action's parameter names, returning (values, error)."""
+    if isinstance(row, Exception):
+        return None, f'Invalid JSON: {row}'
+    if isinstance(row, list):
+        if len(row) != len(params):
+            return None, f'Expected {len(params)} values, got {len(row)}'
+        row = dict(zip(params, row))
+    if not isinstance(row, dict):
+        return None, 'Row must be an object or a list of values'
+
+    if None in row:
+        return None, 'More values than header columns'  # csv.DictReader files extra cells under None
+    unknown = sorted(set(row) - set(params))
+    if unknown:
+        return None, f"Unknown parameters: {', '.join(map(str, unknown))}"
+    values = []
+    for param in params:
+        value = row.get(param)
+        if value is None or str(value) == '':
+            return None, f"Missing value for parameter '{param}'"
+        # Values are sent comma-joined, so a comma inside one would shift the rest
+        if ',' in str(value):
+            return None, f"Value for parameter '{param}' contains a comma"
+        values.append(str(value))
+    return values, None
+
+
+def execute_path(action_id, values):
+    """The path that executes an action with parameter `values`, which are sent comma-joined."""
+    from urllib.parse import quote
+
+    return f'/actions/{action_id}/execute/?params={quote(",".join(values), safe=",")}'
+
+
+def never_sent(error):
+    """Whether a failed request provably never reached the server: no connection could be made to send it on."""
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False  # A read timeout: the server may be running the action right now
+    if error.request is None:
+        return True  # Raised by the client itself, e.g. while the circuit breaker is open
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)  # Refused or unresolvable, unlike a connection reset mid-request
+
+
+def execute_once(client, action_id, values, max_wait):
+    """Run an action once, returning (status_code, latency_ms, body, error, retry_in).
+
+    `retry_in` is None unless the action certainly didn't run: the request
+    never reached the server, or the server refused it with a 429, or a
+    503 with Retry-After. It then holds the seconds the server asked to
+    wait, capped at `max_wait`, or 0 if it didn't say.
+    """
+    import requests
+    from garden.retry import retry_after
+
+    execute_url = execute_path(action_id, values)
+    started = time.monotonic()
+    try:
+        # Executing twice runs the action twice, so retries are ours; and it's a write, so it goes to the primary
+        response = client.get(execute_url, idempotent=False, primary=True)
+    except requests.RequestException as e:
+        return None, round((time.monotonic() - started) * 1000, 1), None, str(e), 0 if never_sent(e) else None
+    latency_ms = round((time.monotonic() - started) * 1000, 1)
+    wait = retry_after(response, max_wait) if response.status_code in (429, 503) else None
+    if response.status_code == 429 and wait is None:
+        wait = 0
+    return response.status_code, latency_ms, response.text, None, wait
+
+
+def run_batch(client, action_id, params, rows, parallel, retries, emit):
+    """Execute every valid row through a bounded pool, calling `emit` with one result dict per row.
+
+    An action may only run once per row, so a row is retried (up to
+    `retries` more times, after a backoff delay from the client's retry
+    policy or the server's Retry-After) only when it certainly didn't run:
+    see execute_once. Any other failure is final, including read timeouts
+    and 502/504s, after which the action may well have run. Returns the
+    number of rows that ultimately failed.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    failed = 0
+    pending = []
+    for row_number, values, error in rows:
+        if error:
+            emit({'row': row_number, 'ok': False, 'status_code': None, 'latency_ms': None, 'attempts': 0, 'error': error})
+            failed += 1
+        else:
+            pending.append((row_number, values))
+
+    delays = client.retry.delays()
+    wait = 0
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        for attempt in range(1, retries + 2):
+            if attempt > 1:
+                time.sleep(max(next(delays), wait))
+            futures = {executor.submit(execute_once, client, action_id, values, client.retry.max_delay): (row_number, values)
+                       for row_number, values in pending}
+            retry = []
+            wait = 0
+            for future in as_completed(futures):
+                row_number, values = futures[future]
+                status_code, latency_ms, body, error, retry_in = future.result()
+                ok = status_code == 200
+                if not ok and attempt <= retries and retry_in is not None:
+                    retry.append((row_number, values))
+                    wait = max(wait, retry_in)
+                    continue
+                result = {
+                    'row': row_number,
+                    'params': dict(zip(params, values)),
+                    'ok': ok,
+                    'status_code': status_code,
+                    'latency_ms': latency_ms,
+                    'attempts': attempt,
+                }
+                if error:
+                    result['error'] = error
+                else:
+                    result['response'] = body
+                emit(result)
+                failed += not ok
+            pending = retry
+            if not pending:
+                break
+    return failed
+
+
+def parse_ids(tokens):
+    """Expand ID tokens such as '5', '1,2,3' and '10-40' into a sorted list of distinct IDs."""
+    ids = set()
+    for token in tokens:
+        for part in token.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                start, _, end = part.partition('-')
+                if not (start.isdigit() and end.isdigit()) or int(start) > int(end):
+                    raise ValueError(f"Invalid ID range '{part}'")
+                if int(end) - int(start) >= MAX_IDS - len(ids):
+                    raise ValueError(f"ID range '{part}' is too large; at most {MAX_IDS} IDs can be given")
+                ids.update(range(int(start), int(end) + 1))
+            elif part.isdigit():
+                ids.add(int(part))
+            else:
+                raise ValueError(f"Invalid ID '{part}'")
+    if len(ids) > MAX_IDS:
+        raise ValueError(f"Too many IDs; at most {MAX_IDS} can be given")
+    return sorted(ids)
+
+
+class RateLimiter:
+    """Spaces calls to wait() so that at most `rate` of them start per second, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        time.sleep(max(slot - now, 0))
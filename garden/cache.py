@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+# Stores between rescans of the cache directory, which pick up what other processes wrote or removed
+RESCAN_EVERY = 100
+
+# Seconds a cached response is served without asking the server, by path prefix.
+# The longest matching prefix wins.
+DEFAULT_TTLS = {
+    '/plants/': 30,
+    '/actions/': 300,
+    '/workers/': 60,
+}
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'garden')
+
+
+class ResponseCache:
+    """On-disk cache of GET responses keyed by URL, with TTLs, revalidation and LRU eviction.
+
+    The size of the cache is counted once and then kept up to date as
+    entries are written, with a rescan every RESCAN_EVERY stores, so
+    entries are only listed and sorted when the cache is over budget.
+    """
+
+    def __init__(self, directory=None, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self._size = None  # Bytes on disk as of the last scan plus this process's writes since; None until scanned
+        self._stores = 0
+
+    def ttl_for(self, path):
+        prefixes = [prefix for prefix in self.ttls if path.startswith(prefix)]
+        if not prefixes:
+            return 0
+        return self.ttls[max(prefixes, key=len)]
+
+    def _group_path(self, url_prefix):
+        return os.path.join(self.directory, hashlib.sha1(url_prefix.encode('utf-8')).hexdigest()[:16])
+
+    def _entry_path(self, url):
+        # Entries live in one directory per collection, so invalidating a collection never reads the others
+        return os.path.join(self._group_path(_collection_prefix(url)), hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def lookup(self, url):
+        """Return the stored entry for a URL, or None. Reading an entry marks it as recently used."""
+        entry_path = self._entry_path(url)
+        try:
+            with open(entry_path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry, path):
+        return time.time() - entry['stored_at'] < self.ttl_for(path)
+
+    def store(self, url, response):
+        """Store a successful response, evicting the least recently used entries if over budget. Returns the entry."""
+        entry = {
+            'url': url,
+            'stored_at': time.time(),
+            'status_code': response.status_code,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'body': response.text,
+        }
+        self._write(url, entry)
+        self._stores += 1
+        if self._size is None or self._stores >= RESCAN_EVERY:
+            self._scan()
+        if self._size > self.max_bytes:
+            self._evict()
+        return entry
+
+    def touch(self, url, entry):
+        """Mark a revalidated entry as fresh again."""
+        entry['stored_at'] = time.time()
+        self._write(url, entry)
+
+    def _write(self, url, entry):
+        import tempfile
+
+        entry_path = self._entry_path(url)
+        try:
+            directory = os.path.dirname(entry_path)
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see half an entry
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+                size = f.tell()
+            try:
+                size -= os.stat(entry_path).st_size  # Replacing an entry only adds the difference
+            except OSError:
+                pass
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            return  # The cache is best effort; a read-only or full disk just means no caching
+        if self._size is not None:
+            self._size += size
+
+    def _entries(self, directories=None):
+        if directories is None:
+            try:
+                directories = [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+            except OSError:
+                return []
+        paths = []
+        for directory in directories:
+            try:
+                paths.extend(entry.path for entry in os.scandir(directory) if entry.name.endswith('.json'))
+            except OSError:
+                continue
+        return paths
+
+    def _stat_entries(self):
+        entries = []
+        for entry_path in self._entries():
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        return entries
+
+    def _scan(self):
+        self._size = sum(size for _, size, _ in self._stat_entries())
+        self._stores = 0
+
+    def _evict(self):
+        entries = self._stat_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(entry_path)
+            except OSError:
+                pass
+            total -= size
+        self._size = total
+        self._stores = 0
+
+    def invalidate(self, url_prefix):
+        """Drop every entry whose URL starts with `url_prefix`.
+
+        A whole collection, such as 'http://host/plants/', goes without
+        reading a single entry; a narrower prefix only reads the entries of
+        its collection.
+        """
+        self._size = None  # Rescanned on the next store
+        collection = _collection_prefix(url_prefix)
+        if not url_prefix.startswith(collection):
+            directories = None  # Wider than one collection
+        elif url_prefix == collection:
+            for entry_path in self._entries([self._group_path(collection)]):
+                try:
+                    os.unlink(entry_path)
+                except OSError:
+                    pass
+            return
+        else:
+            directories = [self._group_path(collection)]
+        for entry_path in self._entries(directories):
+            try:
+                with open(entry_path, 'r') as f:
+                    url = json.load(f)['url']
+                if url.startswith(url_prefix):
+                    os.unlink(entry_path)
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def clear(self):
+        self._size = None
+        for entry_path in self._entries():
+            try:
+                os.unlink(entry_path)
+            except OSError:
+                pass
+
+
+def _collection_prefix(url):
+    """'http://host:8500/plants/5/data/' -> 'http://host:8500/plants/'."""
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    collection = parts.path.lstrip('/').split('/', 1)[0]
+    return f'{parts.scheme}://{parts.netloc}/{collection}/'
+
+
+def build_response(entry):
+    """Rebuild a requests.Response from a cache entry so callers can't tell the difference."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = entry['status_code']
+    response.url = entry['url']
+    response.encoding = 'utf-8'
+    response._content = entry['body'].encode('utf-8')
+    response.headers = CaseInsensitiveDict()
+    if entry.get('content_type'):
+        response.headers['Content-Type'] = entry['content_type']
+    if entry.get('etag'):
+        response.headers['ETag'] = entry['etag']
+    if entry.get('last_modified'):
+        response.headers['Last-Modified'] = entry['last_modified']
+    return response
+
+
+class MemoryCache:
+    """In-process layer over a ResponseCache, for long-lived sessions such as `garden shell`.
+
+    Entries follow the backing cache's TTLs and are dropped by the same
+    write invalidation, but hits skip the disk entirely.
+    """
+
+    def __init__(self, backing=None):
+        self.backing = backing or ResponseCache()
+        self.entries = {}
+
+    def ttl_for(self, path):
+        return self.backing.ttl_for(path)
+
+    def is_fresh(self, entry, path):
+        return self.backing.is_fresh(entry, path)
+
+    def lookup(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            entry = self.backing.lookup(url)
+            if entry is not None:
+                self.entries[url] = entry
+        return entry
+
+    def store(self, url, response):
+        self.entries[url] = self.backing.store(url, response)
+
+    def touch(self, url, entry):
+        self.backing.touch(url, entry)
+        self.entries[url] = entry
+
+    def invalidate(self, url_prefix):
+        for url in [url for url in self.entries if url.startswith(url_prefix)]:
+            del self.entries[url]
+        self.backing.invalidate(url_prefix)
+
+    def clear(self):
+        self.entries.clear()
+        self.backing.clear()
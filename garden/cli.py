@@ -1,51 +1,222 @@
+import time
+IMPORT_STARTED = time.perf_counter()  # For the 'startup' span of --timings
+
 import click
-import requests
-import tempfile
 import os
-import yaml
-from tabulate import tabulate
-from datetime import datetime, timezone
-from functools import reduce
-import operator
+import json
+import sys
+from garden.batch import RateLimiter, execute_path, parse_ids, read_param_rows, run_batch
+from garden.cache import MemoryCache, ResponseCache
+from garden.client import GardenClient, DEFAULT_POOL_SIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_CONCURRENCY, DEFAULT_PAGE_SIZE
+from garden.jsonstream import TruncatedJSONError, iter_response_items
+from garden.live import AdaptiveInterval, LiveView
+from garden.output import RecordWriter, output_option
+from garden.profile import tracer
+from garden.query import Column, ListingQuery
+from garden.retry import DEFAULT_BREAKER_THRESHOLD, DEFAULT_RETRIES
+from garden.table import SAMPLE_ROWS, echo_table, iter_plain_table
 
 API_BASE_URL = 'http://192.168.101.5:8500'  # Adjust the base URL as needed
+BULK_THRESHOLD = 20  # Resolve plants from a single /plants/ listing above this many distinct IDs
+CONFIRM_ABOVE = 20  # Ask before updating more targets than this, unless --yes
+
+# Shared connection pool used by every command
+client = GardenClient(API_BASE_URL)
+
+# Group options that configure `client`; inside `garden shell` only those typed on a line change it
+CONNECTION_OPTIONS = ('api_url', 'profile', 'pool_size', 'connect_timeout', 'read_timeout', 'max_retries', 'breaker_threshold')
 
 @click.group()
-def cli():
+@click.option('--api-url', envvar='GARDEN_API_URL', help=f'Base URL of the Garden API; overrides the profile. [default: {API_BASE_URL}]')
+@click.option('--profile', envvar='GARDEN_API_PROFILE', help="Endpoint profile from ~/.config/garden/config.ini (or $GARDEN_CONFIG). [default: 'default' if present]")
+@click.option('--pool-size', type=int, default=DEFAULT_POOL_SIZE, envvar='GARDEN_POOL_SIZE', show_default=True, help='Maximum keep-alive connections to the API.')
+@click.option('--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT, envvar='GARDEN_CONNECT_TIMEOUT', show_default=True, help='Seconds to wait for a connection.')
+@click.option('--read-timeout', type=float, default=DEFAULT_READ_TIMEOUT, envvar='GARDEN_READ_TIMEOUT', show_default=True, help='Seconds to wait for a response.')
+@click.option('--max-retries', type=click.IntRange(min=0), default=DEFAULT_RETRIES, envvar='GARDEN_MAX_RETRIES', show_default=True, help='Retries for reads and other safe-to-repeat requests after connection errors, timeouts and 429/502/503/504.')
+@click.option('--breaker-threshold', type=click.IntRange(min=0), default=DEFAULT_BREAKER_THRESHOLD, envvar='GARDEN_BREAKER_THRESHOLD', show_default=True, help='Stop contacting the API for a while after this many failures in a row (0 to never stop).')
+@click.option('--count-requests', is_flag=True, help='Print the number of API requests made to stderr.')
+@click.option('--no-cache', is_flag=True, envvar='GARDEN_NO_CACHE', help='Bypass the on-disk response cache.')
+@click.option('--refresh', is_flag=True, help='Revalidate cached responses with the server before using them.')
+@click.option('--timings', is_flag=True, envvar='GARDEN_PROFILE', help='Print a timing breakdown (startup, each request, JSON decode, table build, render) to stderr.')
+@click.option('--trace', 'trace_path', type=click.Path(dir_okay=False), envvar='GARDEN_TRACE', help='Write the timing spans to this file in Chrome trace format.')
+@click.option('--cprofile', 'cprofile_path', type=click.Path(dir_okay=False), envvar='GARDEN_CPROFILE', help="Dump cProfile stats for the command to this file; '{command}' expands to the command name.")
+@click.pass_context
+def cli(ctx, api_url, profile, pool_size, connect_timeout, read_timeout, max_retries, breaker_threshold, count_requests, no_cache, refresh, timings, trace_path, cprofile_path):
     """Garden CLI tool."""
-    pass
-
-@cli.command('list-plants')
-@click.argument('plant_id', type=int, required=False)
-def list_plants(plant_id=None):
-    """List all plants or a single plant by ID."""
-    url = f'{API_BASE_URL}/plants/{plant_id}/' if plant_id else f'{API_BASE_URL}/plants/'
-    response = requests.get(url)
-    data = response.json()
+    # Inside `garden shell` the session's in-memory cache is passed down as ctx.obj
+    in_shell = isinstance(ctx.obj, MemoryCache)
+    settings = {'pool_size': pool_size, 'connect_timeout': connect_timeout, 'read_timeout': read_timeout,
+                'retries': max_retries, 'breaker_threshold': breaker_threshold}
+    given = set(CONNECTION_OPTIONS)
+    if in_shell:
+        # The shell keeps one client, and its keep-alive connections, for the session
+        from click.core import ParameterSource
+
+        given = {name for name in CONNECTION_OPTIONS if ctx.get_parameter_source(name) == ParameterSource.COMMANDLINE}
+        settings = {key: value for key, value in settings.items() if ('max_retries' if key == 'retries' else key) in given}
+    if given & {'api_url', 'profile'}:
+        # An explicit --api-url wins, then the profile's endpoints, then the built-in default
+        replicas, probe_path = [], '/'
+        if not api_url:
+            from garden.config import load_profile
+
+            try:
+                endpoints = load_profile(profile)
+            except ValueError as e:
+                raise click.UsageError(str(e))
+            if endpoints:
+                api_url, replicas, probe_path = endpoints['primary'], endpoints['replicas'], endpoints['probe']
+        settings.update(base_url=api_url or API_BASE_URL, replicas=replicas, probe_path=probe_path)
+    if settings:
+        client.configure(**settings)
+    client.request_count = 0
+    client.cache = None if no_cache else (ctx.obj if in_shell else ResponseCache())
+    client.refresh = refresh
+
+    tracer.enabled = timings or bool(trace_path)
+    if tracer.enabled:
+        if in_shell:
+            tracer.reset()  # Nothing was imported for this command
+        else:
+            tracer.reset(origin=IMPORT_STARTED)
+            tracer.add('startup', 'startup', IMPORT_STARTED, time.perf_counter())
+
+    profiler = None
+    if cprofile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def report():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path.replace('{command}', ctx.invoked_subcommand or 'garden'))
+        if count_requests:
+            click.echo(f"API requests: {client.request_count}", err=True)
+        if timings:
+            click.echo('\n'.join(tracer.summary()), err=True)
+        if trace_path:
+            tracer.write_chrome_trace(trace_path)
+
+    ctx.call_on_close(report)
+
+# Colours for plant and worker statuses in listings
+STATUS_COLORS = {'DOWN': 'red', 'STOP': 'yellow', 'ONLINE': 'cyan'}
+
+def page_options(command):
+    """--limit, --page-size and the --where/--sort/--fields query options for the listing commands."""
+    command = click.option('--limit', type=click.IntRange(min=1), help='Show at most this many entries.')(command)
+    command = click.option('--page-size', type=click.IntRange(min=1), default=DEFAULT_PAGE_SIZE, envvar='GARDEN_PAGE_SIZE', show_default=True,
+                           help='Entries requested per page from servers that paginate.')(command)
+    command = click.option('--fields', help='Comma-separated columns to show, in order, e.g. id,name,status.')(command)
+    command = click.option('--sort', help="Comma-separated columns to sort by; prefix one with '-' for descending, e.g. -since.")(command)
+    command = click.option('--where', multiple=True, help='Only entries matching FIELD=VALUE, FIELD!=VALUE, FIELD>N, FIELD<=N or FIELD~TEXT. Repeat to combine.')(command)
+    return command
+
+def listing_query(columns, where, sort, fields):
+    try:
+        return ListingQuery(columns, where, sort, fields)
+    except ValueError as e:
+        raise click.UsageError(str(e))
 
-    plants = [data] if plant_id else data
+def get_entry(path):
+    """GET one entry for a listing, reporting a failed request as a CLI error."""
+    response = client.get(path, cache=True)
+    if not response.ok:
+        raise click.ClickException(f'Failed to fetch {path}. Response Code: {response.status_code}')
+    return response.json()
 
-    table = []
-    for plant in plants:
-        # Determine the status display based on conditions
-        if plant['status'] == 'DOWN':
-            status = click.style(plant['status'], fg='red')
-        elif plant['status'] == 'STOP':
-            status = click.style(plant['status'], fg='yellow')
-        elif plant['status'] == 'ONLINE':
-            status = click.style(plant['status'], fg='cyan')
+def iter_collection(path, page_size=DEFAULT_PAGE_SIZE, limit=None, cache=True):
+    """client.iter_items, reporting a page that failed to load as a CLI error."""
+    import requests
 
-        # Use the provided 'since' value from the API
-        since_str = plant['since']
+    try:
+        yield from client.iter_items(path, page_size=page_size, limit=limit, cache=cache)
+    except requests.HTTPError as e:
+        raise click.ClickException(f'Failed to fetch {path}. Response Code: {e.response.status_code}')
+
+def offline_option(command):
+    return click.option('--offline', is_flag=True, envvar='GARDEN_OFFLINE',
+                        help='Answer from the local snapshot written by `garden sync` instead of the API.')(command)
+
+def open_store(collection):
+    """The local snapshot, to be closed by the caller, or a CLI error if `collection` was never synced into it."""
+    from garden.store import FleetStore, default_store_path
+
+    path = default_store_path()
+    store = FleetStore(path) if os.path.exists(path) else None
+    if store is None or store.sync_state(collection) is None:
+        if store is not None:
+            store.close()
+        raise click.ClickException(f"No {collection} in the local snapshot at {path} yet; run 'garden sync' first.")
+    return store
+
+def offline_entries(collection, query, entry_id=None):
+    """Entries for a listing from the local snapshot, narrowed by the query's equality conditions."""
+    store = open_store(collection)
+    if entry_id:
+        with store:
+            entry = store.get(collection, entry_id)
+        if entry is None:
+            raise click.ClickException(f"No entry {entry_id} in the local {collection} snapshot; run 'garden sync' to update it.")
+        return [entry]
+    return iter_stored(store, collection, query.equals())
+
+def iter_stored(store, collection, equals):
+    # The listing pulls entries lazily, so the store stays open until it is done with them
+    with store:
+        yield from store.iter_items(collection, equals)
+
+def print_listing(items, query, output, limit=None):
+    """Write matching entries as records or table lines while pages are still arriving."""
+    rows = query.apply(items, limit)
+    if output != 'table':
+        with tracer.span('render'):
+            RecordWriter(output, [header.lower() for header in query.headers]).write_many(rows)
+        return
 
-        table.append([plant['id'], plant['name'], plant['number_of_packages'], plant['number_of_fields'], status, since_str])
+    if query.sort_keys:
+        # Sorting already waited for the last page, so lay the table out from every row
+        with tracer.span('table build'):
+            table = list(rows)
+        with tracer.span('render'):
+            echo_table(table, query.headers, colors=query.colors)
+        return
+    # Widths come from the first SAMPLE_ROWS rows, so lines go out while later pages are still arriving
+    with tracer.span('render'):
+        echo_table(rows, query.headers, colors=query.colors, sample=SAMPLE_ROWS)
+
+# Rows stay raw; the renderer colours the status column as it writes each line
+PLANT_COLUMNS = [
+    Column('ID', 'id'),
+    Column('NAME', 'name'),
+    Column('WORKERS', 'number_of_packages'),
+    Column('FIELDS', 'number_of_fields'),
+    Column('STATUS', 'status', color=STATUS_COLORS.get),
+    Column('SINCE', 'since'),
+]
 
-    headers = ['ID', 'NAME', 'WORKERS', 'FIELDS', 'STATUS', 'SINCE']
-    click.echo(tabulate(table, headers=headers, tablefmt='plain'))
+@cli.command('list-plants')
+@click.argument('plant_id', type=int, required=False)
+@output_option
+@page_options
+@offline_option
+def list_plants(plant_id=None, output='table', page_size=DEFAULT_PAGE_SIZE, limit=None, where=(), sort=None, fields=None, offline=False):
+    """List all plants or a single plant by ID."""
+    query = listing_query(PLANT_COLUMNS, where, sort, fields)
+    if offline:
+        plants = offline_entries('plants', query, plant_id)
+    elif plant_id:
+        plants = [get_entry(f'/plants/{plant_id}/')]
+    else:
+        plants = iter_collection(query.path('/plants/'), page_size, query.fetch_limit(limit))
+    print_listing(plants, query, output, limit)
 
 @cli.command('add-plant')
 def add_plant():
     """Add a new plant by asking for details and using the default text editor."""
+    import tempfile
+
     # Ask for plant name and description
     plant_name = click.prompt("Please enter the plant's name")
     plant_description = click.prompt("Please enter the plant's description")
@@ -78,8 +249,8 @@ def add_plant():
         return
 
     # Send a POST request to the API to add the new plant
-    url = f'{API_BASE_URL}/plants/add/'
-    response = requests.post(url, json=new_plant_data)
+    url = '/plants/add/'
+    response = client.post(url, json=new_plant_data)
 
     if response.status_code in [200, 201]:
         click.echo(f"Plant '{new_plant_data.get('name')}' added successfully.")
@@ -90,8 +261,10 @@ def add_plant():
 @click.argument('plant_id', type=int)
 def edit_plant(plant_id):
     """Edit details of a plant without changing its ID, collect status, plant status, guid, or active status."""
-    url = f'{API_BASE_URL}/plants/{plant_id}/'
-    response = requests.get(url)
+    import tempfile
+
+    url = f'/plants/{plant_id}/'
+    response = client.get(url, primary=True)
     if response.status_code != 200:
         click.echo(f"Failed to fetch plant with ID {plant_id}. Status code: {response.status_code}, Response: {response.text}")
         return
@@ -130,7 +303,7 @@ def edit_plant(plant_id):
     headers = {'Content-Type': 'application/json'}
 
     # Use PATCH to update the plant, ensuring to include the content-type header
-    update_response = requests.patch(url + 'update/', json=updated_plant_data, headers=headers)
+    update_response = client.patch(url + 'update/', json=updated_plant_data, headers=headers)
     if update_response.status_code in [200, 204]:
         click.echo(f"Plant '{updated_plant_data.get('name')}' updated successfully.")
     else:
@@ -140,43 +313,43 @@ def edit_plant(plant_id):
 @click.argument('plant_id', type=int)
 def remove_plant(plant_id):
     """Remove a plant from the database."""
-    url = f'{API_BASE_URL}/plants/{plant_id}/delete/'
-    response = requests.delete(url)
+    url = f'/plants/{plant_id}/delete/'
+    response = client.delete(url)
     if response.status_code in [200, 204]:
         click.echo(f"Plant ID {plant_id} removed successfully.")
     else:
         click.echo(f"Failed to remove plant ID {plant_id}. Status code: {response.status_code}, Response: {response.text}")
 
+ACTION_COLUMNS = [
+    Column('ID', 'id'),
+    Column('GROUP', 'group'),
+    Column('NAME', 'name'),
+    Column('PARAMS', get=lambda action: len(action['params'])),  # The count of parameters
+    Column('STATUS', get=lambda action: 'ON' if action['status'] == 1 else 'OFF'),  # Human-readable status
+    Column('SINCE', 'last_status_change'),
+]
+
 @cli.command('list-actions')
 @click.argument('action_id', type=int, required=False)
-def list_actions(action_id=None):
+@output_option
+@page_options
+@offline_option
+def list_actions(action_id=None, output='table', page_size=DEFAULT_PAGE_SIZE, limit=None, where=(), sort=None, fields=None, offline=False):
     """List all actions or a single action by ID."""
-    url = f'{API_BASE_URL}/actions/{action_id}/' if action_id else f'{API_BASE_URL}/actions/'
-    response = requests.get(url)
-    data = response.json()
-
-    actions = [data] if action_id else data
-
-    table = []
-    for action in actions:
-        params_count = len(action['params'])  # Get the count of parameters
-        status_display = 'ON' if action['status'] == 1 else 'OFF'  # Convert status to human-readable form
-
-        table.append([
-            action['id'],
-            action['group'],
-            action['name'],
-            params_count,  # Display the count of params here
-            status_display,
-            action['last_status_change']
-        ])
-
-    headers = ['ID', 'GROUP', 'NAME', 'PARAMS', 'STATUS', 'SINCE']  # Add 'PARAMS' to headers
-    click.echo(tabulate(table, headers=headers, tablefmt='plain'))
+    query = listing_query(ACTION_COLUMNS, where, sort, fields)
+    if offline:
+        actions = offline_entries('actions', query, action_id)
+    elif action_id:
+        actions = [get_entry(f'/actions/{action_id}/')]
+    else:
+        actions = iter_collection(query.path('/actions/'), page_size, query.fetch_limit(limit))
+    print_listing(actions, query, output, limit)
 
 @cli.command('add-action')
 def add_action():
     """Add a new action by asking for details and allowing for individual parameter entry."""
+    import tempfile
+
     action_group = click.prompt("Please enter the action's group")
     action_name = click.prompt("Please enter the action's name")
     action_description = click.prompt("Please enter the action's description")
@@ -214,8 +387,8 @@ def add_action():
     }
 
     # Send a POST request to the API to add the new action
-    url = f'{API_BASE_URL}/actions/'
-    response = requests.post(url, json=new_action_data)
+    url = '/actions/'
+    response = client.post(url, json=new_action_data)
 
     if response.status_code in [200, 201]:
         click.echo(f"Action '{new_action_data.get('name')}' added successfully.")
@@ -226,9 +399,11 @@ def add_action():
 @click.argument('action_id', type=int)
 def edit_action(action_id):
     """Edit an existing action's details including parameters and code."""
+    import tempfile
+
     # Fetch the existing action data
-    url = f'{API_BASE_URL}/actions/{action_id}/'
-    response = requests.get(url)
+    url = f'/actions/{action_id}/'
+    response = client.get(url, primary=True)
     if response.status_code != 200:
         click.echo(f"Failed to fetch action with ID {action_id}. Status code: {response.status_code}, Response: {response.text}")
         return
@@ -279,7 +454,7 @@ def edit_action(action_id):
     }
 
     # Send the update request to the API
-    update_response = requests.patch(url, json=updated_action_data)
+    update_response = client.patch(url, json=updated_action_data)
     if update_response.status_code in [200, 204]:
         click.echo(f"Action '{updated_action_data.get('name')}' updated successfully.")
     else:
@@ -289,8 +464,8 @@ def edit_action(action_id):
 @click.argument('action_id', type=int)
 def remove_action(action_id):
     """Remove an action."""
-    url = f'{API_BASE_URL}/actions/{action_id}/'
-    response = requests.delete(url)
+    url = f'/actions/{action_id}/'
+    response = client.delete(url)
     if response.status_code in [200, 204]:
         click.echo(f"Action ID {action_id} removed successfully.")
     else:
@@ -298,11 +473,17 @@ def remove_action(action_id):
 
 @cli.command('execute-action')
 @click.argument('action_id', type=int)
-def execute_action(action_id):
-    """Execute an action by its ID with user-provided parameters."""
+@click.option('--params-file', type=click.Path(exists=True, dir_okay=False), help='CSV (with a header row of parameter names) or JSONL file with one parameter set per row.')
+@click.option('--parallel', type=click.IntRange(min=1), default=4, show_default=True, help='Executions in flight at once with --params-file.')
+@click.option('--retries', type=click.IntRange(min=0), default=2, show_default=True, help="Times to retry rows that certainly didn't run (connection refused, 429, or 503 with Retry-After) with --params-file.")
+def execute_action(action_id, params_file, parallel, retries):
+    """Execute an action by its ID with user-provided parameters.
+
+    With --params-file every row is executed and one JSON result line is printed per row.
+    """
     # Fetch the action details to get the required parameters
-    url = f'{API_BASE_URL}/actions/{action_id}/'
-    response = requests.get(url)
+    url = f'/actions/{action_id}/'
+    response = client.get(url)
     if response.status_code != 200:
         click.echo(f"Failed to fetch action with ID {action_id}. Status code: {response.status_code}, Response: {response.text}")
         return
@@ -310,6 +491,17 @@ def execute_action(action_id):
     action_data = response.json()
     params = action_data['params']
 
+    if params_file:
+        rows = read_param_rows(params_file, params)
+        # Give every concurrent execution its own keep-alive connection
+        if parallel > client.pool_size:
+            client.configure(pool_size=parallel)
+        failed = run_batch(client, action_id, params, rows, parallel, retries,
+                           emit=lambda result: click.echo(json.dumps(result)))
+        if failed:
+            sys.exit(1)
+        return
+
     # Prompt for parameter values
     param_values = []
     for i, param in enumerate(params, start=1):
@@ -317,23 +509,51 @@ def execute_action(action_id):
         param_values.append(value)
 
     # Construct the URL with parameters for the execution endpoint
-    params_query = ",".join(param_values)
-    execute_url = f'{API_BASE_URL}/actions/{action_id}/execute/?params={params_query}'
+    execute_url = execute_path(action_id, param_values)
 
-    # Execute the action by sending a GET request to the execute URL
-    execute_response = requests.get(execute_url)
+    # Execute the action by sending a GET request to the execute URL; never retried, as that would run it twice
+    execute_response = client.get(execute_url, idempotent=False, primary=True)
     if execute_response.status_code == 200:
         click.echo("Action executed successfully.")
         click.echo(execute_response.text)
     else:
         click.echo(f"Failed to execute action. Status code: {execute_response.status_code}, Response: {execute_response.text}")
 
+def flatten_plant_data(data):
+    """Flatten /plants/{id}/data/ into (field, value) pairs, dropping the 'response.' prefix."""
+    rows = []
+    for key, value in data.items():
+        parts = key.split('.')
+        if parts[0] == 'response':
+            parts.pop(0)
+        full_key = '.'.join(parts)
+
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                rows.append((f"{full_key}.{sub_key}", sub_value))
+        else:
+            rows.append((full_key, value))
+    return rows
+
+def plant_data_table(data):
+    """Render plant data the way watch-plant prints it, one string per line."""
+    table = [[count, key, value] for count, (key, value) in enumerate(flatten_plant_data(data), start=1)]
+    # Apply bright green color to the values
+    return '\n'.join(iter_plain_table(table, ['', 'FIELD', 'VALUE'], colors=[None, None, lambda value: 'bright_green']))
+
 @cli.command('watch-plant')
 @click.argument('plant_id', type=int, required=True)
-def watch_plant(plant_id):
+@click.option('--follow', '-f', is_flag=True, help='Keep polling and update the values in place.')
+@click.option('--interval', type=click.FloatRange(min=0.1), default=1.0, show_default=True, help='Seconds between polls in --follow mode.')
+@output_option
+def watch_plant(plant_id, follow, interval, output):
     """Watch a specific plant by ID."""
-    url = f'{API_BASE_URL}/plants/{plant_id}/'
-    response = requests.get(url)
+    if output != 'table':
+        stream_plant_data(plant_id, follow, interval, RecordWriter(output, ['plant_id', 'field', 'value']))
+        return
+
+    url = f'/plants/{plant_id}/'
+    response = client.get(url)
 
     if response.status_code == 200:
         plant_data = response.json()
@@ -346,36 +566,17 @@ def watch_plant(plant_id):
         click.echo()
 
         # Fetch plant data
-        url = f'{API_BASE_URL}/plants/{plant_id}/data/'
-        response = requests.get(url)
+        url = f'/plants/{plant_id}/data/'
+        response = client.get(url)
 
         if response.status_code == 200:
-            data = response.json()
-
-            table = []
-            count = 1
-
-            for key, value in data.items():
-                parts = key.split('.')
-                if parts[0] == 'response':
-                    parts.pop(0)
-                full_key = '.'.join(parts)
-
-                if isinstance(value, dict):
-                    for sub_key, sub_value in value.items():
-                        full_sub_key = f"{full_key}.{sub_key}"
-                        # Apply bright green color to the value
-                        colored_value = click.style(str(sub_value), fg='bright_green')
-                        table.append([count, full_sub_key, colored_value])
-                        count += 1
-                else:
-                    # Apply bright green color to the value
-                    colored_value = click.style(str(value), fg='bright_green')
-                    table.append([count, full_key, colored_value])
-                    count += 1
-
+            if follow:
+                follow_plant_data(url, response, interval)
+                return
             # Print the table using tabulate without Click's echo, as echo might interfere with tabulate's formatting
-            print(tabulate(table, headers=['', 'FIELD', 'VALUE'], tablefmt='plain'))
+            data = response.json()
+            with tracer.span('render'):
+                print(plant_data_table(data))
         else:
             # Handle errors with styled message
             click.echo(click.style(f'Failed to fetch data for plant ID {plant_id}. Response Code: {response.status_code}', fg='red'))
@@ -383,14 +584,94 @@ def watch_plant(plant_id):
         # Handle errors with styled message
         click.echo(click.style(f'Failed to fetch plant information for plant ID {plant_id}. Response Code: {response.status_code}', fg='red'))
 
+def stream_plant_data(plant_id, follow, interval, writer):
+    """Write the plant's fields as records; with `follow`, keep polling and write only the values that change."""
+    import requests
+
+    url = f'/plants/{plant_id}/data/'
+    pacer = AdaptiveInterval(interval)
+    last = {}
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                response = client.get(url)
+                ok = response.status_code == 200
+            except requests.RequestException as e:
+                if not follow:
+                    raise
+                ok, response = False, None
+                click.echo(f'Request failed: {e}', err=True)
+            elapsed = time.monotonic() - started
+
+            if ok:
+                for key, value in flatten_plant_data(response.json()):
+                    if key not in last or last[key] != value:
+                        writer.write((plant_id, key, value))
+                        last[key] = value
+                writer.flush()
+            elif response is not None:
+                message = f'Failed to fetch data for plant ID {plant_id}. Response Code: {response.status_code}'
+                if not follow:
+                    raise click.ClickException(message)
+                click.echo(message, err=True)
+
+            if not follow:
+                return
+            time.sleep(pacer.update(elapsed, ok))
+    except KeyboardInterrupt:
+        pass
+
+def follow_plant_data(url, response, interval):
+    """Redraw the plant data table in place every `interval` seconds until interrupted."""
+    import requests
+    from datetime import datetime
+
+    view = LiveView()
+    pacer = AdaptiveInterval(interval)
+    table_lines = plant_data_table(response.json()).splitlines()
+    status = ''
+    try:
+        while True:
+            if view.interactive:
+                view.update(table_lines + ['', status])
+            else:
+                view.update(table_lines)
+
+            started = time.monotonic()
+            try:
+                response = client.get(url)
+                ok = response.status_code == 200
+            except requests.RequestException as e:
+                ok, response = False, None
+                status = click.style(f'Request failed: {e}', fg='red')
+            elapsed = time.monotonic() - started
+
+            if ok:
+                table_lines = plant_data_table(response.json()).splitlines()
+                status = f"Updated {datetime.now().strftime('%H:%M:%S')} ({elapsed * 1000:.0f} ms)"
+            elif response is not None:
+                status = click.style(f'Failed to fetch data. Response Code: {response.status_code}', fg='red')
+            time.sleep(pacer.update(elapsed, ok))
+    except KeyboardInterrupt:
+        pass
+
 @cli.command('watch-package')
 @click.argument('package_id', type=int, required=True)
-def watch_package(package_id):
+@output_option
+def watch_package(package_id, output='table'):
     """Watch a specific package by ID."""
-    url = f'{API_BASE_URL}/package/{package_id}/'
-    response = requests.get(url)
-
-    if response.status_code == 200:
+    url = f'/package/{package_id}/'
+    response = client.get(url)
+
+    if response.status_code == 200 and output != 'table':
+        writer = RecordWriter(output, ['pick_id', 'plant_id', 'field', 'value'])
+        with tracer.span('render'):
+            for pick_id, pick_data in response.json()['picks'].items():
+                for key, value in pick_data['data'].items():
+                    writer.write((pick_id, pick_data['plant_id'], key, value))
+            writer.flush()
+    elif response.status_code == 200:
         data = response.json()
 
         # Display package information
@@ -401,209 +682,628 @@ def watch_package(package_id):
         click.echo()
 
         # Display table with pick data
-        table = []
-        count = 1
-        for pick_id, pick_data in data['picks'].items():
-            plant_id = pick_data['plant_id']
-            for key, value in pick_data['data'].items():
-                color = 'blue' if plant_id % 2 != 1 else None
-                table.append([count, click.style(str(plant_id), fg=color), key, click.style(str(value), fg='bright_green')])
-                count += 1
-
-        # Print the table with aligned fields
-        click.echo(tabulate(table, headers=['', 'PLANT', 'FIELD', 'VALUE'], tablefmt='plain', colalign=("right", "right", "left", "left")))
+        with tracer.span('table build'):
+            table = []
+            count = 1
+            for pick_id, pick_data in data['picks'].items():
+                plant_id = pick_data['plant_id']
+                for key, value in pick_data['data'].items():
+                    table.append([count, plant_id, key, value])
+                    count += 1
+
+        # Print the table with aligned fields; even plant IDs are blue, values bright green
+        with tracer.span('render'):
+            echo_table(table, ['', 'PLANT', 'FIELD', 'VALUE'], colalign=("right", "right", "left", "left"),
+                       colors=[None, lambda plant_id: 'blue' if plant_id % 2 != 1 else None, None, lambda value: 'bright_green'])
+    elif output != 'table':
+        raise click.ClickException(f'Failed to fetch data for package ID {package_id}. Response Code: {response.status_code}')
     else:
         click.echo(click.style(f'Failed to fetch data for package ID {package_id}. Response Code: {response.status_code}', fg='red'))
 
+def series_dir(kind, source_id):
+    """Where `garden record` keeps the history of one plant or package."""
+    from garden.timeseries import default_history_dir
+
+    return os.path.join(default_history_dir(), f'{kind}-{source_id}')
+
+def package_values(data):
+    """Flatten /package/{id}/ into field -> value, naming each field PICK_ID.FIELD."""
+    return {f'{pick_id}.{key}': value for pick_id, pick_data in data['picks'].items() for key, value in pick_data['data'].items()}
+
+@cli.command('record')
+@click.option('--plant', 'plant_ids', multiple=True, help='Plants whose data to record, e.g. 5, 1,2 or 10-40. Repeatable.')
+@click.option('--package', 'package_ids', multiple=True, help='Packages whose pick values to record. Repeatable.')
+@click.option('--interval', type=click.FloatRange(min=0.1), default=5.0, show_default=True, help='Seconds between samples.')
+@click.option('--count', type=click.IntRange(min=1), help='Stop after this many samples instead of running until interrupted.')
+def record(plant_ids, package_ids, interval, count):
+    """Sample plant data and package values at an interval into on-disk history, for `garden history`."""
+    import requests
+    from garden.timeseries import SeriesWriter, default_history_dir
+
+    try:
+        plant_ids, package_ids = parse_ids(plant_ids), parse_ids(package_ids)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    if not plant_ids and not package_ids:
+        raise click.UsageError('Give at least one --plant or --package to record.')
+    sources = {f'/plants/{plant_id}/data/': ('plant', plant_id) for plant_id in plant_ids}
+    sources.update({f'/package/{package_id}/': ('package', package_id) for package_id in package_ids})
+
+    writers = {}
+    try:
+        for path, (kind, source_id) in sources.items():
+            writers[path] = SeriesWriter(series_dir(kind, source_id))
+    except OSError as e:
+        for writer in writers.values():
+            writer.close()
+        raise click.ClickException(str(e))
+
+    click.echo(f"Recording {len(sources)} source{'s' if len(sources) != 1 else ''} every {interval:g}s "
+               f"into {default_history_dir()}; press Ctrl-C to stop.", err=True)
+    pacer = AdaptiveInterval(interval)
+    samples = 0
+    try:
+        while True:
+            started = time.monotonic()
+            timestamp = time.time() * 1000  # When the samples were asked for, not when the slowest answer came
+            try:
+                responses = client.get_many(list(sources))
+                ok = True
+            except requests.RequestException as e:
+                responses, ok = {}, False
+                click.echo(f'Request failed: {e}', err=True)
+            elapsed = time.monotonic() - started
+
+            for path, response in responses.items():
+                if response.status_code != 200:
+                    ok = False
+                    click.echo(f'Failed to fetch {path}. Response Code: {response.status_code}', err=True)
+                    continue
+                data = response.json()
+                values = dict(flatten_plant_data(data)) if sources[path][0] == 'plant' else package_values(data)
+                writers[path].append(timestamp, values)
+                writers[path].flush()
+            samples += 1
+            if count is not None and samples >= count:
+                break
+            time.sleep(pacer.update(elapsed, ok))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for writer in writers.values():
+            writer.close()
+    click.echo(f"Took {samples} sample{'s' if samples != 1 else ''}.", err=True)
+
+def format_ms(timestamp, timespec='seconds'):
+    from datetime import datetime
+
+    return datetime.fromtimestamp(timestamp / 1000).isoformat(sep=' ', timespec=timespec)
+
+@cli.command('history')
+@click.argument('field', required=False)
+@click.option('--plant', 'plant_id', type=int, help='Read the history of this plant.')
+@click.option('--package', 'package_id', type=int, help='Read the history of this package; fields are named PICK_ID.FIELD.')
+@click.option('--since', help='Start from this long ago, e.g. 15m, 2h or 7d, or from an ISO date/time.')
+@click.option('--until', help='End this long ago, or at an ISO date/time.')
+@click.option('--every', help='Aggregate into windows of this length, e.g. 1m or 1h, showing count, min, max and avg per window.')
+@output_option
+def history(field, plant_id, package_id, since, until, every, output):
+    """Show the values `garden record` stored for FIELD, raw or aggregated; without FIELD, list the recorded fields."""
+    from garden.timeseries import MISSING, SeriesReader, parse_duration, parse_time, windows
+
+    if (plant_id is None) == (package_id is None):
+        raise click.UsageError('Give exactly one of --plant or --package.')
+    kind, source_id = ('plant', plant_id) if plant_id is not None else ('package', package_id)
+    try:
+        start = parse_time(since) if since else None
+        end = parse_time(until) if until else None
+        every_ms = int(parse_duration(every) * 1000) if every else None
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if every_ms is not None and every_ms < 1:
+        raise click.UsageError('--every must be at least 1ms.')
+    try:
+        reader = SeriesReader(series_dir(kind, source_id))
+    except FileNotFoundError:
+        raise click.ClickException(f"Nothing recorded for {kind} {source_id}; run 'garden record --{kind} {source_id}' first.")
+    try:
+        if field is None:
+            first, timestamps = reader.timestamps(start, end)
+            rows = [[name, 'number' if info['type'] == 'f64' else 'text'] for name, info in reader.fields.items()]
+            if output != 'table':
+                RecordWriter(output, ['field', 'type']).write_many(rows)
+            else:
+                echo_table(rows, ['FIELD', 'TYPE'])
+                if len(timestamps):
+                    click.echo(f"{len(timestamps)} samples from {format_ms(timestamps[0])} to {format_ms(timestamps[-1])}.", err=True)
+            return
+
+        if field not in reader.fields:
+            known = ', '.join(list(reader.fields)[:20]) + (', ...' if len(reader.fields) > 20 else '')
+            raise click.UsageError(f"No field '{field}' recorded for {kind} {source_id}. Recorded fields: {known}")
+        with tracer.span('decode'):
+            first, timestamps = reader.timestamps(start, end)
+            values = reader.column(field)[first:first + len(timestamps)]
+        strings = reader.strings(field)
+
+        if every_ms is not None:
+            if strings is not None:
+                raise click.UsageError(f"'{field}' holds text; --every needs a numeric field.")
+            headers = ['START', 'COUNT', 'MIN', 'MAX', 'AVG']
+            rows = ([format_ms(start), count, low, high, mean] for start, count, low, high, mean in windows(timestamps, values, every_ms))
+        else:
+            headers = ['TIME', 'VALUE']
+            if strings is not None:
+                rows = ([format_ms(timestamp, 'milliseconds'), strings[code]] for timestamp, code in zip(timestamps, values) if code != MISSING)
+            else:
+                rows = ([format_ms(timestamp, 'milliseconds'), value] for timestamp, value in zip(timestamps, values) if value == value)
+
+        if output != 'table':
+            with tracer.span('render'):
+                RecordWriter(output, [header.lower() for header in headers]).write_many(rows)
+            return
+        with tracer.span('table build'):
+            table = list(rows)
+        with tracer.span('render'):
+            echo_table(table, headers)
+    finally:
+        reader.close()
+
+def dashboard_targets(kind, specs, interval, timeout):
+    """Targets from --plants/--packages values such as '1,2,5-30' or '5-30@10s/3s'."""
+    from garden.dashboard import Target
+    from garden.timeseries import parse_duration
+
+    targets = []
+    for spec in specs:
+        ids, _, pace = spec.partition('@')
+        every, _, limit = pace.partition('/')
+        try:
+            target_ids = parse_ids([ids])
+            target_interval = parse_duration(every) if every else interval
+            target_timeout = parse_duration(limit) if limit else timeout
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint=f'--{kind}s')
+        targets.extend(Target(kind, target_id, target_interval, target_timeout) for target_id in target_ids)
+    return targets
+
+@cli.command('dashboard')
+@click.option('--plants', 'plant_specs', multiple=True,
+              help='Plants to watch, e.g. 1,2,5-30. Append @INTERVAL or @INTERVAL/TIMEOUT to give a group its own pace, e.g. 5-30@10s/3s. Repeatable.')
+@click.option('--packages', 'package_specs', multiple=True, help='Packages to watch, with the same syntax as --plants.')
+@click.option('--interval', type=click.FloatRange(min=0.1), default=2.0, show_default=True, help='Seconds between polls of each target.')
+@click.option('--timeout', type=click.FloatRange(min=0.1), default=5.0, show_default=True, help='Seconds before a poll of a target counts as failed.')
+@click.option('--field', 'fields', multiple=True, help="Show this field's value for every target, e.g. metrics.m3. Repeatable; defaults to the first few fields.")
+@click.option('--rate', type=click.FloatRange(min=0, min_open=True), help='Start at most this many requests per second across all targets.')
+@click.option('--concurrency', type=click.IntRange(min=1), help='Requests in flight at once. [default: one per target]')
+@click.option('--once', is_flag=True, help='Poll every target once, print the grid and exit.')
+def dashboard(plant_specs, package_specs, interval, timeout, fields, rate, concurrency, once):
+    """Watch many plants and packages at once in a grid that refreshes in place."""
+    from garden.dashboard import Dashboard
+
+    targets = dashboard_targets('plant', plant_specs, interval, timeout) + dashboard_targets('package', package_specs, interval, timeout)
+    if not targets:
+        raise click.UsageError('Give at least one of --plants or --packages.')
+    in_flight = concurrency or len(targets)
+    if in_flight > client.pool_size:
+        client.configure(pool_size=in_flight)  # Every request in flight keeps its own keep-alive connection
+
+    def fetch(target):
+        # One attempt: retries would keep the thread busy past the target's timeout, and the next poll retries anyway
+        response = client.get(target.path, idempotent=False, timeout=(client.connect_timeout, target.timeout))
+        if response.status_code != 200:
+            raise RuntimeError(f'Response Code: {response.status_code}')
+        data = response.json()
+        return dict(flatten_plant_data(data)) if target.kind == 'plant' else package_values(data)
+
+    view = LiveView()
+    # Like click.echo, keep colour codes out of pipes and files
+    render = view.update if view.interactive else lambda lines: view.update([click.unstyle(line) for line in lines])
+    Dashboard(targets, fetch, render, fields, rate, in_flight).run(once)
+
+# Colors for alternating log entries
+LOG_COLORS = ['cyan', 'green']
+# List of colors for packages
+PACKAGE_COLORS = ['yellow', 'magenta', 'blue', 'red']  # Extend this list as needed
+
+def print_plant_log_hit(index, hit):
+    """Print one plant log hit; `index` drives the alternating colors."""
+    timestamp = hit['_source']['timestamp']
+    beat_id = hit['_source']['beat']
+    log_color = LOG_COLORS[index % 2]  # Alternate colors for each log
+
+    # Styling timestamp and beat ID with the chosen log color
+    styled_timestamp = click.style(f"Timestamp: {timestamp}", fg=log_color)
+    styled_beat_id = click.style(f"Beat ID: {beat_id}", fg=log_color)
+    print(f"{styled_timestamp}, {styled_beat_id}\nResponse:")
+
+    # Assuming the response now directly contains the plant log details
+    response = hit['_source']['response']
+    plant_color = 'yellow'  # You can change this as needed or make it dynamic
+
+    # Print each key-value pair within the response, applying color to the plant details
+    for key, value in response.items():
+        if key in ['plant_id', 'plant_name']:
+            styled_value = click.style(f"{key}: '{value}'", fg=plant_color)
+            print(f"  {styled_value}", end=', ')
+        else:
+            print(f"{key}: {value}", end=', ')
+    print("\n")  # Finish the line after each plant response
+
+def print_package_log_hit(index, hit):
+    """Print one package log hit; `index` drives the alternating colors."""
+    timestamp = hit['_source']['timestamp']
+    beat_id = hit['_source']['beat']
+    log_color = LOG_COLORS[index % 2]  # Alternate colors for each log
+
+    # Styling timestamp and beat ID with the chosen log color
+    styled_timestamp = click.style(f"Timestamp: {timestamp}", fg=log_color)
+    styled_beat_id = click.style(f"Beat ID: {beat_id}", fg=log_color)
+    print(f"{styled_timestamp}, {styled_beat_id}\n")
+
+    for package_index, package in enumerate(hit['_source']['packages']):
+        # Sequentially assign colors to packages based on their order
+        package_color = PACKAGE_COLORS[package_index % len(PACKAGE_COLORS)]
+        styled_package_id = click.style(f"Package ID: '{package['package_id']}' -", fg=package_color)
+        styled_package_name = click.style(f"Package Name: '{package['package_name']}'", fg=package_color)
+        print(f"  {styled_package_id} {styled_package_name}")
+
+        for pick in package['picks']:
+            # Print each pick with plant details and api fields, with added spacing for clarity
+            pick_details = f"    Pick ID: {pick['pick_id']}, Plant ID: {pick['plant_id']}, Plant Name: '{pick['plant_name']}'"
+            print(f"{pick_details}")
+            for api_field in pick['api_fields']:
+                for key, value in api_field.items():
+                    print(f"      {key}: {value}")
+        print("")  # Extra newline for spacing between packages
+
+# Machine-readable log output: one record per logged value
+PLANT_LOG_FIELDS = ['timestamp', 'beat', 'plant_id', 'plant_name', 'field', 'value']
+PACKAGE_LOG_FIELDS = ['timestamp', 'beat', 'package_id', 'package_name', 'pick_id', 'plant_id', 'plant_name', 'field', 'value']
+
+def plant_log_records(hit):
+    source = hit['_source']
+    response = source['response']
+    for key, value in response.items():
+        if key not in ('plant_id', 'plant_name'):
+            yield (source['timestamp'], source['beat'], response.get('plant_id'), response.get('plant_name'), key, value)
+
+def package_log_records(hit):
+    source = hit['_source']
+    for package in source['packages']:
+        for pick in package['picks']:
+            for api_field in pick['api_fields']:
+                for key, value in api_field.items():
+                    yield (source['timestamp'], source['beat'], package['package_id'], package['package_name'],
+                           pick['pick_id'], pick['plant_id'], pick['plant_name'], key, value)
+
+def record_printer(output, fields, records):
+    """A print_hit for show_logs that writes each hit's records instead of styled text."""
+    writer = RecordWriter(output, fields)
+
+    def print_hit(index, hit):
+        for record in records(hit):
+            writer.write(record)
+    return print_hit
+
+class LogCursor:
+    """Tracks the newest log timestamp shown so far, so follow mode only prints unseen hits."""
+
+    def __init__(self):
+        self.timestamp = None
+        self.seen = set()  # (timestamp, beat) pairs already shown at the cursor timestamp
+
+    def new_hits(self, hits):
+        """Yield the hits not shown yet, in server order, advancing the cursor once `hits` is exhausted.
+
+        `hits` may be a lazy stream; each hit is yielded as soon as it is read.
+        If the stream fails partway the cursor stays where it was, since hits
+        not read yet may be older than those shown, but the hits shown are
+        remembered so the next poll doesn't print them again.
+        """
+        newest, newest_keys = self.timestamp, set()
+        shown = set()
+        complete = False
+        try:
+            for hit in hits:
+                key = (hit['_source']['timestamp'], hit['_source']['beat'])
+                if self.timestamp is not None and key[0] < self.timestamp:
+                    continue
+                # Hits shown before a broken poll still move the cursor once a poll gets through
+                if newest is None or key[0] > newest:
+                    newest, newest_keys = key[0], set()
+                if key[0] == newest:
+                    newest_keys.add(key)
+                if key in self.seen:
+                    continue
+                shown.add(key)
+                yield hit
+            complete = True
+        finally:
+            if not complete:
+                self.seen.update(shown)
+            elif newest != self.timestamp:
+                self.timestamp, self.seen = newest, newest_keys
+            else:
+                self.seen.update(newest_keys)
+
+def show_logs(url, print_hit, follow, interval):
+    """Print the log window at `url`, then keep printing new hits if `follow` is set."""
+    import requests
+
+    cursor = LogCursor()
+    pacer = AdaptiveInterval(interval)
+    index = 0
+    while True:
+        # After the first window, ask the server only for hits newer than the cursor
+        params = {'since': cursor.timestamp} if cursor.timestamp else None
+        started = time.monotonic()
+        try:
+            # Stream the body so each hit is parsed and printed as soon as it arrives
+            response = client.get(url, params=params, stream=True)
+            ok = response.ok
+        except requests.RequestException as e:
+            if not follow:
+                raise click.ClickException(f'Request failed: {e}')
+            ok, response = False, None
+            click.echo(click.style(f'Request failed: {e}', fg='red'), err=True)
+        elapsed = time.monotonic() - started
+
+        if ok:
+            try:
+                with response:
+                    for hit in cursor.new_hits(iter_response_items(response, ('hits', 'hits'))):
+                        print_hit(index, hit)
+                        index += 1
+            except (requests.RequestException, ValueError) as e:
+                # The body broke off or isn't a log window: a failed poll, not the end of --follow
+                ok = False
+                broken = isinstance(e, (requests.RequestException, TruncatedJSONError))
+                message = f"Failed to read logs, {'the stream broke off' if broken else 'not a log window'}: {e}"
+                if not follow:
+                    raise click.ClickException(message)
+                click.echo(click.style(message, fg='red'), err=True)
+            sys.stdout.flush()
+        elif response is not None:
+            response.close()
+            message = f'Failed to fetch logs. Response Code: {response.status_code}'
+            if not follow:
+                raise click.ClickException(message)  # Exits non-zero, in every --output mode
+            click.echo(click.style(message, fg='red'), err=True)
+
+        if not follow:
+            return
+        time.sleep(pacer.update(elapsed, ok))
+
 @cli.command('log-plants')
 @click.argument('plant_ids', type=str)
 @click.argument('numback', type=int)
-def plant_logs(plant_ids, numback):
+@click.option('--follow', '-f', is_flag=True, help='Keep polling and print new log entries as they arrive.')
+@click.option('--interval', type=click.FloatRange(min=0.1), default=2.0, show_default=True, help='Seconds between polls in --follow mode.')
+@output_option
+def plant_logs(plant_ids, numback, follow, interval, output):
     """Fetch and display logs for specified plant IDs and number of logs."""
-    url = f'{API_BASE_URL}/plants/logs/{plant_ids}/{numback}/'
-    response = requests.get(url)
-    data = response.json()
-
-    # Colors for alternating log entries
-    log_colors = ['cyan', 'green']
-
-    for index, hit in enumerate(data['hits']['hits']):
-        timestamp = hit['_source']['timestamp']
-        beat_id = hit['_source']['beat']
-        log_color = log_colors[index % 2]  # Alternate colors for each log
-
-        # Styling timestamp and beat ID with the chosen log color
-        styled_timestamp = click.style(f"Timestamp: {timestamp}", fg=log_color)
-        styled_beat_id = click.style(f"Beat ID: {beat_id}", fg=log_color)
-        print(f"{styled_timestamp}, {styled_beat_id}\nResponse:")
-
-        # Assuming the response now directly contains the plant log details
-        response = hit['_source']['response']
-        plant_color = 'yellow'  # You can change this as needed or make it dynamic
-
-        # Print each key-value pair within the response, applying color to the plant details
-        for key, value in response.items():
-            if key in ['plant_id', 'plant_name']:
-                styled_value = click.style(f"{key}: '{value}'", fg=plant_color)
-                print(f"  {styled_value}", end=', ')
-            else:
-                print(f"{key}: {value}", end=', ')
-        print("\n")  # Finish the line after each plant response
-
-        # print("\n" + "-"*40 + "\n")
+    url = f'/plants/logs/{plant_ids}/{numback}/'
+    print_hit = print_plant_log_hit if output == 'table' else record_printer(output, PLANT_LOG_FIELDS, plant_log_records)
+    try:
+        show_logs(url, print_hit, follow, interval)
+    except KeyboardInterrupt:
+        pass
 
 @cli.command('log-packages')
 @click.argument('package_ids', type=str)
 @click.argument('numback', type=int)
-def package_logs(package_ids, numback):
+@click.option('--follow', '-f', is_flag=True, help='Keep polling and print new log entries as they arrive.')
+@click.option('--interval', type=click.FloatRange(min=0.1), default=2.0, show_default=True, help='Seconds between polls in --follow mode.')
+@output_option
+def package_logs(package_ids, numback, follow, interval, output):
     """Fetch and display logs for specified package IDs and number of logs."""
-    url = f'{API_BASE_URL}/packages/logs/{package_ids}/{numback}/'
-    response = requests.get(url)
-    data = response.json()
-
-    # Colors for alternating log entries
-    log_colors = ['cyan', 'green']
-    # List of colors for packages
-    package_colors = ['yellow', 'magenta', 'blue', 'red']  # Extend this list as needed
-
-    for index, hit in enumerate(data['hits']['hits']):
-        timestamp = hit['_source']['timestamp']
-        beat_id = hit['_source']['beat']
-        log_color = log_colors[index % 2]  # Alternate colors for each log
-
-        # Styling timestamp and beat ID with the chosen log color
-        styled_timestamp = click.style(f"Timestamp: {timestamp}", fg=log_color)
-        styled_beat_id = click.style(f"Beat ID: {beat_id}", fg=log_color)
-        print(f"{styled_timestamp}, {styled_beat_id}\n")
-
-        for package_index, package in enumerate(hit['_source']['packages']):
-            # Sequentially assign colors to packages based on their order
-            package_color = package_colors[package_index % len(package_colors)]
-            styled_package_id = click.style(f"Package ID: '{package['package_id']}' -", fg=package_color)
-            styled_package_name = click.style(f"Package Name: '{package['package_name']}'", fg=package_color)
-            print(f"  {styled_package_id} {styled_package_name}")
-
-            for pick in package['picks']:
-                # Print each pick with plant details and api fields, with added spacing for clarity
-                pick_details = f"    Pick ID: {pick['pick_id']}, Plant ID: {pick['plant_id']}, Plant Name: '{pick['plant_name']}'"
-                print(f"{pick_details}")
-                for api_field in pick['api_fields']:
-                    for key, value in api_field.items():
-                        print(f"      {key}: {value}")
-            print("")  # Extra newline for spacing between packages
+    url = f'/packages/logs/{package_ids}/{numback}/'
+    print_hit = print_package_log_hit if output == 'table' else record_printer(output, PACKAGE_LOG_FIELDS, package_log_records)
+    try:
+        show_logs(url, print_hit, follow, interval)
+    except KeyboardInterrupt:
+        pass
+
+# How each collection reports the status that --status selects on
+STATUS_FIELDS = {
+    'plants': lambda plant: plant['status'],
+    'workers': lambda worker: worker['resume'],
+    'actions': lambda action: 'ON' if action['status'] == 1 else 'OFF',
+}
+
+def resolve_targets(collection, tokens, status):
+    """Turn ID/range/'all' tokens plus an optional status selector into a list of IDs."""
+    select_all = 'all' in tokens or (status and not tokens)
+    try:
+        ids = parse_ids([token for token in tokens if token != 'all'])
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='IDS')
+    if not ids and not select_all:
+        raise click.UsageError("Specify at least one ID, a range such as 10-40, 'all', or --status.")
+
+    if select_all or status:
+        import requests
+
+        try:
+            entities = list(client.iter_items(f'/{collection}/', primary=True))
+        except requests.HTTPError as e:
+            raise click.ClickException(f"Failed to fetch {collection}. Status code: {e.response.status_code}, Response: {e.response.text}")
+        if status:
+            entities = [entity for entity in entities if STATUS_FIELDS[collection](entity).upper() == status.upper()]
+        matching = {entity['id'] for entity in entities}
+        ids = sorted(matching) if select_all else [entity_id for entity_id in ids if entity_id in matching]
+    return ids
+
+def confirm_bulk(tokens, status, ids, yes, prompt):
+    """Ask before updating targets selected by 'all' or --status, or more than CONFIRM_ABOVE of them; aborts on no."""
+    if yes or len(ids) <= 1 or not ('all' in tokens or status or len(ids) > CONFIRM_ABOVE):
+        return
+    click.confirm(prompt.format(count=len(ids)), abort=True)
 
-@cli.command('start')
-@click.argument('plant_id', type=int)
-def start(plant_id):
-    """Enable data collection for a plant."""
-    url = f'{API_BASE_URL}/plants/{plant_id}/update/'
-    update_data = {"collect": 1}
-    response = requests.patch(url, json=update_data)
-    if response.status_code in [200, 204]:
-        click.echo(f"Data collection enabled for plant ID {plant_id}.")
+def update_targets(ids, url_template, update_data, success, failure, rate, concurrency):
+    """PATCH every target concurrently, then report. Exits with status 1 if any update failed.
+
+    A single target keeps the one-line messages; several targets get a summary table.
+    """
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+    from tabulate import tabulate
+
+    if not ids:
+        click.echo("No matching targets.")
+        return
+
+    limiter = RateLimiter(rate)
+
+    def send(target_id):
+        limiter.wait()
+        try:
+            # Setting the same status twice is harmless, so these PATCHes may be retried
+            response = client.patch(url_template.format(id=target_id), json=update_data, idempotent=True)
+        except requests.RequestException as e:
+            return target_id, False, None, str(e)
+        return target_id, response.status_code in [200, 204], response.status_code, response.text
+
+    if len(ids) == 1:
+        results = [send(ids[0])]
+    else:
+        if concurrency > client.pool_size:
+            client.configure(pool_size=concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(send, ids))
+
+    failures = [result for result in results if not result[1]]
+    if len(ids) == 1:
+        target_id, ok, status_code, text = results[0]
+        if ok:
+            click.echo(success.format(id=target_id))
+        else:
+            click.echo(f"{failure.format(id=target_id)} Status code: {status_code}, Response: {text}")
     else:
-        click.echo(f"Failed to enable data collection for plant ID {plant_id}. Status code: {response.status_code}, Response: {response.text}")
+        table = []
+        for target_id, ok, status_code, text in results:
+            result = click.style('OK', fg='cyan') if ok else click.style('FAILED', fg='red')
+            table.append([target_id, result, status_code if status_code is not None else '-', '' if ok else text.strip()[:60]])
+        click.echo(tabulate(table, headers=['ID', 'RESULT', 'CODE', 'ERROR'], tablefmt='plain'))
+        click.echo(f"\n{len(results) - len(failures)} succeeded, {len(failures)} failed.")
+
+    if failures:
+        sys.exit(1)
+
+def target_options(command):
+    """Options shared by the commands that update one or more targets."""
+    command = click.option('--yes', '-y', is_flag=True, help="Don't ask for confirmation before updating 'all', --status or many targets.")(command)
+    command = click.option('--status', help="Only targets currently in this status (e.g. DOWN). Without IDs, selects all of them.")(command)
+    command = click.option('--rate', type=click.FloatRange(min=0), default=20, show_default=True, help='Maximum updates started per second (0 for unlimited).')(command)
+    command = click.option('--concurrency', type=click.IntRange(min=1), default=DEFAULT_CONCURRENCY, show_default=True, help='Updates in flight at once.')(command)
+    return command
+
+@cli.command('start')
+@click.argument('plant_ids', nargs=-1)
+@target_options
+def start(plant_ids, status, rate, concurrency, yes):
+    """Enable data collection for plants (IDs, ranges such as 10-40, or 'all')."""
+    ids = resolve_targets('plants', plant_ids, status)
+    confirm_bulk(plant_ids, status, ids, yes, "Enable data collection for {count} plants?")
+    update_targets(ids, '/plants/{id}/update/', {"collect": 1},
+                   success="Data collection enabled for plant ID {id}.",
+                   failure="Failed to enable data collection for plant ID {id}.",
+                   rate=rate, concurrency=concurrency)
 
 @cli.command('stop')
-@click.argument('plant_id', type=int)
-def stop(plant_id):
-    """Disable data collection for a plant."""
-    url = f'{API_BASE_URL}/plants/{plant_id}/update/'
-    update_data = {"collect": 0}
-    response = requests.patch(url, json=update_data)
-    if response.status_code in [200, 204]:
-        click.echo(f"Data collection disabled for plant ID {plant_id}.")
-    else:
-        click.echo(f"Failed to disable data collection for plant ID {plant_id}. Status code: {response.status_code}, Response: {response.text}")
+@click.argument('plant_ids', nargs=-1)
+@target_options
+def stop(plant_ids, status, rate, concurrency, yes):
+    """Disable data collection for plants (IDs, ranges such as 10-40, or 'all')."""
+    ids = resolve_targets('plants', plant_ids, status)
+    confirm_bulk(plant_ids, status, ids, yes, "Disable data collection for {count} plants?")
+    update_targets(ids, '/plants/{id}/update/', {"collect": 0},
+                   success="Data collection disabled for plant ID {id}.",
+                   failure="Failed to disable data collection for plant ID {id}.",
+                   rate=rate, concurrency=concurrency)
 
 @cli.command('on')
-@click.argument('worker_id', type=int)
-def on(worker_id):
-    """Enable data collection for a worker."""
-    url = f'{API_BASE_URL}/workers/{worker_id}/update/'
-    update_data = {"status": 1}
-    response = requests.patch(url, json=update_data)
-    if response.status_code in [200, 204]:
-        click.echo(f"Data collection enabled for worker ID {worker_id}.")
-    else:
-        click.echo(f"Failed to enable data collection for worker ID {worker_id}. Status code: {response.status_code}, Response: {response.text}")
+@click.argument('worker_ids', nargs=-1)
+@target_options
+def on(worker_ids, status, rate, concurrency, yes):
+    """Enable data collection for workers (IDs, ranges such as 10-40, or 'all')."""
+    ids = resolve_targets('workers', worker_ids, status)
+    confirm_bulk(worker_ids, status, ids, yes, "Enable data collection for {count} workers?")
+    update_targets(ids, '/workers/{id}/update/', {"status": 1},
+                   success="Data collection enabled for worker ID {id}.",
+                   failure="Failed to enable data collection for worker ID {id}.",
+                   rate=rate, concurrency=concurrency)
 
 @cli.command('off')
-@click.argument('worker_id', type=int)
-def off(worker_id):
-    """Disable data collection for a worker."""
-    url = f'{API_BASE_URL}/workers/{worker_id}/update/'
-    update_data = {"status": 0}
-    response = requests.patch(url, json=update_data)
-    if response.status_code in [200, 204]:
-        click.echo(f"Data collection disabled for worker ID {worker_id}.")
-    else:
-        click.echo(f"Failed to disable data collection for worker ID {worker_id}. Status code: {response.status_code}, Response: {response.text}")
+@click.argument('worker_ids', nargs=-1)
+@target_options
+def off(worker_ids, status, rate, concurrency, yes):
+    """Disable data collection for workers (IDs, ranges such as 10-40, or 'all')."""
+    ids = resolve_targets('workers', worker_ids, status)
+    confirm_bulk(worker_ids, status, ids, yes, "Disable data collection for {count} workers?")
+    update_targets(ids, '/workers/{id}/update/', {"status": 0},
+                   success="Data collection disabled for worker ID {id}.",
+                   failure="Failed to disable data collection for worker ID {id}.",
+                   rate=rate, concurrency=concurrency)
 
 @cli.command('enable')
-@click.argument('action_id', type=int)
-def enable_action(action_id):
-    """Enable an action."""
-    url = f'{API_BASE_URL}/actions/{action_id}/'
-    update_data = {"status": 1}  # Set status to 'ON'
-    response = requests.patch(url, json=update_data)
-    if response.status_code in [200, 204]:
-        click.echo(f"Action ID {action_id} enabled.")
-    else:
-        click.echo(f"Failed to enable action ID {action_id}. Status code: {response.status_code}, Response: {response.text}")
+@click.argument('action_ids', nargs=-1)
+@target_options
+def enable_action(action_ids, status, rate, concurrency, yes):
+    """Enable actions (IDs, ranges such as 10-40, or 'all')."""
+    ids = resolve_targets('actions', action_ids, status)
+    confirm_bulk(action_ids, status, ids, yes, "Enable {count} actions?")
+    update_targets(ids, '/actions/{id}/', {"status": 1},  # Set status to 'ON'
+                   success="Action ID {id} enabled.",
+                   failure="Failed to enable action ID {id}.",
+                   rate=rate, concurrency=concurrency)
 
 @cli.command('disable')
-@click.argument('action_id', type=int)
-def disable_action(action_id):
-    """Disable an action."""
-    url = f'{API_BASE_URL}/actions/{action_id}/'
-    update_data = {"status": 0}  # Set status to 'OFF'
-    response = requests.patch(url, json=update_data)
-    if response.status_code in [200, 204]:
-        click.echo(f"Action ID {action_id} disabled.")
-    else:
-        click.echo(f"Failed to disable action ID {action_id}. Status code: {response.status_code}, Response: {response.text}")
+@click.argument('action_ids', nargs=-1)
+@target_options
+def disable_action(action_ids, status, rate, concurrency, yes):
+    """Disable actions (IDs, ranges such as 10-40, or 'all')."""
+    ids = resolve_targets('actions', action_ids, status)
+    confirm_bulk(action_ids, status, ids, yes, "Disable {count} actions?")
+    update_targets(ids, '/actions/{id}/', {"status": 0},  # Set status to 'OFF'
+                   success="Action ID {id} disabled.",
+                   failure="Failed to disable action ID {id}.",
+                   rate=rate, concurrency=concurrency)
+
+WORKER_COLUMNS = [
+    Column('ID', 'id'),
+    Column('NAME', 'name'),
+    Column('PLANTS', get=lambda worker: len(worker['package']['picks'])),
+    Column('FIELDS', get=lambda worker: sum(len(pick['paths']) for pick in worker['package']['picks'])),
+    Column('STATUS', 'resume', color=STATUS_COLORS.get),  # OFF stays plain
+    Column('SINCE', 'since'),
+]
 
 @cli.command('list-workers')
-def list_workers():
+@output_option
+@page_options
+@offline_option
+def list_workers(output='table', page_size=DEFAULT_PAGE_SIZE, limit=None, where=(), sort=None, fields=None, offline=False):
     """List all workers with associated plant and paths counts."""
-    url = f'{API_BASE_URL}/workers/'
-    response = requests.get(url)
-    workers_data = response.json()
-
-    table = []
-    for worker in workers_data:
-
-        if worker['resume'] == 'OFF':
-            status = click.style(worker['resume'])
-        elif worker['resume'] == 'DOWN':
-            status = click.style(worker['resume'], fg='red')
-        elif worker['resume'] == 'STOP':
-            status = click.style(worker['resume'], fg='yellow')
-        elif worker['resume'] == 'ONLINE':
-            status = click.style(worker['resume'], fg='cyan')
-
-        worker_id = worker['id']
-        worker_name = worker['name']
-        plants_count = len(worker['package']['picks'])
-        paths_count = sum(len(pick['paths']) for pick in worker['package']['picks'])
-        since = worker['since']
-        table.append([worker_id, worker_name, plants_count, paths_count, status, since])
-
-    headers = ['ID', 'NAME', 'PLANTS', 'FIELDS', 'STATUS', 'SINCE']
-    click.echo(tabulate(table, headers=headers, tablefmt='plain'))
+    query = listing_query(WORKER_COLUMNS, where, sort, fields)
+    if offline:
+        workers = offline_entries('workers', query)
+    else:
+        workers = iter_collection(query.path('/workers/'), page_size, query.fetch_limit(limit))
+    print_listing(workers, query, output, limit)
 
 @cli.command('add-worker')
 def create_worker():
     """Create a new worker."""
     name = click.prompt('Enter worker name')
     description = click.prompt('Enter worker description')
-    url = f'{API_BASE_URL}/workers/create/'
+    url = '/workers/create/'
     data = {
         'name': name,
         'description': description
     }
-    response = requests.post(url, json=data)
+    response = client.post(url, json=data)
     if response.ok:
         click.echo("Worker created successfully.")
     else:
@@ -615,8 +1315,8 @@ def create_worker():
 def edit_worker(id):
     """Update an existing worker's name and description."""
     click.echo("Fetching current worker details...")
-    get_url = f'{API_BASE_URL}/workers/{id}/'
-    get_response = requests.get(get_url)
+    get_url = f'/workers/{id}/'
+    get_response = client.get(get_url, primary=True)
     if not get_response.ok:
         click.echo(f"Failed to fetch details for worker with ID {id}.")
         return
@@ -628,9 +1328,9 @@ def edit_worker(id):
     name = click.prompt('Enter new worker name', default=worker_data['name'])
     description = click.prompt('Enter new worker description', default=worker_data['description'])
 
-    update_url = f'{API_BASE_URL}/workers/{id}/update/'
+    update_url = f'/workers/{id}/update/'
     update_data = {'name': name, 'description': description}
-    update_response = requests.patch(update_url, json=update_data)
+    update_response = client.patch(update_url, json=update_data)
     if update_response.ok:
         click.echo("Worker updated successfully.")
     else:
@@ -642,8 +1342,8 @@ def edit_worker(id):
 def edit_package(worker_id):
     """Update the package of a worker's name and description."""
     click.echo("Fetching current package details...")
-    get_url = f'{API_BASE_URL}/workers/{worker_id}/'
-    get_response = requests.get(get_url)
+    get_url = f'/workers/{worker_id}/'
+    get_response = client.get(get_url, primary=True)
     if not get_response.ok:
         click.echo(f"Failed to fetch details for worker with ID {worker_id}.")
         return
@@ -656,14 +1356,14 @@ def edit_package(worker_id):
     name = click.prompt('Enter new package name', default=package_data['name'])
     description = click.prompt('Enter new package description', default=package_data['description'])
 
-    update_url = f'{API_BASE_URL}/workers/{worker_id}/update/'
+    update_url = f'/workers/{worker_id}/update/'
     update_data = {
         'package': {
             'name': name,
             'description': description
         }
     }
-    update_response = requests.patch(update_url, json=update_data)
+    update_response = client.patch(update_url, json=update_data)
     if update_response.ok:
         click.echo("Package updated successfully.")
     else:
@@ -674,8 +1374,8 @@ def edit_package(worker_id):
 def add_pick(worker_id):
     """Add a new pick to a worker."""
     click.echo("Fetching current picks...")
-    get_url = f'{API_BASE_URL}/workers/{worker_id}/'
-    get_response = requests.get(get_url)
+    get_url = f'/workers/{worker_id}/'
+    get_response = client.get(get_url, primary=True)
     if not get_response.ok:
         click.echo(f"Failed to fetch details for worker with ID {worker_id}.")
         return
@@ -695,7 +1395,7 @@ def add_pick(worker_id):
             break
         paths.append(path)
 
-    url = f'{API_BASE_URL}/workers/{worker_id}/update/'
+    url = f'/workers/{worker_id}/update/'
     data = {
         'picks': [
             {
@@ -704,25 +1404,81 @@ def add_pick(worker_id):
             }
         ]
     }
-    response = requests.put(url, json=data)
+    response = client.put(url, json=data)
     if response.ok:
+        update_stored_worker(worker_id)
         click.echo("Pick added successfully.")
     else:
         click.echo("Failed to add pick.")
 
+def save_picks(worker_id, etag, original, changes):
+    """Send only the changed picks, unless the worker's picks changed on the server since they were fetched.
+
+    `etag` and `original` are the version and picks the edit started from.
+    The check before writing costs a 304 when the ETag still matches. Every
+    partial write carries If-Match with the version the previous one made,
+    so servers that support it refuse writes that race with another edit.
+    Without an ETag to match, the rest of the edit goes as one PATCH of the
+    whole list, which leaves the picks right whatever was applied before.
+    Returns True if everything was written.
+    """
+    current = client.get(f'/workers/{worker_id}/', cache=True, revalidate=True, primary=True)
+    if not current.ok:
+        click.echo(f"Failed to fetch details for worker with ID {worker_id}.")
+        return False
+    if current.headers.get('ETag') != etag or etag is None:
+        # Another field may have changed; only a change to the picks themselves is a conflict
+        if current.json()['package']['picks'] != original:
+            click.echo(f"The picks of worker {worker_id} were changed by someone else after they were fetched; "
+                       "nothing was written. Run the command again to edit the current picks.")
+            return False
+        etag = current.headers.get('ETag')
+
+    update_url = f'/workers/{worker_id}/update/'
+    replace = ('PATCH', update_url, {'picks': changes.edited})
+    if changes.replace:
+        writes = [replace]
+    else:
+        writes = [('PUT', update_url, {'picks': changes.upserts})] if changes.upserts else []
+        writes += [('PUT', f'/workers/{worker_id}/remove-pick/', {'plant_id': plant_id}) for plant_id in changes.removals]
+
+    written = 0
+    while written < len(writes):
+        method, url, data = writes[written]
+        if etag is None and written < len(writes) - 1:
+            # Nothing to chain If-Match on: send the rest as one request rather than as unguarded partial writes
+            click.echo("The server sent no version to check the next write against; sending the whole pick list instead.")
+            writes[written:] = [replace]
+            continue
+        response = client.request(method, url, json=data, headers={'If-Match': etag} if etag else {})
+        if response.status_code == 412:
+            click.echo(f"The picks of worker {worker_id} were changed by someone else during the update; "
+                       f"{written} of {len(writes)} writes had been applied. Run the command again to edit the current picks.")
+            return False
+        if not response.ok:
+            click.echo(f"Failed to update package picks ({written} of {len(writes)} writes applied). Response: {response.text}")
+            return False
+        written += 1
+        etag = response.headers.get('ETag')  # Each write makes a new version; the next one must match it
+    update_stored_worker(worker_id)
+    return True
+
 @cli.command('edit-pick')
 @click.argument('worker_id', type=int)
 def edit_pick(worker_id):
     """Edit an existing pick of a worker."""
+    from garden.picks import PickChanges
+
     click.echo("Fetching current pick details...")
-    get_url = f'{API_BASE_URL}/workers/{worker_id}/'
-    get_response = requests.get(get_url)
+    get_url = f'/workers/{worker_id}/'
+    get_response = client.get(get_url, cache=True, revalidate=True, primary=True)
     if not get_response.ok:
         click.echo(f"Failed to fetch details for worker with ID {worker_id}.")
         return
 
     worker_data = get_response.json()
     picks_data = worker_data['package']['picks']
+    original_picks = [dict(pick, paths=list(pick['paths'])) for pick in picks_data]  # Kept aside for the diff
     if not picks_data:
         click.echo("No picks found for this worker.")
         return
@@ -754,29 +1510,22 @@ def edit_pick(worker_id):
             break
         current_pick['paths'].append(new_path)
 
-    # Updating the pick in the API
-    url = f'{API_BASE_URL}/workers/{worker_id}/update/'
-    data = {
-        'picks': [
-            {
-                'plant_id': current_pick['plant_id'],
-                'paths': current_pick['paths']
-            }
-        ]
-    }
-    response = requests.put(url, json=data)
-    if response.ok:
+    # Send the pick only if its paths changed
+    changes = PickChanges([original_picks[pick_number - 1]], [current_pick])
+    if not changes:
+        click.echo(f"No changes made to pick #{pick_number}.")
+        return
+    if save_picks(worker_id, get_response.headers.get('ETag'), original_picks, changes):
         click.echo(f"Pick #{pick_number} edited successfully.")
-    else:
-        click.echo("Failed to edit pick.")
 
 @cli.command('remove-pick')
 @click.argument('worker_id', type=int)
 def remove_pick(worker_id):
     """Remove a pick from a worker."""
     click.echo("Fetching current pick details...")
-    get_url = f'{API_BASE_URL}/workers/{worker_id}/'
-    get_response = requests.get(get_url)
+    get_url = f'/workers/{worker_id}/'
+    # Picks are chosen by position, so this must be the current list, not a cached one
+    get_response = client.get(get_url, cache=True, revalidate=True, primary=True)
     if not get_response.ok:
         click.echo(f"Failed to fetch details for worker with ID {worker_id}.")
         return
@@ -795,20 +1544,57 @@ def remove_pick(worker_id):
     plant_id = picks_data[count - 1]['plant_id']
     click.confirm(f"Are you sure you want to remove pick #{count} with plant ID {plant_id}?", abort=True)
 
-    url = f'{API_BASE_URL}/workers/{worker_id}/remove-pick/'
+    url = f'/workers/{worker_id}/remove-pick/'
     data = {'plant_id': plant_id}
-    response = requests.put(url, json=data)
-    if response.ok:
+    etag = get_response.headers.get('ETag')
+    response = client.put(url, json=data, headers={'If-Match': etag} if etag else {})
+    if response.status_code == 412:
+        click.echo(f"The picks of worker {worker_id} were changed by someone else in the meantime; nothing was removed. "
+                   "Run the command again to see the current picks.")
+    elif response.ok:
+        update_stored_worker(worker_id)
         click.echo("Pick removed successfully.")
     else:
         click.echo("Failed to remove pick.")
 
+def fetch_plant_index():
+    """Fetch the whole plant list once and index it by plant ID, or return None on failure."""
+    import requests
+
+    try:
+        return {plant['id']: plant for plant in client.iter_items('/plants/')}
+    except requests.HTTPError:
+        return None
+
+def fetch_plants(plant_ids, concurrency=DEFAULT_CONCURRENCY, bulk_threshold=BULK_THRESHOLD):
+    """Fetch each distinct plant once, returning a dict of plant ID -> plant data (None if not found).
+
+    When more than `bulk_threshold` distinct plants are needed, the full /plants/
+    listing is fetched in one request instead of one request per plant.
+    """
+    plant_ids = list(dict.fromkeys(plant_ids))
+    if len(plant_ids) > bulk_threshold:
+        index = fetch_plant_index()
+        if index is not None:
+            return {plant_id: index.get(plant_id) for plant_id in plant_ids}
+
+    responses = client.get_many([f'/plants/{plant_id}/' for plant_id in plant_ids], concurrency=concurrency)
+    plants = {}
+    for plant_id in plant_ids:
+        plant_response = responses[f'/plants/{plant_id}/']
+        plants[plant_id] = plant_response.json() if plant_response.ok else None
+    return plants
+
 @cli.command('watch-worker')
 @click.argument('workerid', type=int)
-def watch_worker(workerid):
+@click.option('--concurrency', type=click.IntRange(min=1), default=DEFAULT_CONCURRENCY, show_default=True, help='Maximum plant lookups in flight at once.')
+@click.option('--bulk-threshold', type=click.IntRange(min=0), default=BULK_THRESHOLD, envvar='GARDEN_BULK_THRESHOLD', show_default=True, help='Fetch the full plant list instead when more distinct plants than this are needed.')
+def watch_worker(workerid, concurrency, bulk_threshold):
     """Display detailed information about a worker, with each pick in a new section below."""
-    url = f'{API_BASE_URL}/workers/{workerid}/'
-    response = requests.get(url)
+    from tabulate import tabulate
+
+    url = f'/workers/{workerid}/'
+    response = client.get(url)
     if not response.ok:
         click.echo(f"Failed to fetch details for worker with ID {workerid}.")
         return
@@ -829,16 +1615,17 @@ def watch_worker(workerid):
     # Print worker details
     click.echo(tabulate(worker_details, tablefmt="plain"))
 
+    # Fetch every referenced plant up front, concurrently and once per plant ID
+    picks = worker_data['package']['picks']
+    plants = fetch_plants([pick['plant_id'] for pick in picks], concurrency=concurrency, bulk_threshold=bulk_threshold)
+
     # Picks details
     pick_table = []
     pick_number = 1
-    for pick in worker_data['package']['picks']:
-        plant_id = pick['plant_id']
-        plant_url = f"{API_BASE_URL}/plants/{plant_id}/"
-        plant_response = requests.get(plant_url)
+    for pick in picks:
+        plant_data = plants[pick['plant_id']]
 
-        if plant_response.ok:
-            plant_data = plant_response.json()
+        if plant_data is not None:
             plant_name = plant_data['name']
             plant_status = plant_data.get('status', 0)
             plant_collect = plant_data.get('collect', 0)
@@ -863,9 +1650,12 @@ def watch_worker(workerid):
 @click.argument('worker_id', type=int)
 def edit_picks(worker_id):
     """Edit the picks of a worker's package in YAML format with specific spacing and order."""
+    import yaml
+    from garden.picks import PickChanges, validate_picks
+
     # Fetch current worker details to get picks
-    get_url = f'{API_BASE_URL}/workers/{worker_id}/'
-    get_response = requests.get(get_url)
+    get_url = f'/workers/{worker_id}/'
+    get_response = client.get(get_url, cache=True, revalidate=True, primary=True)
 
     if not get_response.ok:
         click.echo(f"Failed to fetch details for worker with ID {worker_id}.")
@@ -892,17 +1682,250 @@ def edit_picks(worker_id):
 
     # Load edited YAML back into Python object
     try:
-        edited_picks = yaml.safe_load(edited_picks_yaml)
+        edited_picks = validate_picks(yaml.safe_load(edited_picks_yaml))
     except yaml.YAMLError as e:
         click.echo(f"Error parsing YAML: {e}")
         return
+    except ValueError as e:
+        click.echo(f"Invalid picks: {e}")
+        return
 
-    # Update worker's package picks
-    update_url = f'{API_BASE_URL}/workers/{worker_id}/update/'
-    update_data = {"picks": edited_picks}
-    update_response = requests.patch(update_url, json=update_data)
+    # Send only the picks that were added, removed or changed
+    changes = PickChanges(formatted_picks, edited_picks)
+    if not changes:
+        click.echo("No changes made to picks.")
+        return
+    if save_picks(worker_id, get_response.headers.get('ETag'), picks, changes):
+        click.echo(f"Package picks updated successfully ({changes.summary()}).")
+
+@cli.command('sync')
+@click.option('--full', is_flag=True, help='Re-read every entry and drop those the server no longer has, instead of only fetching what changed.')
+@click.option('--page-size', type=click.IntRange(min=1), default=DEFAULT_PAGE_SIZE, envvar='GARDEN_PAGE_SIZE', show_default=True,
+              help='Entries requested per page from servers that paginate.')
+def sync(full, page_size):
+    """Mirror plants, workers and actions into the local snapshot used by --offline."""
+    from garden.store import COLUMNS, FleetStore
+
+    fetch = lambda path: iter_collection(path, page_size, cache=False)
+    with FleetStore() as store:
+        for collection in COLUMNS:
+            started = time.perf_counter()
+            with tracer.span(f'sync {collection}'):
+                written, removed, was_full = store.sync(collection, fetch, full=full)
+            click.echo(f"{collection}: {written} written, {removed} removed "
+                       f"({'full' if was_full else 'incremental'} sync, {time.perf_counter() - started:.2f}s)")
+
+def update_stored_worker(worker_id):
+    """Refresh one worker in the local snapshot after its picks changed, so who-uses sees the change at once."""
+    from garden.store import FleetStore, default_store_path
+
+    if not os.path.exists(default_store_path()):
+        return
+    response = client.get(f'/workers/{worker_id}/', primary=True)
+    if response.ok:
+        with FleetStore() as store:
+            store.put('workers', response.json())
 
-    if update_response.ok:
-        click.echo("Package picks updated successfully.")
-    else:
-        click.echo(f"Failed to update package picks. Response: {update_response.text}")
+WHO_USES_FIELDS = ('plant_id', 'worker_id', 'worker', 'status', 'pick', 'paths')
+
+@cli.command('who-uses')
+@click.argument('plant_ids', nargs=-1, required=True)
+@output_option
+@click.option('--offline', is_flag=True, envvar='GARDEN_OFFLINE', help="Answer from the local snapshot without refreshing it first.")
+@click.option('--full', is_flag=True, help='Rebuild the index from every worker first, picking up pick edits made outside this CLI.')
+def who_uses(plant_ids, output, offline, full):
+    """Show the workers, picks and paths that depend on plants, e.g. before stopping them.
+
+    Answers come from the plant -> picks index in the local snapshot (see
+    `garden sync`), which is brought up to date with the workers that
+    changed since the last sync before each lookup.
+    """
+    from garden.store import FleetStore
+
+    try:
+        plant_ids = parse_ids(plant_ids)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='PLANT_IDS')
+    with open_store('workers') if offline else FleetStore() as store:
+        if not offline:
+            with tracer.span('sync workers'):
+                store.sync('workers', lambda path: iter_collection(path, cache=False), full=full)
+        with tracer.span('lookup'):
+            uses = store.who_uses(plant_ids)
+
+    records = ([use['plant_id'], use['worker_id'], use['worker'], use['resume'], use['pick'], use['paths']] for use in uses)
+    if output != 'table':
+        RecordWriter(output, WHO_USES_FIELDS).write_many(records)
+        return
+    if not uses:
+        click.echo(f"No worker uses plant{'s' if len(plant_ids) > 1 else ''} {', '.join(map(str, plant_ids))}.")
+        return
+    rows = [record[:5] + [', '.join(record[5])] for record in records]
+    echo_table(rows, ['PLANT', 'WORKER ID', 'WORKER', 'STATUS', 'PICK', 'PATHS'],
+               colors=[None, None, None, STATUS_COLORS.get, None, None])
+    workers = len({use['worker_id'] for use in uses})
+    click.echo(f"{len(uses)} pick{'s' if len(uses) != 1 else ''} in {workers} worker{'s' if workers != 1 else ''}.", err=True)
+
+@cli.command('monitor')
+@click.option('--plants/--no-plants', 'watch_plants', default=True, help='Watch plant status transitions.')
+@click.option('--workers/--no-workers', 'watch_workers', default=True, help='Watch worker resume transitions.')
+@click.option('--interval', type=click.FloatRange(min=1), default=15, show_default=True, help='Seconds between polls.')
+@click.option('--debounce', type=click.FloatRange(min=0), default=0, show_default=True,
+              help='Seconds a new status must last before it is reported; changes that revert sooner are dropped.')
+@click.option('--hooks', 'hooks_path', type=click.Path(dir_okay=False), help='Hooks file. [default: ~/.config/garden/hooks.ini, or $GARDEN_HOOKS]')
+@click.option('--exec', 'commands', multiple=True,
+              help='Shell command to run for every transition, with GARDEN_ID, GARDEN_NAME, GARDEN_FROM, GARDEN_TO etc. '
+                   'set and the event as JSON on stdin. Repeatable.')
+@click.option('--hook-rate', type=click.FloatRange(min=0), default=30, show_default=True, help='Runs per minute allowed for each --exec command (0 for unlimited).')
+@click.option('--page-size', type=click.IntRange(min=1), default=DEFAULT_PAGE_SIZE, envvar='GARDEN_PAGE_SIZE', show_default=True,
+              help='Entries requested per page from servers that paginate.')
+@output_option
+def monitor(watch_plants, watch_workers, interval, debounce, hooks_path, commands, hook_rate, page_size, output):
+    """Report plant and worker status transitions as they happen, and run hooks for them.
+
+    Polls /plants/ and /workers/ with conditional requests, so pages where
+    nothing changed cost a 304 and are never decoded, and prints one line
+    per transition. Hooks are described in the hooks file; see `pydoc
+    garden.monitor` for its format.
+    """
+    import requests
+    from garden.monitor import CollectionWatch, Debouncer, EVENT_FIELDS, Hook, HookRunner, default_hooks_path, load_hooks
+
+    path = hooks_path or default_hooks_path()
+    try:
+        hooks = load_hooks(path)
+    except (ValueError, OSError) as e:
+        raise click.ClickException(str(e))
+    if hooks_path and not hooks:
+        raise click.ClickException(f'No hooks in {hooks_path}.')
+    hooks += [Hook(f'--exec {command}', command=command, rate=hook_rate) for command in commands]
+
+    collections = ['plants'] * watch_plants + ['workers'] * watch_workers
+    if not collections:
+        raise click.UsageError('Nothing to watch; drop --no-plants or --no-workers.')
+    watches = [CollectionWatch(client, collection, page_size, min(client.pool_size, DEFAULT_CONCURRENCY)) for collection in collections]
+    debouncer = Debouncer(debounce)
+    runner = HookRunner(hooks, client, lambda hook, event, error: click.echo(
+        f"Hook {hook.name} failed for {event['collection'][:-1]} {event['id']}: {error}", err=True))
+    writer = RecordWriter(output, EVENT_FIELDS) if output != 'table' else None
+
+    def show(event):
+        if writer is not None:
+            writer.write([event[field] for field in EVENT_FIELDS])
+            return
+        old, new = (click.style(str(value), fg=STATUS_COLORS.get(value)) if value is not None else '-'
+                    for value in (event['from'], event['to']))
+        name = f" {event['name']}" if event['name'] else ''
+        click.echo(f"{event['time']}  {event['collection'][:-1]} {event['id']}{name}: {old} -> {new}")
+
+    pacer = AdaptiveInterval(interval)
+    transitions = 0
+    try:
+        while True:
+            started = time.monotonic()
+            events = []
+            ok = True
+            for watch in watches:
+                baseline = not watch.polled
+                try:
+                    with tracer.span(f'poll {watch.collection}'):
+                        events.extend(watch.poll())
+                except (requests.RequestException, ValueError) as e:
+                    ok = False
+                    click.echo(f'Failed to poll {watch.collection}: {e}', err=True)
+                    continue
+                if baseline:
+                    click.echo(f'Watching {len(watch.entities)} {watch.collection}.', err=True)
+
+            for event in debouncer.push(events):
+                transitions += 1
+                show(event)
+                runner.dispatch(event)
+            if writer is not None:
+                writer.flush()
+            time.sleep(pacer.update(time.monotonic() - started, ok))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.close()
+        summary = [f'{transitions} transitions']
+        if debouncer.suppressed:
+            summary.append(f'{debouncer.suppressed} reverted within --debounce')
+        for hook in hooks:
+            summary.append(f'hook {hook.name}: {hook.runs} runs, {hook.failed} failed, {hook.dropped} over its rate')
+        click.echo('; '.join(summary) + '.', err=True)
+
+def command_line_options(ctx, skip=()):
+    """The group options given on the command line, except those named in `skip`, as arguments that give them again."""
+    from click.core import ParameterSource
+
+    args = []
+    for param in ctx.command.params:
+        if param.name in skip or ctx.get_parameter_source(param.name) != ParameterSource.COMMANDLINE:
+            continue  # Defaults and environment variables apply to every inner command anyway
+        value = ctx.params[param.name]
+        if param.is_flag:
+            args.append(param.opts[0] if value else param.secondary_opts[0])
+        else:
+            args += [param.opts[0], str(value)]
+    return args
+
+@cli.command('shell')
+@click.pass_context
+def shell(ctx):
+    """Run Garden commands interactively in one process, keeping connections and caches warm.
+
+    Options given before 'shell', such as `garden --no-cache shell`, apply
+    to every command run in it. Connection options typed on a line, such as
+    `--pool-size 20 list-plants`, also stay in effect for the lines after it.
+    """
+    import importlib
+    import shlex
+    try:
+        importlib.import_module('readline')  # Enables line editing and history for input()
+    except ImportError:
+        pass
+
+    # The client was configured for the session by this invocation; only the per-command options are repeated
+    outer_args = command_line_options(ctx.parent, skip=CONNECTION_OPTIONS)
+    session_cache = MemoryCache()
+    click.echo("Garden shell. Type a command without the 'garden' prefix, 'help' for the list, or 'exit' to quit.")
+    while True:
+        try:
+            line = input('garden> ')
+        except EOFError:
+            click.echo()
+            break
+        except KeyboardInterrupt:
+            click.echo()
+            continue
+
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            click.echo(f"Error: {e}")
+            continue
+        if not args:
+            continue
+        if args[0] in ('exit', 'quit'):
+            break
+        if args[0] == 'help':
+            args = ['--help']
+        if args[0] == 'shell':
+            click.echo("Already in the Garden shell.")
+            continue
+
+        try:
+            # Every command runs the group callback again, so the shell's own options go first
+            cli.main(outer_args + args, prog_name='garden', standalone_mode=False, obj=session_cache)
+        except click.exceptions.Abort:
+            click.echo("Aborted!")
+        except click.ClickException as e:
+            e.show()
+        except SystemExit:
+            pass  # Commands exit non-zero on failure; the shell keeps going
+        except KeyboardInterrupt:
+            click.echo()
+        except Exception as e:
+            # A failed command, e.g. the API being unreachable, must not end the session
+            click.echo(f"Error: {type(e).__name__}: {e}", err=True)
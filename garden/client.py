@@ -0,0 +1,320 @@
+import os
+import threading
+import time
+
+from garden.cache import build_response
+from garden.endpoints import EndpointPool
+from garden.profile import tracer
+from garden.retry import DEFAULT_BREAKER_THRESHOLD, RetryPolicy, RETRY_STATUSES, UNAVAILABLE_STATUSES, retry_after
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PAGE_SIZE = 500
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class GardenClient:
+    """Pooled HTTP client shared by every Garden CLI command."""
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.endpoints = EndpointPool(self.base_url)
+        self.request_count = 0
+        self.session = None
+        self.cache = None
+        self.refresh = False
+        self.retry = RetryPolicy()
+        self.breaker_threshold = DEFAULT_BREAKER_THRESHOLD
+        self._lock = threading.Lock()
+        self.configure(pool_size=pool_size, connect_timeout=connect_timeout, read_timeout=read_timeout)
+
+    def configure(self, pool_size=None, connect_timeout=None, read_timeout=None, base_url=None,
+                  retries=None, breaker_threshold=None, replicas=None, probe_path=None):
+        """Apply new pool/timeout/retry/endpoint settings, rebuilding the session if needed.
+
+        `base_url` is the primary endpoint; `replicas` are extra endpoints
+        reads may be routed to, see garden.endpoints.
+        """
+        if retries is not None:
+            self.retry.retries = retries
+        if breaker_threshold is not None:
+            self.breaker_threshold = breaker_threshold
+            for endpoint in self.endpoints.endpoints:
+                endpoint.breaker.threshold = breaker_threshold
+        if base_url:
+            self.base_url = base_url.rstrip('/')
+        pool = self.endpoints
+        replicas = [endpoint.url for endpoint in pool.endpoints[1:]] if replicas is None else replicas
+        probe_path = probe_path or pool.probe_path
+        if (self.base_url != pool.primary.url or probe_path != pool.probe_path
+                or [url.rstrip('/') for url in replicas] != [endpoint.url for endpoint in pool.endpoints[1:]]):
+            state_path = None
+            if replicas:
+                from garden.cache import default_cache_dir
+
+                # Not *.json: the response cache owns those names in its directory
+                state_path = os.path.join(default_cache_dir(), 'endpoints.state')
+            self.endpoints = EndpointPool(self.base_url, replicas, probe_path, state_path, self.breaker_threshold)
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self.read_timeout = read_timeout
+        if pool_size is not None and pool_size != getattr(self, 'pool_size', None):
+            self.pool_size = pool_size
+            self.close()  # The next request builds a session with the new pool size
+
+    def _get_session(self):
+        # Built on first use so commands that never hit the API don't pay for importing requests
+        with self._lock:
+            if self.session is None:
+                self.session = self._build_session()
+            return self.session
+
+    def _build_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        # One pool per host, pool_size keep-alive connections in each
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        return session
+
+    def url(self, path):
+        """Build an absolute URL from an API path such as '/plants/'."""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f'{self.base_url}{path}'
+
+    def request(self, method, path, idempotent=None, primary=False, **kwargs):
+        """Send a request, retrying idempotent ones on connection errors, timeouts and 429/502/503/504.
+
+        GET, HEAD and OPTIONS count as idempotent; pass idempotent=True for
+        writes that are safe to repeat, or False for reads with side effects.
+        Reads may be served by a replica; pass primary=True for reads with
+        side effects and for reads whose result is about to be written back,
+        which must see the latest state. Raises requests.ConnectionError
+        without contacting the server while the endpoint's circuit breaker
+        is open.
+        """
+        import requests
+
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        read = method in IDEMPOTENT_METHODS and not primary  # Free to go to any endpoint
+        attempts = self.retry.retries + 1 if idempotent else 1
+        delays = self.retry.delays()
+        self.retry.record_request()
+
+        for attempt in range(1, attempts + 1):
+            endpoint = self.endpoints.for_read(self._probe) if read else self.endpoints.for_write()
+            breaker = endpoint.breaker
+            if not breaker.allow():
+                raise requests.ConnectionError(
+                    f'{endpoint.url} is failing ({breaker.failures} errors in a row); '
+                    f'not sending requests for another {breaker.retry_in():.0f}s')
+            url = path if path.startswith(('http://', 'https://')) else endpoint.url + path
+            with self._lock:
+                self.request_count += 1
+            try:
+                if tracer.enabled:
+                    response = self._traced_request(method, path, url, **kwargs)
+                else:
+                    response = self._get_session().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                breaker.record_failure()
+                if attempt == attempts or not self.retry.spend():
+                    raise
+                self._sleep_unless_failover(endpoint, read, next(delays))
+                continue
+
+            if response.status_code in UNAVAILABLE_STATUSES:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code in RETRY_STATUSES and attempt < attempts and self.retry.spend():
+                delay = retry_after(response, self.retry.max_delay)
+                response.close()
+                if response.status_code in UNAVAILABLE_STATUSES:
+                    self._sleep_unless_failover(endpoint, read, delay if delay is not None else next(delays))
+                else:
+                    time.sleep(delay if delay is not None else next(delays))  # Throttled: the endpoint is fine
+                continue
+            break
+
+        if method in WRITE_METHODS and response.ok and self.cache is not None:
+            self.invalidate(path)
+        return response
+
+    def _sleep_unless_failover(self, endpoint, read, delay):
+        # Reads move on to another endpoint straight away; only the same endpoint needs time to recover
+        if len(self.endpoints.endpoints) > 1:
+            self.endpoints.mark_down(endpoint)
+            if read and self.endpoints.for_read(self._probe) is not endpoint:
+                return
+        time.sleep(delay)
+
+    def _probe(self, url):
+        """Health check for the endpoint pool: any answer below 500 within the connect timeout."""
+        response = self._get_session().get(url, stream=True, timeout=(self.connect_timeout, self.connect_timeout))
+        response.close()
+        return response.status_code < 500
+
+    def _traced_request(self, method, path, url, **kwargs):
+        started = time.perf_counter()
+        response = self._get_session().request(method, url, **kwargs)
+        finished = time.perf_counter()
+        if kwargs.get('stream'):
+            size = response.headers.get('Content-Length')  # The body hasn't been read yet
+            size = int(size) if size is not None else None
+        else:
+            size = len(response.content)
+        tracer.add(f'{method} {path}', 'http', started, finished, method=method, url=path,
+                   status=response.status_code, bytes=size, ttfb_ms=response.elapsed.total_seconds() * 1000)
+        return self._trace_json(response, path)
+
+    @staticmethod
+    def _trace_json(response, path):
+        """Time response.json() calls as 'json decode' spans."""
+        decode = response.json
+
+        def traced_json(**kwargs):
+            with tracer.span('json decode', 'json', url=path):
+                return decode(**kwargs)
+
+        response.json = traced_json
+        return response
+
+    def get(self, path, cache=False, revalidate=False, **kwargs):
+        """GET a path. With cache=True the on-disk response cache is consulted first.
+
+        revalidate=True always asks the server, like --refresh, but still
+        gets a cheap 304 when the cached copy is current. Use it before writes.
+        """
+        if cache and self.cache is not None:
+            return self._cached_get(path, revalidate, **kwargs)
+        return self.request('GET', path, **kwargs)
+
+    def _cached_get(self, path, revalidate=False, **kwargs):
+        url = self.url(path)
+        entry = self.cache.lookup(url)
+        if entry is not None and not (self.refresh or revalidate) and self.cache.is_fresh(entry, path):
+            if tracer.enabled:
+                now = time.perf_counter()
+                tracer.add(f'cache hit {path}', 'cache', now, now, url=path)
+                return self._trace_json(build_response(entry), path)
+            return build_response(entry)
+
+        # Stale or refreshing: revalidate with whatever validators the server gave us
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.request('GET', path, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(url, entry)
+            return build_response(entry)
+        if response.status_code == 200:
+            self.cache.store(url, response)
+        return response
+
+    def iter_items(self, path, page_size=DEFAULT_PAGE_SIZE, limit=None, cache=False, primary=False):
+        """Yield the items of a collection such as '/plants/', one page at a time.
+
+        The first page is requested with ?limit=&offset=0. A paginating server
+        answers with a {'results': [...], 'next': url} envelope (limit/offset or
+        cursor alike) or a bare list with a Link rel="next" header, and the next
+        link is followed as given. A bare list without one is the whole
+        collection, as from servers that don't paginate. While the caller works
+        through a page the next one is already being fetched. `primary` is as
+        for request(). Raises requests.HTTPError if a page can't be fetched.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if limit is not None:
+            page_size = max(1, min(page_size, limit))
+        separator = '&' if '?' in path else '?'
+        fetch = lambda page_path: self._get_page(page_path, cache, primary)
+        remaining = limit
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = fetch(f'{path}{separator}limit={page_size}&offset=0')
+            while True:
+                items, next_path = page
+                if remaining is not None:
+                    items = items[:remaining]
+                    remaining -= len(items)
+                upcoming = None
+                if next_path and remaining != 0:
+                    upcoming = executor.submit(fetch, next_path)
+                yield from items
+                if upcoming is None:
+                    return
+                page = upcoming.result()
+
+    def _get_page(self, path, cache, primary=False):
+        """Fetch one page, returning (items, path of the next page or None)."""
+        response = self.get(path, cache=cache, primary=primary)
+        response.raise_for_status()
+        return self.page_items(response)
+
+    def page_items(self, response):
+        """Split a page of a collection into (items, path of the next page or None), see iter_items."""
+        data = response.json()
+        if isinstance(data, dict):
+            items, next_url = data['results'], data.get('next')
+        else:
+            items, next_url = data, response.links.get('next', {}).get('url')
+        if next_url:
+            next_url = self.endpoints.relative(next_url)  # Keep cache TTLs and trace labels keyed by path
+        return items, next_url
+
+    def invalidate(self, path):
+        """Drop cached responses for the collection a path belongs to, e.g. '/plants/5/update/' -> '/plants/'."""
+        collection = path.strip('/').split('/', 1)[0]
+        self.cache.invalidate(self.url(f'/{collection}/'))
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def get_many(self, paths, concurrency=DEFAULT_CONCURRENCY):
+        """GET several paths concurrently, returning a dict of path -> response.
+
+        Duplicate paths are fetched once. At most `concurrency` requests are in
+        flight at a time; keep it at or below the pool size to reuse connections.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        unique_paths = list(dict.fromkeys(paths))
+        if concurrency <= 1 or len(unique_paths) <= 1:
+            return {path: self.get(path) for path in unique_paths}
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(unique_paths))) as executor:
+            responses = executor.map(self.get, unique_paths)
+            return dict(zip(unique_paths, responses))
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
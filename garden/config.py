@@ -0,0 +1,53 @@
+"""Endpoint profiles, read from ~/.config/garden/config.ini (or $GARDEN_CONFIG).
+
+    [default]
+    primary = http://192.168.101.5:8500
+    replicas =
+        http://10.20.0.5:8500
+        http://10.30.0.5:8500
+
+    [lab]
+    primary = http://127.0.0.1:8500
+
+Writes always go to the primary. Reads go to whichever of the primary and
+replicas answers fastest, see garden.endpoints. `probe` sets the path used
+to check an endpoint (default '/'; any answer below 500 counts as healthy).
+"""
+import os
+
+DEFAULT_PROFILE = 'default'
+
+
+def default_config_path():
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'garden', 'config.ini')
+
+
+def load_profile(name=None, path=None):
+    """Return {'primary', 'replicas', 'probe'} for a profile, or None if there is no config file or profile.
+
+    Raises ValueError for a profile that was asked for by name but can't be
+    used: missing, or without a primary.
+    """
+    import configparser
+
+    path = path or os.environ.get('GARDEN_CONFIG') or default_config_path()
+    parser = configparser.ConfigParser()
+    if not parser.read(path):
+        if name:
+            raise ValueError(f"Profile '{name}' requested, but there is no config file at {path}")
+        return None
+
+    section = name or DEFAULT_PROFILE
+    if not parser.has_section(section):
+        if name:
+            raise ValueError(f"No profile '{name}' in {path}; found: {', '.join(parser.sections()) or 'none'}")
+        return None
+    profile = parser[section]
+    if not profile.get('primary'):
+        raise ValueError(f"Profile '{section}' in {path} has no primary endpoint")
+    return {
+        'primary': profile['primary'].strip(),
+        'replicas': profile.get('replicas', '').split(),
+        'probe': profile.get('probe', '/'),
+    }
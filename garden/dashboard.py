@@ -0,0 +1,184 @@
+"""`garden dashboard`: many plants and packages polled at once, in one view redrawn in place.
+
+Each target is an asyncio task with its own interval, timeout and backoff,
+so a slow or failing target only delays itself. The requests go through
+the CLI's pooled client on a thread pool with one thread per target that
+can be in flight. A shared rate limiter spaces out request starts, so
+the total rate stays capped however many targets there are.
+"""
+import asyncio
+import time
+
+from garden.live import AdaptiveInterval
+
+PREVIEW_FIELDS = 3  # Values shown per target when no --field is given
+
+
+class AsyncRateLimiter:
+    """Spaces calls to wait() so that at most `rate` of them start per second; the event loop version of RateLimiter."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(self.next_slot, now)
+        self.next_slot = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+class Target:
+    """One plant or package on the dashboard, with its latest values and polling state."""
+
+    def __init__(self, kind, target_id, interval, timeout):
+        self.kind = kind
+        self.id = target_id
+        self.path = f'/plants/{target_id}/data/' if kind == 'plant' else f'/package/{target_id}/'
+        self.interval = interval
+        self.timeout = timeout
+        self.values = {}
+        self.changed = 0  # Fields that changed in the last successful poll
+        self.latency = None
+        self.updated = None  # time.monotonic() of the last successful poll
+        self.error = None
+        self.polls = 0
+
+    @property
+    def label(self):
+        return f'{self.kind} {self.id}'
+
+    def update(self, values, latency):
+        self.changed = sum(1 for key, value in values.items() if self.values.get(key) != value) if self.values else 0
+        self.values = values
+        self.latency = latency
+        self.updated = time.monotonic()
+        self.error = None
+
+
+class Dashboard:
+    """Polls `targets` with `fetch(target)` and redraws a grid of them with `render(lines)`.
+
+    `fetch` is blocking and runs on a thread pool; it returns a dict of field
+    -> value or raises an exception whose text is shown for the target. A
+    target's timeout runs from when its fetch starts, not from when it was
+    queued for a thread. The next poll is the retry, so `fetch` should make
+    a single attempt that gives up within the timeout.
+    """
+
+    def __init__(self, targets, fetch, render, fields=(), rate=None, concurrency=None, refresh=0.5):
+        self.targets = targets
+        self.fetch = fetch
+        self.render = render
+        self.fields = list(fields)
+        self.limiter = AsyncRateLimiter(rate)
+        self.concurrency = concurrency or len(targets)
+        self.refresh = refresh
+        self.started = time.monotonic()
+        self.requests = 0
+
+    def run(self, once=False):
+        """Poll until interrupted, or with `once` until every target answered or failed once."""
+        try:
+            asyncio.run(self._main(once))
+        except KeyboardInterrupt:
+            pass
+
+    async def _main(self, once):
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(self.targets))))
+        pollers = []
+        try:
+            pollers = [asyncio.create_task(self._poll(target, executor, once)) for target in self.targets]
+            if once:
+                await asyncio.gather(*pollers)
+                self.render(self.lines())
+                return
+            while True:
+                self.render(self.lines())
+                await asyncio.sleep(self.refresh)
+        finally:
+            for poller in pollers:
+                poller.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _poll(self, target, executor, once):
+        loop = asyncio.get_running_loop()
+        pacer = AdaptiveInterval(target.interval)
+        while True:
+            await self.limiter.wait()
+            self.requests += 1
+            target.polls += 1
+            running = asyncio.Event()
+            future = loop.run_in_executor(executor, self._fetch, target, loop, running)
+            # With fewer threads than targets a poll can wait for one; only the time it actually runs counts
+            await running.wait()
+            started = time.monotonic()
+            try:
+                values = await asyncio.wait_for(future, target.timeout)
+                ok = True
+            except asyncio.TimeoutError:
+                ok = False
+                target.error = f'timed out after {target.timeout:g}s'
+            except Exception as e:
+                ok = False
+                target.error = str(e) or type(e).__name__
+            elapsed = time.monotonic() - started
+            if ok:
+                target.update(values, elapsed)
+            if once:
+                return
+            await asyncio.sleep(pacer.update(elapsed, ok))
+
+    def _fetch(self, target, loop, running):
+        loop.call_soon_threadsafe(running.set)
+        return self.fetch(target)
+
+    def columns(self):
+        """The value columns: the --field names, or the first fields of the first target that has values."""
+        if self.fields:
+            return self.fields
+        for target in self.targets:
+            if target.values:
+                return list(target.values)[:PREVIEW_FIELDS]
+        return []
+
+    def lines(self):
+        from garden.table import iter_plain_table
+
+        now = time.monotonic()
+        fields = self.columns()
+        rows = []
+        for target in self.targets:
+            age = f'{now - target.updated:.0f}s' if target.updated is not None else ''
+            latency = f'{target.latency * 1000:.0f}ms' if target.latency is not None else ''
+            state = 'ERROR' if target.error else ('OK' if target.updated is not None else 'WAIT')
+            values = [lookup(target.values, field) for field in fields]
+            rows.append([target.label, state, latency, age, len(target.values) or '', target.changed] + values)
+
+        colors = [None, lambda state: {'ERROR': 'red', 'WAIT': 'yellow'}.get(state), None, None, None, None]
+        headers = ['TARGET', 'STATE', 'LATENCY', 'AGE', 'FIELDS', 'CHANGED'] + [field.upper() for field in fields]
+        lines = list(iter_plain_table(rows, headers, colors=colors + [None] * len(fields)))
+
+        failing = [target for target in self.targets if target.error]
+        elapsed = max(now - self.started, 1e-9)
+        lines.append('')
+        lines.append(f'{len(self.targets)} targets, {self.requests / elapsed:.1f} requests/s, {len(failing)} failing')
+        lines.extend(f'  {target.label}: {target.error}' for target in failing[:5])
+        return lines
+
+
+def lookup(values, field):
+    """A field's value, matching with or without the 'response.' prefix and, for packages, in any pick."""
+    if field in values:
+        return values[field]
+    wanted = field.removeprefix('response.')
+    for key, value in values.items():
+        pick, _, rest = key.partition('.')
+        name = rest if pick.isdigit() else key  # Package fields are PICK_ID.FIELD
+        if name.removeprefix('response.') == wanted:
+            return value
+    return ''
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+
+from garden.retry import DEFAULT_BREAKER_THRESHOLD, CircuitBreaker
+
+PROBE_TTL = 60  # Seconds probe results are trusted, including by later invocations
+DOWN_FOR = 30  # Seconds an endpoint that failed is left out of read routing
+
+
+class Endpoint:
+    def __init__(self, url, breaker_threshold=DEFAULT_BREAKER_THRESHOLD):
+        self.url = url.rstrip('/')
+        self.latency = None  # Seconds the last successful probe took
+        self.checked_at = 0.0  # time.time() of the last probe
+        self.down_until = 0.0
+        self.breaker = CircuitBreaker(breaker_threshold)  # Per endpoint: a dead replica mustn't cut off the primary
+
+    @property
+    def up(self):
+        return time.time() >= self.down_until and not self.breaker.retry_in()
+
+
+class EndpointPool:
+    """The primary API endpoint plus read replicas, with latency-based read routing.
+
+    Writes always go to the primary. Reads go to the healthy endpoint whose
+    last probe answered fastest. Probes run in background threads, and their
+    results are kept in `state_path` so the next invocation can route at
+    once. Only when nothing is known yet does the first read wait, and then
+    only until the first endpoint answers. An endpoint that fails a request
+    is skipped for DOWN_FOR seconds, as is one whose circuit breaker is open.
+    """
+
+    def __init__(self, primary, replicas=(), probe_path='/', state_path=None, breaker_threshold=DEFAULT_BREAKER_THRESHOLD):
+        self.primary = Endpoint(primary, breaker_threshold)
+        self.endpoints = [self.primary] + [Endpoint(url, breaker_threshold) for url in dict.fromkeys(replicas)
+                                           if url.rstrip('/') != self.primary.url]
+        self.probe_path = probe_path
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._answered = threading.Event()
+        self._pending = 0
+        self._load_state()
+
+    def for_write(self):
+        return self.primary
+
+    def for_read(self, probe, wait=3.0):
+        """Pick the endpoint for a read. `probe(url)` returns True if the endpoint answered healthily."""
+        if len(self.endpoints) == 1:
+            return self.primary
+        now = time.time()
+        if any(now - endpoint.checked_at > PROBE_TTL for endpoint in self.endpoints):
+            self._start_probes(probe)
+        with self._lock:
+            waiting = self._pending and not any(endpoint.latency is not None and endpoint.up for endpoint in self.endpoints)
+        if waiting:
+            self._answered.wait(wait)
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint.up and endpoint.latency is not None]
+            if candidates:
+                return min(candidates, key=lambda endpoint: endpoint.latency)
+            # Nothing answered yet: prefer whatever isn't known to be down, primary first
+            return next((endpoint for endpoint in self.endpoints if endpoint.up), self.primary)
+
+    def mark_down(self, endpoint):
+        with self._lock:
+            endpoint.down_until = time.time() + DOWN_FOR
+        self._save_state()
+
+    def relative(self, url):
+        """Strip any of our endpoints' base URLs from an absolute URL, e.g. a pagination link."""
+        for endpoint in self.endpoints:
+            if url.startswith(endpoint.url + '/'):
+                return url[len(endpoint.url):]
+        return url
+
+    def _start_probes(self, probe):
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = len(self.endpoints)
+            now = time.time()
+            for endpoint in self.endpoints:
+                # Counts as checked already: a short command may exit before a slow endpoint answers,
+                # and the next one shouldn't probe it all over again
+                endpoint.checked_at = now
+        for endpoint in self.endpoints:
+            threading.Thread(target=self._probe, args=(endpoint, probe), daemon=True).start()
+
+    def _probe(self, endpoint, probe):
+        started = time.perf_counter()
+        try:
+            ok = probe(endpoint.url + self.probe_path)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if ok:
+                endpoint.latency = elapsed
+                endpoint.down_until = 0.0
+            else:
+                endpoint.latency = None
+                endpoint.down_until = time.time() + DOWN_FOR
+            self._pending -= 1
+            done = not self._pending
+        if ok or done:
+            self._answered.set()
+        self._save_state()
+
+    def _load_state(self):
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        for endpoint in self.endpoints:
+            saved = state.get(endpoint.url)
+            if saved:
+                endpoint.latency = saved.get('latency')
+                endpoint.checked_at = saved.get('checked_at', 0.0)
+                endpoint.down_until = saved.get('down_until', 0.0)
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        import tempfile
+
+        with self._save_lock:
+            try:
+                with open(self.state_path, 'r') as f:
+                    state = json.load(f)  # Other profiles' endpoints share the file
+            except (OSError, ValueError):
+                state = {}
+            with self._lock:
+                state.update({endpoint.url: {'latency': endpoint.latency, 'checked_at': endpoint.checked_at,
+                                             'down_until': endpoint.down_until} for endpoint in self.endpoints})
+            try:
+                directory = os.path.dirname(self.state_path)
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError:
+                pass  # Best effort, like the response cache
@@ -0,0 +1,133 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+# Characters that can legally follow a complete value inside an object or array
+_DELIMITERS = _WHITESPACE + ',:]}'
+_NUMBER = set('0123456789+-.eE')
+_LITERALS = ('true', 'false', 'null')
+
+
+class TruncatedJSONError(ValueError):
+    """The stream ended before the JSON document did, e.g. a body cut off by a dropped connection."""
+
+
+def _truncated(error, text):
+    """Whether `error`, raised decoding `text` at the end of the stream, only means the text stops too early."""
+    rest = text[error.pos:].rstrip()
+    return (error.msg.startswith('Unterminated string') or not rest
+            or (error.msg.startswith('Invalid \\uXXXX escape') and '"' not in rest)
+            or any(literal.startswith(rest) for literal in _LITERALS) or rest == '-')
+
+
+class _Reader:
+    """Pulls text from an iterator of byte chunks, keeping only the unconsumed tail in memory."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, min_size=0):
+        """Append chunks until at least `min_size` characters are buffered. Returns False at end of stream."""
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        added = False
+        while not self.eof and (not added or len(self.buf) < min_size):
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                self.eof = True
+                self.buf += self.decoder.decode(b'', final=True)
+                break
+            self.buf += self.decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            added = True
+        return added
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise TruncatedJSONError('Unexpected end of JSON stream')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of JSON stream, got '{self.buf[self.pos]}'")
+        self.pos += 1
+
+    def value(self):
+        """Decode one complete JSON value, reading more of the stream as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+                # A number cut off by a chunk boundary still decodes ("1" of "1.5"),
+                # so only trust values followed by a delimiter
+                if end < len(self.buf) and self.buf[end] in _DELIMITERS:
+                    self.pos = end
+                    return value
+                if self.eof:
+                    # Every value read here sits inside an object or array, so one the stream ends on was cut off
+                    if _NUMBER.issuperset(self.buf[end:]):
+                        raise TruncatedJSONError(f'JSON stream ended inside a value at offset {self.pos}')
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    if _truncated(e, self.buf):
+                        raise TruncatedJSONError(f'JSON stream ended inside a value at offset {self.pos}') from e
+                    raise
+            # Grow the buffer geometrically so large values aren't re-scanned chunk by chunk
+            self.fill(min_size=2 * (len(self.buf) - self.pos))
+
+
+def iter_json_items(chunks, path):
+    """Yield the items of the array found at `path` (a tuple of object keys) one at a time.
+
+    `chunks` is any iterable of bytes or str, such as response.iter_content().
+    Only the item being decoded is held in memory; everything outside the
+    array is skipped. Yields nothing if the path is not present. Raises
+    TruncatedJSONError if the stream ends early, and ValueError if it isn't
+    JSON; items yielded before either are complete.
+    """
+    reader = _Reader(chunks)
+    for key in path:
+        reader.expect('{')
+        while True:
+            if reader.peek() == '}':
+                return
+            name = reader.value()
+            reader.expect(':')
+            if name == key:
+                break
+            reader.value()  # Skip values that are not on the path
+            if reader.peek() == ',':
+                reader.pos += 1
+
+    if reader.peek() != '[':
+        return
+    reader.pos += 1
+    if reader.peek() == ']':
+        return
+    while True:
+        yield reader.value()
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or ']' in JSON array, got '{separator}'")
+
+
+def iter_response_items(response, path, chunk_size=CHUNK_SIZE):
+    """Stream the array at `path` out of a requests response opened with stream=True."""
+    return iter_json_items(response.iter_content(chunk_size=chunk_size), path)
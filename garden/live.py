@@ -0,0 +1,54 @@
+import sys
+
+MAX_BACKOFF = 8  # Never wait more than this many intervals between polls
+
+
+class AdaptiveInterval:
+    """Poll delay that grows while the server is slow or failing and decays back once it recovers."""
+
+    def __init__(self, interval, max_backoff=MAX_BACKOFF):
+        self.interval = interval
+        self.max_delay = interval * max_backoff
+        self.delay = interval
+
+    def update(self, elapsed, ok=True):
+        """Record how long the last poll took and return how long to sleep before the next one."""
+        if not ok or elapsed > self.interval:
+            self.delay = min(self.delay * 2, self.max_delay)
+        else:
+            self.delay = max(self.interval, self.delay / 2)
+        return max(self.delay - elapsed, 0)
+
+
+class LiveView:
+    """Keeps a block of lines on screen and rewrites only the lines that changed between updates."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lines = []
+        self.interactive = self.stream.isatty()
+
+    def update(self, lines):
+        if not self.interactive:
+            # Not a terminal: append only the lines that changed so the output stays greppable
+            changed = lines if len(lines) != len(self.lines) else [new for old, new in zip(self.lines, lines) if old != new]
+            for line in changed:
+                self.stream.write(line + '\n')
+        elif len(lines) != len(self.lines):
+            self._redraw(lines)
+        else:
+            height = len(self.lines)
+            for index, (old, new) in enumerate(zip(self.lines, lines)):
+                if old != new:
+                    up = height - index
+                    # Jump to the row, clear it, rewrite it, and come back to the bottom
+                    self.stream.write(f'\x1b[{up}A\r\x1b[2K{new}\r\x1b[{up}B')
+        self.stream.flush()
+        self.lines = list(lines)
+
+    def _redraw(self, lines):
+        if self.lines:
+            self.stream.write(f'\x1b[{len(self.lines)}A\r\x1b[J')
+        for line in lines:
+            self.stream.write(line + '\n')
+
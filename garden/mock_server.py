@@ -0,0 +1,426 @@
+"""Local stand-in for the Garden API, serving a synthetic fleet for testing and benchmarks.
+
+    python -m garden.mock_server --plants 1000 --latency-ms 5 --port 8500
+
+Point the CLI at it with `garden --api-url http://127.0.0.1:8500 ...` or
+GARDEN_API_URL. State lives in memory and writes are applied, so commands
+behave as they would against a real server.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+PLANT_STATUSES = ['ONLINE', 'ONLINE', 'ONLINE', 'STOP', 'DOWN']
+WORKER_RESUMES = ['ONLINE', 'ONLINE', 'STOP', 'DOWN', 'OFF']
+
+
+class Fleet:
+    """Synthetic plants, workers and actions, generated deterministically from a seed."""
+
+    def __init__(self, plants=100, workers=None, actions=None, picks=5, paths=4, seed=0):
+        rng = random.Random(seed)
+        epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.lock = threading.Lock()
+        self.rendered = {}  # Serialized collection bodies, dropped on writes
+
+        self.plants = {}
+        for plant_id in range(1, plants + 1):
+            self.plants[plant_id] = {
+                'id': plant_id,
+                'guid': f'{rng.getrandbits(64):016x}',
+                'name': f'plant-{plant_id:05d}',
+                'description': f'Synthetic plant {plant_id}',
+                'full_query_command': f'query --plant {plant_id}',
+                'status': rng.choice(PLANT_STATUSES),
+                'collect': rng.choice([0, 1]),
+                'number_of_packages': rng.randint(0, 5),
+                'number_of_fields': rng.randint(1, 40),
+                'since': (epoch + timedelta(minutes=rng.randint(0, 500000))).isoformat(),
+            }
+
+        self.workers = {}
+        for worker_id in range(1, (workers or max(1, plants // 10)) + 1):
+            worker_picks = []
+            for pick_id in range(1, picks + 1):
+                plant_id = rng.randint(1, plants)
+                worker_picks.append({
+                    'id': pick_id,
+                    'plant_id': plant_id,
+                    'paths': [f'response.metrics.m{rng.randint(0, 99)}' for _ in range(paths)],
+                })
+            self.workers[worker_id] = {
+                'id': worker_id,
+                'name': f'worker-{worker_id:05d}',
+                'description': f'Synthetic worker {worker_id}',
+                'status': 1,
+                'resume': rng.choice(WORKER_RESUMES),
+                'since': (epoch + timedelta(minutes=rng.randint(0, 500000))).isoformat(),
+                'package': {
+                    'name': f'package-{worker_id:05d}',
+                    'description': f'Package of worker {worker_id}',
+                    'picks': worker_picks,
+                },
+            }
+
+        self.actions = {}
+        for action_id in range(1, (actions or max(1, plants // 100)) + 1):
+            self.actions[action_id] = {
+                'id': action_id,
+                'group': f'group-{action_id % 7}',
+                'name': f'action-{action_id:04d}',
+                'description': f'Synthetic action {action_id}',
+                'params': [f'p{n}' for n in range(rng.randint(0, 3))],
+                'code': 'print("ok")',
+                'status': rng.choice([0, 1]),
+                'last_status_change': (epoch + timedelta(minutes=rng.randint(0, 500000))).isoformat(),
+            }
+        self.seed = seed
+
+    def plant_data(self, plant_id):
+        """Flattened field -> value data shaped like /plants/{id}/data/, varying over time."""
+        tick = int(time.time())
+        rng = random.Random(plant_id * 100003 + tick)
+        data = {f'response.metrics.m{n}': round(rng.uniform(0, 100), 2) for n in range(self.plants[plant_id]['number_of_fields'])}
+        data['response.status'] = {'code': 200, 'message': 'OK'}
+        return data
+
+    def package(self, worker_id):
+        worker = self.workers[worker_id]
+        picks = {}
+        for pick in worker['package']['picks']:
+            data = self.plant_data(pick['plant_id'])
+            picks[str(pick['id'])] = {
+                'plant_id': pick['plant_id'],
+                'data': {path: data.get(path, 0) for path in pick['paths']},
+            }
+        return {
+            'package_guid': f'pkg-{worker_id:08x}',
+            'package_name': worker['package']['name'],
+            'package_description': worker['package']['description'],
+            'package_status': worker['resume'],
+            'picks': picks,
+        }
+
+    def log_hits(self, kind, ids, numback, since=None):
+        """Elasticsearch-shaped hits, newest first, one beat per minute."""
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        hits = []
+        for n in range(numback):
+            timestamp = (now - timedelta(minutes=n)).isoformat()
+            if since and timestamp <= since:
+                break
+            beat = int((now - timedelta(minutes=n)).timestamp() // 60)
+            if kind == 'plants':
+                plant_id = ids[n % len(ids)]
+                plant = self.plants.get(plant_id, {'name': 'unknown'})
+                source = {'response': {'plant_id': plant_id, 'plant_name': plant['name'], 'code': 200, 'elapsed_ms': n % 97}}
+            else:
+                packages = []
+                for worker_id in ids:
+                    worker = self.workers.get(worker_id)
+                    if worker is None:
+                        continue
+                    packages.append({
+                        'package_id': worker_id,
+                        'package_name': worker['package']['name'],
+                        'picks': [{
+                            'pick_id': pick['id'],
+                            'plant_id': pick['plant_id'],
+                            'plant_name': self.plants[pick['plant_id']]['name'],
+                            'api_fields': [{path: n % 100} for path in pick['paths']],
+                        } for pick in worker['package']['picks']],
+                    })
+                source = {'packages': packages}
+            hits.append({'_index': f'garden-{kind}', '_id': f'{kind}-{beat}', '_source': {'timestamp': timestamp, 'beat': beat, **source}})
+        return {'took': 1, 'timed_out': False, 'hits': {'total': {'value': len(hits)}, 'hits': hits}}
+
+
+def parse_ids(text):
+    ids = []
+    for part in text.split(','):
+        if '-' in part:
+            start, _, end = part.partition('-')
+            ids.extend(range(int(start), int(end) + 1))
+        elif part:
+            ids.append(int(part))
+    return ids
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real server
+    disable_nagle_algorithm = True  # Headers and body are separate writes; don't stall on delayed ACKs
+    server_version = 'GardenMock/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write(f'{self.command} {self.path} {args[1] if len(args) > 1 else ""}\n')
+
+    @property
+    def fleet(self):
+        return self.server.fleet
+
+    def send_json(self, obj, status=200, cache_key=None):
+        if cache_key is not None:
+            with self.fleet.lock:
+                body = self.fleet.rendered.get(cache_key)
+                if body is None:
+                    body = self.fleet.rendered[cache_key] = json.dumps(obj).encode('utf-8')
+        else:
+            body = json.dumps(obj).encode('utf-8')
+
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if status == 200:
+            self.send_header('ETag', etag)
+        if len(body) > 1024 and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def select(items, query):
+        """Apply `field=value` and `field__gte=value` filters and `ordering=a,-b` on top-level fields; unknown fields are ignored."""
+        fields = items[0].keys() if items else ()
+        for field, values in query.items():
+            if field in fields:
+                items = [item for item in items if str(item[field]) == values[0]]
+            elif field.endswith('__gte') and field[:-5] in fields:
+                items = [item for item in items if str(item[field[:-5]]) >= values[0]]
+        ordering = [key for key in query.get('ordering', [''])[0].split(',') if key.lstrip('-') in fields]
+        for key in reversed(ordering):
+            items.sort(key=lambda item: item[key.lstrip('-')], reverse=key.startswith('-'))
+        return items
+
+    def send_page(self, collection, items, query):
+        """limit/offset pagination in the {'count', 'next', 'previous', 'results'} envelope."""
+        limit = min(int(query.get('limit', [self.server.page_size])[0]), self.server.page_size)
+        offset = int(query.get('offset', ['0'])[0])
+        rest = urlencode([(key, values[0]) for key, values in query.items() if key not in ('limit', 'offset')])
+        base = f"http://{self.headers.get('Host')}/{collection}/?{rest + '&' if rest else ''}"
+        page = {
+            'count': len(items),
+            'next': f'{base}limit={limit}&offset={offset + limit}' if offset + limit < len(items) else None,
+            'previous': f'{base}limit={limit}&offset={max(offset - limit, 0)}' if offset else None,
+            'results': items[offset:offset + limit],
+        }
+        self.send_json(page, cache_key=f'{collection}?{sorted(query.items())}')
+
+    def precondition_failed(self, obj):
+        """Answer 412 and return True if If-Match names a version of `obj` other than the current one."""
+        expected = self.headers.get('If-Match')
+        if expected is None or expected == '*':
+            return False
+        if expected == '"' + hashlib.md5(json.dumps(obj).encode('utf-8')).hexdigest() + '"':
+            return False
+        self.send_json({'detail': 'Precondition failed.'}, status=412)
+        return True
+
+    def not_found(self):
+        self.send_json({'detail': 'Not found.'}, status=404)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def route(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = parse_qs(url.query)
+        handler = getattr(self, f'handle_{self.command.lower()}', None)
+        if handler is None or not parts:
+            return self.not_found()
+        try:
+            handler(parts, query)
+        except (KeyError, ValueError, IndexError):
+            self.not_found()
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = route
+
+    def handle_get(self, parts, query):
+        fleet = self.fleet
+        collection = parts[0]
+        if collection in ('plants', 'workers', 'actions') and len(parts) == 1:
+            with fleet.lock:
+                items = self.select(list(getattr(fleet, collection).values()), query)
+            if self.server.page_size:
+                return self.send_page(collection, items, query)
+            return self.send_json(items, cache_key=f'{collection}?{sorted(query.items())}')
+        if collection in ('plants', 'packages') and parts[1] == 'logs':
+            since = query.get('since', [None])[0]
+            kind = 'plants' if collection == 'plants' else 'packages'
+            return self.send_json(fleet.log_hits(kind, parse_ids(parts[2]), int(parts[3]), since))
+        if collection == 'plants' and len(parts) == 3 and parts[2] == 'data':
+            return self.send_json(fleet.plant_data(int(parts[1])))
+        if collection == 'plants' and len(parts) == 2:
+            return self.send_json(fleet.plants[int(parts[1])])
+        if collection == 'workers' and len(parts) == 2:
+            return self.send_json(fleet.workers[int(parts[1])])
+        if collection == 'package' and len(parts) == 2:
+            return self.send_json(fleet.package(int(parts[1])))
+        if collection == 'actions' and len(parts) == 3 and parts[2] == 'execute':
+            action = fleet.actions[int(parts[1])]
+            params = query.get('params', [''])[0]
+            return self.send_json({'action': action['name'], 'params': params.split(',') if params else [], 'result': 'ok'})
+        if collection == 'actions' and len(parts) == 2:
+            return self.send_json(fleet.actions[int(parts[1])])
+        self.not_found()
+
+    def handle_post(self, parts, query):
+        fleet = self.fleet
+        data = self.read_json()
+        with fleet.lock:
+            fleet.rendered.clear()
+            if parts == ['plants', 'add']:
+                plant_id = max(fleet.plants, default=0) + 1
+                fleet.plants[plant_id] = {'id': plant_id, 'guid': f'{plant_id:016x}', 'status': 'STOP', 'collect': 0,
+                                          'number_of_packages': 0, 'number_of_fields': 0,
+                                          'since': datetime.now(timezone.utc).isoformat(), **data}
+                return self.send_json(fleet.plants[plant_id], status=201)
+            if parts == ['actions']:
+                action_id = max(fleet.actions, default=0) + 1
+                fleet.actions[action_id] = {'id': action_id, 'status': 0,
+                                            'last_status_change': datetime.now(timezone.utc).isoformat(), **data}
+                return self.send_json(fleet.actions[action_id], status=201)
+            if parts == ['workers', 'create']:
+                worker_id = max(fleet.workers, default=0) + 1
+                fleet.workers[worker_id] = {'id': worker_id, 'status': 0, 'resume': 'OFF',
+                                            'since': datetime.now(timezone.utc).isoformat(),
+                                            'package': {'name': '', 'description': '', 'picks': []}, **data}
+                return self.send_json(fleet.workers[worker_id], status=201)
+        self.not_found()
+
+    def handle_patch(self, parts, query):
+        fleet = self.fleet
+        data = self.read_json()
+        with fleet.lock:
+            fleet.rendered.clear()
+            if parts[0] == 'plants' and parts[2:] == ['update']:
+                fleet.plants[int(parts[1])].update(data)
+                return self.send_json(fleet.plants[int(parts[1])])
+            if parts[0] == 'actions' and len(parts) == 2:
+                fleet.actions[int(parts[1])].update(data)
+                return self.send_json(fleet.actions[int(parts[1])])
+            if parts[0] == 'workers' and parts[2:] == ['update']:
+                worker = fleet.workers[int(parts[1])]
+                if self.precondition_failed(worker):
+                    return
+                self.update_worker(worker, data, replace_picks=True)
+                return self.send_json(worker)
+        self.not_found()
+
+    def handle_put(self, parts, query):
+        fleet = self.fleet
+        data = self.read_json()
+        with fleet.lock:
+            fleet.rendered.clear()
+            if parts[0] == 'workers' and parts[2:] == ['update']:
+                worker = fleet.workers[int(parts[1])]
+                if self.precondition_failed(worker):
+                    return
+                self.update_worker(worker, data, replace_picks=False)
+                return self.send_json(worker)
+            if parts[0] == 'workers' and parts[2:] == ['remove-pick']:
+                if self.precondition_failed(fleet.workers[int(parts[1])]):
+                    return
+                picks = fleet.workers[int(parts[1])]['package']['picks']
+                picks[:] = [pick for pick in picks if pick['plant_id'] != data['plant_id']]
+                return self.send_json(fleet.workers[int(parts[1])])
+        self.not_found()
+
+    def handle_delete(self, parts, query):
+        fleet = self.fleet
+        with fleet.lock:
+            fleet.rendered.clear()
+            if parts[0] == 'plants' and parts[2:] == ['delete']:
+                del fleet.plants[int(parts[1])]
+                return self.send_json({}, status=200)
+            if parts[0] == 'actions' and len(parts) == 2:
+                del fleet.actions[int(parts[1])]
+                return self.send_json({}, status=200)
+        self.not_found()
+
+    @staticmethod
+    def update_worker(worker, data, replace_picks):
+        """PATCH replaces the pick list; PUT upserts the given picks by plant ID."""
+        package = data.pop('package', None)
+        picks = data.pop('picks', None)
+        worker.update(data)
+        if package:
+            worker['package'].update(package)
+        if picks is not None:
+            if replace_picks:
+                worker['package']['picks'] = [{'id': n, **pick} for n, pick in enumerate(picks, start=1)]
+            else:
+                existing = {pick['plant_id']: pick for pick in worker['package']['picks']}
+                for pick in picks:
+                    if pick['plant_id'] in existing:
+                        existing[pick['plant_id']]['paths'] = pick['paths']
+                    else:
+                        worker['package']['picks'].append({'id': len(worker['package']['picks']) + 1, **pick})
+
+
+def serve(fleet, host='127.0.0.1', port=8500, latency_ms=0, verbose=False, page_size=0):
+    """Create a mock server for `fleet`. Call serve_forever() on the result; port 0 picks a free port.
+
+    With a `page_size` the collection endpoints paginate, serving at most that many items per page.
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.fleet = fleet
+    server.latency = latency_ms / 1000
+    server.verbose = verbose
+    server.page_size = page_size
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic Garden API fleet.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8500, help='0 picks a free port')
+    parser.add_argument('--plants', type=int, default=100)
+    parser.add_argument('--workers', type=int, help='defaults to plants / 10')
+    parser.add_argument('--actions', type=int, help='defaults to plants / 100')
+    parser.add_argument('--picks', type=int, default=5, help='picks per worker')
+    parser.add_argument('--paths', type=int, default=4, help='paths per pick')
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay added to every request')
+    parser.add_argument('--paginate', type=int, default=0, metavar='PAGE_SIZE',
+                        help='paginate /plants/, /workers/ and /actions/ with limit/offset, at most PAGE_SIZE items a page')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='log every request to stderr')
+    args = parser.parse_args()
+
+    fleet = Fleet(plants=args.plants, workers=args.workers, actions=args.actions,
+                  picks=args.picks, paths=args.paths, seed=args.seed)
+    server = serve(fleet, args.host, args.port, args.latency_ms, args.verbose, args.paginate)
+    # The benchmark harness reads this line to find the port
+    print(f'Listening on http://{server.server_address[0]}:{server.server_address[1]}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""`garden monitor`: plant and worker status transitions, and the hooks they trigger.
+
+Each poll walks the /plants/ and /workers/ pages with conditional GETs,
+so a page nothing changed on costs a 304 (or, from servers without ETags,
+a digest comparison) and is never decoded. On pages that did change, each
+entity's fingerprint is compared with the last poll's and only the
+entities whose fingerprint moved are looked at further. What comes out
+are transitions of the watched field, e.g. a plant going ONLINE -> DOWN.
+
+Hooks run commands or Garden actions for matching transitions. They are
+read from ~/.config/garden/hooks.ini (or $GARDEN_HOOKS):
+
+    [page-oncall]
+    on = plants
+    to = DOWN
+    command = notify-send "Plant $GARDEN_NAME went $GARDEN_FROM -> $GARDEN_TO"
+
+    [restart-line-3]
+    on = plants
+    ids = 40-59
+    from = ONLINE
+    to = STOP DOWN
+    action = 12
+    params = {id},{to}
+    rate = 2
+
+`on`, `ids`, `from` and `to` narrow the transitions a hook sees; values
+are matched case-insensitively against any of the space- or
+comma-separated ones given. `rate` caps the runs per minute (default
+30); transitions over it are dropped and counted rather than queued, so a
+fleet-wide outage can't turn into a backlog of stale alerts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+# The field whose changes are reported, per collection
+WATCHED = {'plants': 'status', 'workers': 'resume'}
+
+EVENT_FIELDS = ('time', 'collection', 'id', 'name', 'field', 'from', 'to')
+
+DEFAULT_HOOK_RATE = 30  # Runs per minute
+DEFAULT_HOOK_TIMEOUT = 60  # Seconds
+
+
+def default_hooks_path():
+    from garden.config import default_config_path
+
+    return os.environ.get('GARDEN_HOOKS') or os.path.join(os.path.dirname(default_config_path()), 'hooks.ini')
+
+
+class CollectionWatch:
+    """What the last poll of one collection saw: per page its validators, per entity its fingerprint and watched value."""
+
+    def __init__(self, client, collection, page_size, concurrency=4):
+        self.client = client
+        self.concurrency = concurrency
+        self.collection = collection
+        self.field = WATCHED[collection]
+        self.first_page = f'/{collection}/?limit={page_size}&offset=0'
+        self.pages = {}  # path -> (ETag, body digest, entity IDs, next path)
+        self.entities = {}  # ID -> (fingerprint, name, watched value)
+        self.polled = False
+        self.decoded = 0  # Pages decoded by the last poll; the rest were unchanged
+
+    def poll(self):
+        """Fetch the collection and return its transitions since the last poll, as event dicts.
+
+        The first poll only records the baseline. Entities that appear or
+        disappear later are reported with a `from` or `to` of None. Raises
+        requests.RequestException if a page can't be fetched and ValueError
+        if one isn't a page of entities, leaving the recorded state as it was.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        now = time.time()
+        pages = {}
+        seen = set()
+        updates = {}
+        events = []
+        self.decoded = 0
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        # The pages seen last time are revalidated all at once; only new ones wait for the walk to reach them
+        pending = {path: executor.submit(self._get, path) for path in self.pages}
+        try:
+            path = self.first_page
+            while path and path not in pages:
+                known = self.pages.get(path)
+                response = pending.pop(path).result() if path in pending else self._get(path)
+                if response.status_code == 304 and known:
+                    pages[path] = known
+                    seen.update(known[2])
+                    path = known[3]
+                    continue
+                response.raise_for_status()
+                digest = hashlib.blake2b(response.content, digest_size=16).digest()
+                if known and digest == known[1]:
+                    pages[path] = (response.headers.get('ETag'),) + known[1:]
+                    seen.update(known[2])
+                    path = known[3]
+                    continue
+
+                self.decoded += 1
+                try:
+                    items, next_path = self.client.page_items(response)
+                    ids = [entity['id'] for entity in items]
+                    seen.update(ids)
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ValueError(f'malformed page {path}: {type(e).__name__}: {e}')
+                for entity_id, entity in zip(ids, items):
+                    # Dumped as sent: the server renders entities the same way each time, and a
+                    # spurious mismatch only costs the field comparison below
+                    fingerprint = hash(json.dumps(entity))
+                    previous = self.entities.get(entity_id)
+                    if previous is not None and previous[0] == fingerprint:
+                        continue
+                    value = entity.get(self.field)
+                    updates[entity_id] = (fingerprint, entity.get('name'), value)
+                    if self.polled and (previous is None or previous[2] != value):
+                        old = None if previous is None else previous[2]
+                        events.append(self._event(now, entity_id, entity.get('name'), old, value))
+                pages[path] = (response.headers.get('ETag'), digest, ids, next_path)
+                path = next_path
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)  # Pages the walk no longer leads to
+
+        if self.polled:
+            for entity_id in self.entities.keys() - seen:
+                _, name, value = self.entities[entity_id]
+                events.append(self._event(now, entity_id, name, value, None))
+        for entity_id in self.entities.keys() - seen:
+            del self.entities[entity_id]
+        self.entities.update(updates)
+        self.pages = pages
+        self.polled = True
+        return events
+
+    def _get(self, path):
+        known = self.pages.get(path)
+        headers = {'If-None-Match': known[0]} if known and known[0] else {}
+        return self.client.get(path, headers=headers)
+
+    def _event(self, now, entity_id, name, old, new):
+        from datetime import datetime
+
+        return {'time': datetime.fromtimestamp(now).isoformat(timespec='seconds'), 'collection': self.collection,
+                'id': entity_id, 'name': name, 'field': self.field, 'from': old, 'to': new}
+
+
+class Debouncer:
+    """Holds transitions back until the new value has lasted `delay` seconds.
+
+    An entity that changes again while held is merged into one transition
+    from the value it had before the first change; one that flips back to
+    that value in time is dropped, and counted in `suppressed`.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.held = {}  # (collection, ID) -> (event, time.monotonic() of its latest change)
+        self.suppressed = 0
+
+    def push(self, events):
+        """Take new transitions and return those that are due, including earlier ones whose delay has passed."""
+        if not self.delay:
+            return list(events)
+        now = time.monotonic()
+        for event in events:
+            key = event['collection'], event['id']
+            held = self.held.get(key)
+            if held is None:
+                self.held[key] = event, now
+            elif held[0]['from'] == event['to']:
+                del self.held[key]
+                self.suppressed += 1
+            else:
+                self.held[key] = dict(event, **{'from': held[0]['from']}), now
+        due = [key for key, (_, changed) in self.held.items() if now - changed >= self.delay]
+        return [self.held.pop(key)[0] for key in due]
+
+
+class Hook:
+    """A shell command or Garden action run for matching transitions, at most `rate` times a minute (0 for no limit)."""
+
+    def __init__(self, name, command=None, action_id=None, params='', collections=(), ids=(), from_values=(),
+                 to_values=(), rate=DEFAULT_HOOK_RATE, timeout=DEFAULT_HOOK_TIMEOUT):
+        self.name = name
+        self.command = command
+        self.action_id = action_id
+        self.params = params
+        self.collections = set(collections)
+        self.ids = set(ids)
+        self.from_values = {value.upper() for value in from_values}
+        self.to_values = {value.upper() for value in to_values}
+        self.rate = rate
+        self.timeout = timeout
+        self.tokens = rate
+        self.refilled = time.monotonic()
+        self.runs = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def matches(self, event):
+        return ((not self.collections or event['collection'] in self.collections)
+                and (not self.ids or event['id'] in self.ids)
+                and (not self.from_values or _upper(event['from']) in self.from_values)
+                and (not self.to_values or _upper(event['to']) in self.to_values))
+
+    def allow(self):
+        """Take a run from the token bucket, returning False (and counting a drop) if there is none left."""
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.refilled) * self.rate / 60)
+        self.refilled = now
+        if self.tokens < 1:
+            self.dropped += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def run(self, event, client):
+        """Run the hook for one transition, raising RuntimeError if it failed."""
+        values = {key: '' if value is None else value for key, value in event.items()}
+        if self.command:
+            import subprocess
+            import sys
+
+            env = dict(os.environ, **{f'GARDEN_{key.upper()}': str(value) for key, value in values.items()})
+            try:
+                result = subprocess.run(self.command, shell=True, env=env, input=json.dumps(event), text=True,
+                                        stdout=sys.stderr, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                raise RuntimeError(f'timed out after {self.timeout:g}s')
+            if result.returncode:
+                raise RuntimeError(f'exit status {result.returncode}')
+            return
+
+        from garden.batch import execute_path
+
+        # Executing has side effects: straight to the primary, never retried
+        path = execute_path(self.action_id, self.params.format_map(values).split(','))
+        response = client.get(path, idempotent=False, primary=True, timeout=(client.connect_timeout, self.timeout))
+        if response.status_code != 200:
+            raise RuntimeError(f'action {self.action_id} answered {response.status_code}: {response.text.strip()[:80]}')
+
+
+def _upper(value):
+    return '' if value is None else str(value).upper()
+
+
+def load_hooks(path):
+    """The hooks defined in an INI file (see the module docstring), or [] if there is no file. Raises ValueError."""
+    import configparser
+
+    from garden.batch import parse_ids
+
+    parser = configparser.ConfigParser(interpolation=None)  # Commands may contain '%'
+    if not parser.read(path):
+        return []
+    hooks = []
+    for name in parser.sections():
+        section = parser[name]
+        split = lambda key: section.get(key, '').replace(',', ' ').split()
+        if bool(section.get('command')) == bool(section.get('action')):
+            raise ValueError(f"Hook '{name}' in {path} needs either a command or an action")
+        collections = split('on')
+        unknown = set(collections) - set(WATCHED)
+        if unknown:
+            raise ValueError(f"Hook '{name}' in {path}: 'on' takes {' or '.join(WATCHED)}, not {', '.join(sorted(unknown))}")
+        try:
+            hooks.append(Hook(
+                name, command=section.get('command'), action_id=section.getint('action'), params=section.get('params', ''),
+                collections=collections, ids=parse_ids(split('ids')), from_values=split('from'), to_values=split('to'),
+                rate=section.getfloat('rate', DEFAULT_HOOK_RATE), timeout=section.getfloat('timeout', DEFAULT_HOOK_TIMEOUT)))
+        except ValueError as e:
+            raise ValueError(f"Hook '{name}' in {path}: {e}")
+    return hooks
+
+
+class HookRunner:
+    """Runs hooks on a small thread pool, so a slow hook never holds up polling; `report(hook, event, error)` hears of failures."""
+
+    def __init__(self, hooks, client, report, workers=4):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.hooks = hooks
+        self.client = client
+        self.report = report
+        self.executor = ThreadPoolExecutor(max_workers=workers) if hooks else None
+        self._lock = threading.Lock()
+
+    def dispatch(self, event):
+        for hook in self.hooks:
+            if hook.matches(event) and hook.allow():
+                self.executor.submit(self._run, hook, event)
+
+    def _run(self, hook, event):
+        try:
+            hook.run(event, self.client)
+            error = None
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        with self._lock:
+            hook.runs += 1
+            hook.failed += error is not None
+        if error is not None:
+            self.report(hook, event, error)
+
+    def close(self):
+        """Wait for the hooks already started."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,79 @@
+"""Machine-readable output for the listing and watch commands (--output jsonl|csv|tsv).
+
+Records are written one line each as soon as they are produced, without
+styling or table layout, so scripts never have to strip colour codes or
+re-split columns.
+"""
+import sys
+
+import click
+
+OUTPUT_FORMATS = ('table', 'jsonl', 'csv', 'tsv')
+
+
+def output_option(command):
+    return click.option('--output', '-o', type=click.Choice(OUTPUT_FORMATS), default='table', show_default=True,
+                        help='Output format; jsonl, csv and tsv write one unstyled record per line.')(command)
+
+
+def json_encoder():
+    """The fastest available function turning a record into a compact JSON string.
+
+    orjson is used when installed (pip install garden[fast]), with the json
+    module as the fallback and for anything orjson refuses, such as integers
+    wider than 64 bits.
+    """
+    import json
+
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    try:
+        import orjson
+    except ImportError:
+        return encode
+
+    def dumps(record):
+        try:
+            return orjson.dumps(record).decode('utf-8')
+        except TypeError:
+            return encode(record)
+    return dumps
+
+
+class RecordWriter:
+    """Writes records, given as sequences in `fields` order, in one of the machine-readable formats."""
+
+    def __init__(self, output, fields, file=None):
+        self.output = output
+        self.fields = list(fields)
+        self.file = file or sys.stdout
+        self._json = None
+        if output == 'jsonl':
+            self.dumps = json_encoder()
+        else:
+            import csv
+
+            self.dumps = None
+            self.writer = csv.writer(self.file, delimiter='\t' if output == 'tsv' else ',', lineterminator='\n')
+            self.writer.writerow(self.fields)
+
+    def write(self, record):
+        if self.dumps is not None:
+            self.file.write(self.dumps(dict(zip(self.fields, record))) + '\n')
+        else:
+            self.writer.writerow([self._cell(value) for value in record])
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+        self.flush()
+
+    def _cell(self, value):
+        # Nested values would otherwise come out as Python reprs
+        if isinstance(value, (dict, list)):
+            if self._json is None:
+                self._json = json_encoder()
+            return self._json(value)
+        return value
+
+    def flush(self):
+        self.file.flush()
@@ -0,0 +1,78 @@
+"""Diffing an edited pick list against the one fetched, so edits only send what changed.
+
+The API offers two partial writes for picks: PUT /workers/<id>/update/
+upserts the given picks by plant ID, replacing their paths, and PUT
+/workers/<id>/remove-pick/ drops one pick. A pick's paths are therefore
+the smallest unit that can be sent: an edit is one upsert of the new and
+changed picks plus one removal per deleted pick. Edits these can't
+express, a reordered list or duplicate plant IDs, and those that would
+take more than MAX_PARTIAL_REQUESTS writes, fall back to PATCHing the
+whole list.
+"""
+
+MAX_PARTIAL_REQUESTS = 10  # Past this many writes, one PATCH of the whole list is cheaper
+
+
+def validate_picks(picks):
+    """Check an edited pick list has the shape the API expects, raising ValueError if not."""
+    if picks is None:
+        return []
+    if not isinstance(picks, list):
+        raise ValueError('Expected a list of picks')
+    for number, pick in enumerate(picks, start=1):
+        if not isinstance(pick, dict) or 'plant_id' not in pick:
+            raise ValueError(f'Pick #{number} has no plant_id')
+        if not isinstance(pick.get('paths'), list):
+            raise ValueError(f'Pick #{number} (plant ID {pick["plant_id"]}) needs a list of paths')
+    return picks
+
+
+class PickChanges:
+    """The writes that turn the `original` picks into the `edited` ones.
+
+    `upserts` are the new picks and those whose paths changed, `removals`
+    the plant IDs whose picks were deleted. When `replace` is set the
+    edit can't be made with partial writes and the whole list has to be
+    sent instead; `reason` says why.
+    """
+
+    def __init__(self, original, edited):
+        self.edited = [{'plant_id': pick['plant_id'], 'paths': pick['paths']} for pick in edited]
+        before = {pick['plant_id']: pick['paths'] for pick in original}
+        after = {pick['plant_id']: pick['paths'] for pick in self.edited}
+
+        self.upserts = [pick for pick in self.edited if before.get(pick['plant_id']) != pick['paths']]
+        self.removals = [plant_id for plant_id in before if plant_id not in after]
+
+        # Upserts keep existing picks in place and append new ones, so that is the only order they can produce
+        kept = [pick['plant_id'] for pick in original if pick['plant_id'] in after]
+        added = [pick['plant_id'] for pick in self.edited if pick['plant_id'] not in before]
+        if len(after) != len(self.edited) or len(before) != len(original):
+            self.reason = 'duplicate plant IDs'
+        elif kept + added != [pick['plant_id'] for pick in self.edited]:
+            self.reason = 'the order changed'
+        elif self.writes > MAX_PARTIAL_REQUESTS:
+            self.reason = f'more than {MAX_PARTIAL_REQUESTS} writes'
+        else:
+            self.reason = None
+        self.replace = self.reason is not None
+        self.changed = [(pick['plant_id'], pick['paths']) for pick in original] != \
+            [(pick['plant_id'], pick['paths']) for pick in self.edited]
+
+    def __bool__(self):
+        return self.changed
+
+    @property
+    def writes(self):
+        """Partial writes the edit takes: one upsert for all new and changed picks, one request per removal."""
+        return bool(self.upserts) + len(self.removals)
+
+    def summary(self):
+        if self.replace:
+            return f'replacing all {len(self.edited)} picks, {self.reason}'
+        parts = []
+        if self.upserts:
+            parts.append(f'{len(self.upserts)} added or changed')
+        if self.removals:
+            parts.append(f'{len(self.removals)} removed')
+        return ', '.join(parts)
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Tracer:
+    """Collects timed spans for --timings and --trace. Does nothing until enabled."""
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.origin = time.perf_counter()
+
+    def reset(self, origin=None):
+        self.spans = []
+        self.origin = origin if origin is not None else time.perf_counter()
+
+    def add(self, name, category, start, end, **args):
+        """Record a finished span; `start` and `end` are time.perf_counter() values."""
+        if self.enabled:
+            self.spans.append({
+                'name': name,
+                'cat': category,
+                'start': start,
+                'end': end,
+                'tid': threading.get_ident(),
+                'args': args,
+            })
+
+    def span(self, name, category='cli', **args):
+        """Context manager timing the enclosed block."""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, category, args)
+
+    @contextmanager
+    def _span(self, name, category, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter(), **args)
+
+    def summary(self):
+        """Per-request lines followed by the other spans aggregated by name, as a list of strings."""
+        lines = ['Timings (ms):']
+        totals = {}
+        for span in self.spans:
+            duration = (span['end'] - span['start']) * 1000
+            if span['cat'] == 'http':
+                args = span['args']
+                lines.append(f"  {args['method']} {args['url']} -> {args['status']}  "
+                             f"{args['bytes'] if args['bytes'] is not None else '?'} B  "
+                             f"ttfb {args['ttfb_ms']:.1f}  total {duration:.1f}")
+                name = 'http (all requests)'
+            else:
+                name = span['name']
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + duration)
+
+        for name, (count, total) in totals.items():
+            lines.append(f"  {name:<24} {total:9.1f}  x{count}")
+        lines.append(f"  {'wall':<24} {(time.perf_counter() - self.origin) * 1000:9.1f}")
+        return lines
+
+    def write_chrome_trace(self, path):
+        """Write the spans in Chrome trace event format (load in chrome://tracing or Perfetto)."""
+        events = [{
+            'name': span['name'],
+            'cat': span['cat'],
+            'ph': 'X',
+            'ts': round((span['start'] - self.origin) * 1e6, 1),
+            'dur': round((span['end'] - span['start']) * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': span['tid'],
+            'args': span['args'],
+        } for span in self.spans]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+# Shared by the client and the commands
+tracer = Tracer()
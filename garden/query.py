@@ -0,0 +1,152 @@
+"""--where / --sort / --fields for the listing commands.
+
+Conditions are checked against the raw API dicts before any row is built,
+so entries that are filtered out are never formatted or styled. Equality
+conditions and the sort order are also sent to the server as query
+parameters (`status=DOWN`, `ordering=-since`), which lets an API that
+supports them do the work. Everything is still applied locally afterwards,
+so servers that ignore unknown parameters give the same result.
+"""
+import re
+from itertools import islice
+from operator import itemgetter
+from urllib.parse import urlencode
+
+CONDITION = re.compile(r'^\s*([A-Za-z_][\w.]*)\s*(!=|>=|<=|=|>|<|~)\s*(.*)$')
+
+
+class Column:
+    """A listing column. `key` is the field in the API's JSON, which servers can filter and sort on.
+
+    Columns derived from several fields pass `get` instead and are only
+    filtered and sorted locally.
+    """
+
+    def __init__(self, header, key=None, get=None, color=None):
+        self.header = header
+        self.name = header.lower()
+        self.key = key
+        self.get = get or itemgetter(key)
+        self.color = color
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _matches(value, op, literal):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            literal = _number(literal)
+        except ValueError:
+            value = str(value)
+    else:
+        value = '' if value is None else str(value)
+
+    if op == '=':
+        return value == literal
+    if op == '!=':
+        return value != literal
+    if op == '~':
+        return str(literal).lower() in str(value).lower()
+    try:
+        if op == '>':
+            return value > literal
+        if op == '>=':
+            return value >= literal
+        if op == '<':
+            return value < literal
+        return value <= literal
+    except TypeError:
+        return False
+
+
+class ListingQuery:
+    """Filters, sort keys and column selection for one listing, validated against its columns.
+
+    Raises ValueError with a message fit for the user when an expression or
+    column name is invalid.
+    """
+
+    def __init__(self, columns, where=(), sort=None, fields=None):
+        self.all_columns = columns
+        self.conditions = [self._parse_condition(expression) for expression in where]
+        self.sort_keys = []
+        for name in (sort or '').split(','):
+            name = name.strip()
+            if name:
+                descending = name.startswith('-')
+                self.sort_keys.append((self.column(name.lstrip('-')), descending))
+        if fields:
+            self.columns = [self.column(name.strip()) for name in fields.split(',') if name.strip()]
+        else:
+            self.columns = columns
+
+    def column(self, name):
+        """Look a column up by its lowercased header or by its JSON key."""
+        for column in self.all_columns:
+            if name.lower() == column.name or name == column.key:
+                return column
+        known = ', '.join(column.name for column in self.all_columns)
+        raise ValueError(f"Unknown column '{name}'. Choose from: {known}")
+
+    def _parse_condition(self, expression):
+        match = CONDITION.match(expression)
+        if not match:
+            raise ValueError(f"Can't parse '{expression}'; use FIELD=VALUE, FIELD!=VALUE, FIELD>N, FIELD<=N or FIELD~TEXT")
+        name, op, literal = match.groups()
+        return self.column(name), op, literal.strip()
+
+    def equals(self):
+        """(JSON key, text) pairs of the equality conditions, which a server or the local store can look up."""
+        return [(column.key, literal) for column, op, literal in self.conditions if op == '=' and column.key]
+
+    def path(self, path):
+        """`path` with the conditions and sort order a server could apply added as query parameters."""
+        params = self.equals()
+        if self.sort_keys and all(column.key for column, _ in self.sort_keys):
+            params.append(('ordering', ','.join(('-' if descending else '') + column.key
+                                                for column, descending in self.sort_keys)))
+        if not params:
+            return path
+        return f"{path}{'&' if '?' in path else '?'}{urlencode(params)}"
+
+    def fetch_limit(self, limit):
+        """How many items to ask the server for: all of them if we filter or sort locally."""
+        return None if self.conditions or self.sort_keys else limit
+
+    def apply(self, items, limit=None):
+        """Filter, sort and truncate raw items lazily, then turn them into rows of the selected columns."""
+        if self.conditions:
+            conditions = self.conditions
+            items = (item for item in items
+                     if all(_matches(column.get(item), op, literal) for column, op, literal in conditions))
+        if self.sort_keys:
+            items = list(items)
+            # Sort by the last key first; stable sorts make the earlier keys take precedence
+            for column, descending in reversed(self.sort_keys):
+                items.sort(key=lambda item: _sort_key(column.get(item), descending), reverse=descending)
+        if limit is not None:
+            items = islice(items, limit)
+        columns = self.columns
+        return ([column.get(item) for column in columns] for item in items)
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    @property
+    def colors(self):
+        return [column.color for column in self.columns]
+
+
+def _sort_key(value, descending=False):
+    # Missing values sort after everything else either way, and numbers never get compared with text
+    if value is None:
+        return (-1, 0) if descending else (2, 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    return (1, str(value))
@@ -0,0 +1,99 @@
+import random
+import threading
+import time
+
+DEFAULT_RETRIES = 2
+DEFAULT_BREAKER_THRESHOLD = 5
+
+RETRY_STATUSES = (429, 502, 503, 504)  # Worth another try: throttled or the server is briefly away
+UNAVAILABLE_STATUSES = (502, 503, 504)  # Count towards opening the circuit
+
+
+class RetryPolicy:
+    """How often and how long to wait before retrying an idempotent request.
+
+    Delays use decorrelated jitter (each one drawn between `base_delay` and
+    three times the previous), so many clients retrying at once spread out
+    instead of hitting the server in waves. A retry budget caps retries at
+    `budget_ratio` of the requests made so far, plus `budget_min`, so a
+    failing fleet-wide run doesn't multiply its load on the server.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, base_delay=0.1, max_delay=5.0, budget_ratio=0.2, budget_min=10):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_min = budget_min
+        self.requests = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+
+    def delays(self):
+        """Yield successive retry delays in seconds."""
+        delay = self.base_delay
+        while True:
+            delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+            yield delay
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def spend(self):
+        """Take one retry from the budget, returning False when it is used up."""
+        with self._lock:
+            if self.retried >= self.budget_min + self.budget_ratio * self.requests:
+                return False
+            self.retried += 1
+            return True
+
+
+class CircuitBreaker:
+    """Fails requests fast once the server has failed `threshold` times in a row.
+
+    After `reset_timeout` seconds one trial request is let through: if it
+    succeeds the circuit closes again, otherwise it stays open for another
+    `reset_timeout`. A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=10.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # Let one trial through; restarting the clock holds back the rest, even if the trial never reports back
+            self.opened_at = now
+            return True
+
+    def retry_in(self):
+        """Seconds until the next trial request is allowed."""
+        if self.opened_at is None:
+            return 0
+        return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.threshold and (self.opened_at is not None or self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+
+
+def retry_after(response, limit):
+    """Seconds a 429/503 response asks us to wait, capped at `limit`; None without a usable Retry-After."""
+    value = response.headers.get('Retry-After', '')
+    return min(float(value), limit) if value.isdigit() else None
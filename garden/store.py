@@ -0,0 +1,240 @@
+"""Local SQLite snapshot of the fleet, filled by `garden sync` and read by the --offline listings.
+
+Every entry is kept whole as JSON, so offline listings see exactly what the
+API returned, next to a few indexed columns for lookups: the status
+fields, the timestamp that moves when an entry changes, and each worker's
+picks and paths. Syncs after the first only ask for entries changed since
+the newest one stored; see FleetStore.sync.
+"""
+import json
+import os
+import sqlite3
+import time
+
+# Indexed columns per collection; the last one is the timestamp incremental syncs resume from
+COLUMNS = {
+    'plants': ('name', 'status', 'since'),
+    'workers': ('name', 'resume', 'since'),
+    'actions': ('name', 'group', 'status', 'last_status_change'),
+}
+
+# Older entries in a row, in order, that end an incremental sync; unsorted data practically never produces a run this long
+STOP_AFTER = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plants (id INTEGER PRIMARY KEY, name TEXT, status TEXT, since TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS plants_status ON plants (status);
+CREATE INDEX IF NOT EXISTS plants_since ON plants (since);
+CREATE TABLE IF NOT EXISTS workers (id INTEGER PRIMARY KEY, name TEXT, resume TEXT, since TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS workers_resume ON workers (resume);
+CREATE INDEX IF NOT EXISTS workers_since ON workers (since);
+CREATE TABLE IF NOT EXISTS actions (id INTEGER PRIMARY KEY, name TEXT, "group" TEXT, status TEXT, last_status_change TEXT,
+                                    data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS actions_status ON actions (status);
+CREATE INDEX IF NOT EXISTS actions_last_status_change ON actions (last_status_change);
+CREATE TABLE IF NOT EXISTS picks (worker_id INTEGER NOT NULL, position INTEGER NOT NULL, plant_id INTEGER,
+                                  PRIMARY KEY (worker_id, position));
+CREATE INDEX IF NOT EXISTS picks_plant_id ON picks (plant_id);
+CREATE TABLE IF NOT EXISTS pick_paths (worker_id INTEGER NOT NULL, position INTEGER NOT NULL, plant_id INTEGER,
+                                       path TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS pick_paths_worker_id ON pick_paths (worker_id);
+CREATE INDEX IF NOT EXISTS pick_paths_plant_id ON pick_paths (plant_id, worker_id, position);
+CREATE INDEX IF NOT EXISTS pick_paths_path ON pick_paths (path);
+CREATE TABLE IF NOT EXISTS sync_state (collection TEXT PRIMARY KEY, cursor TEXT, synced_at REAL, full_synced_at REAL);
+"""
+
+
+def default_store_path():
+    from garden.cache import default_cache_dir
+
+    return os.environ.get('GARDEN_STORE') or os.path.join(default_cache_dir(), 'fleet.sqlite3')
+
+
+def _text(value):
+    # Indexed columns hold values as text so `status=1` and `status=DOWN` look up the same way
+    return None if value is None else str(value)
+
+
+class FleetStore:
+    """The snapshot database at `path`, created on first use; as a context manager it closes on exit."""
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def sync_state(self, collection):
+        """(cursor, synced_at, full_synced_at) of a collection, or None if it was never synced."""
+        return self.db.execute('SELECT cursor, synced_at, full_synced_at FROM sync_state WHERE collection = ?',
+                               (collection,)).fetchone()
+
+    def sync(self, collection, fetch, full=False):
+        """Bring one collection up to date, returning (entries written, entries removed, whether it was a full sync).
+
+        `fetch(path)` yields the entries of an API path, following pages.
+        The first sync, and any with full=True, reads the whole collection
+        and drops entries the server no longer has. Later ones ask for
+        entries whose timestamp is at or after the stored cursor, newest
+        first (`since__gte=...&ordering=-since`), and stop after STOP_AFTER
+        older ones in a row, all in order. Servers that ignore those
+        parameters send everything, which is still correct, just slower.
+        Deletions and changes that don't move the timestamp are only picked
+        up by a full sync.
+        """
+        from urllib.parse import urlencode
+
+        key = COLUMNS[collection][-1]
+        state = self.sync_state(collection)
+        cursor = state[0] if state else None
+        full = full or state is None
+        if full:
+            path = f'/{collection}/'
+        else:
+            path = f'/{collection}/?' + urlencode([(f'{key}__gte', cursor or ''), ('ordering', f'-{key}')])
+
+        written = 0
+        seen = []
+        newest = cursor
+        previous = None
+        ordered = True
+        older = 0
+        batch = []
+        with self.db:
+            for entry in fetch(path):
+                stamp = _text(entry.get(key))
+                if not full and cursor is not None and stamp is not None:
+                    # Only trust the order once the server has shown it sorts; otherwise read to the end
+                    ordered = ordered and (previous is None or stamp <= previous)
+                    previous = stamp
+                    older = older + 1 if stamp < cursor else 0
+                    if ordered and older > STOP_AFTER:
+                        break
+                if stamp is not None and (newest is None or stamp > newest):
+                    newest = stamp
+                batch.append(entry)
+                if full:
+                    seen.append(entry['id'])
+                if len(batch) >= 500:
+                    written += self._write(collection, batch)
+                    batch = []
+            written += self._write(collection, batch)
+
+            removed = self._prune(collection, seen) if full else 0
+            now = time.time()
+            self.db.execute(
+                'INSERT INTO sync_state (collection, cursor, synced_at, full_synced_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (collection) DO UPDATE SET cursor = excluded.cursor, synced_at = excluded.synced_at, '
+                'full_synced_at = COALESCE(excluded.full_synced_at, full_synced_at)',
+                (collection, newest, now, now if full else None))
+        return written, removed, full
+
+    def put(self, collection, entry):
+        """Store one entry fetched outside a sync, e.g. a worker whose picks were just edited."""
+        with self.db:
+            self._write(collection, [entry])
+
+    def _write(self, collection, entries):
+        if not entries:
+            return 0
+        columns = COLUMNS[collection]
+        names = ', '.join(f'"{column}"' for column in ('id',) + columns + ('data',))
+        marks = ', '.join('?' * (len(columns) + 2))
+        self.db.executemany(
+            f'INSERT OR REPLACE INTO {collection} ({names}) VALUES ({marks})',
+            [(entry['id'], *(_text(entry.get(column)) for column in columns), json.dumps(entry)) for entry in entries])
+        if collection == 'workers':
+            ids = [(entry['id'],) for entry in entries]
+            self.db.executemany('DELETE FROM picks WHERE worker_id = ?', ids)
+            self.db.executemany('DELETE FROM pick_paths WHERE worker_id = ?', ids)
+            picks = []
+            paths = []
+            for entry in entries:
+                for position, pick in enumerate(entry.get('package', {}).get('picks', [])):
+                    picks.append((entry['id'], position, pick.get('plant_id')))
+                    paths.extend((entry['id'], position, pick.get('plant_id'), path) for path in pick.get('paths', []))
+            self.db.executemany('INSERT INTO picks (worker_id, position, plant_id) VALUES (?, ?, ?)', picks)
+            self.db.executemany('INSERT INTO pick_paths (worker_id, position, plant_id, path) VALUES (?, ?, ?, ?)', paths)
+        return len(entries)
+
+    def _id_table(self, name, ids):
+        # IDs go through a temp table rather than `IN (?, ...)`, which fails past SQLite's variable limit
+        self.db.execute(f'CREATE TEMP TABLE IF NOT EXISTS {name} (id INTEGER PRIMARY KEY)')
+        self.db.execute(f'DELETE FROM {name}')
+        self.db.executemany(f'INSERT OR IGNORE INTO {name} (id) VALUES (?)', ((entry_id,) for entry_id in ids))
+
+    def _prune(self, collection, ids):
+        self._id_table('seen', ids)
+        removed = self.db.execute(f'DELETE FROM {collection} WHERE id NOT IN (SELECT id FROM seen)').rowcount
+        if collection == 'workers':
+            self.db.execute('DELETE FROM picks WHERE worker_id NOT IN (SELECT id FROM seen)')
+            self.db.execute('DELETE FROM pick_paths WHERE worker_id NOT IN (SELECT id FROM seen)')
+        return removed
+
+    def who_uses(self, plant_ids):
+        """The picks that reference any of `plant_ids`, as dicts of plant_id, worker_id, worker, resume, pick and paths.
+
+        Both lookups go through indexes on plant_id, so the cost depends on
+        the number of matching picks, not on the size of the fleet.
+        """
+        uses = {}
+        with self.db:
+            self._id_table('wanted', plant_ids)
+            for plant_id, worker_id, position, name, resume in self.db.execute(
+                    'SELECT picks.plant_id, picks.worker_id, picks.position, workers.name, workers.resume '
+                    'FROM wanted JOIN picks ON picks.plant_id = wanted.id JOIN workers ON workers.id = picks.worker_id '
+                    'ORDER BY picks.plant_id, picks.worker_id, picks.position'):
+                uses[worker_id, position] = {'plant_id': plant_id, 'worker_id': worker_id, 'worker': name, 'resume': resume,
+                                             'pick': position + 1, 'paths': []}
+            for worker_id, position, path in self.db.execute(
+                    'SELECT worker_id, position, path FROM wanted JOIN pick_paths ON pick_paths.plant_id = wanted.id '
+                    'ORDER BY pick_paths.rowid'):
+                if (worker_id, position) in uses:
+                    uses[worker_id, position]['paths'].append(path)
+        return list(uses.values())
+
+    def get(self, collection, entry_id):
+        """One stored entry, or None."""
+        row = self.db.execute(f'SELECT data FROM {collection} WHERE id = ?', (entry_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_items(self, collection, equals=()):
+        """Yield the stored entries of a collection in ID order.
+
+        `equals` holds (field, text) pairs such as ('status', 'DOWN'); those
+        on indexed columns narrow the SQL query. The rest are ignored, so
+        callers filter again on the full entries, as with server pushdown.
+        """
+        clauses = []
+        params = []
+        for field, literal in equals:
+            if field in COLUMNS[collection] and _canonical(literal):
+                clauses.append(f'"{field}" = ?')
+                params.append(literal)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        loads = json.loads
+        for (data,) in self.db.execute(f'SELECT data FROM {collection}{where} ORDER BY id', params):
+            yield loads(data)
+
+
+def _canonical(literal):
+    # Numbers match locally by value ('1.0' finds 1), which text equality would miss; leave those to the caller
+    try:
+        return str(int(literal)) == literal
+    except ValueError:
+        try:
+            float(literal)
+        except ValueError:
+            return True
+        return False
@@ -0,0 +1,298 @@
+"""Streaming renderer for tabulate's tablefmt='plain' layout.
+
+tabulate styles nothing itself, so callers pass it cells that are already
+wrapped in click.style() codes, and it then strips those codes from every
+cell again to measure and type the columns. At tens of thousands of rows
+that dominates the run time. Here cells are passed raw, with an optional
+per-column function choosing the colour, and the codes are only added while
+each line is written. iter_plain_table's output is byte-for-byte what
+tabulate(styled_rows, headers, tablefmt='plain', colalign=...) gives; the
+type detection and number formatting below mirror tabulate's internals, so
+tests/test_table.py compares the two and catches a tabulate release that
+changes them. iter_sampled_table trades that exactness, for tables longer
+than its sample, for writing lines before the last row is known.
+"""
+import functools
+import math
+import re
+from itertools import chain, islice
+
+import click
+
+try:
+    import wcwidth  # tabulate measures with wcwidth when it is installed, so we must too
+except ImportError:
+    wcwidth = None
+
+MIN_PADDING = 2  # Extra width tabulate gives every column with a header
+SEPARATOR = '  '
+RESET = '\x1b[0m'
+CHUNK_LINES = 512
+SAMPLE_ROWS = 1000  # Rows iter_sampled_table lays a streamed table out from
+
+_THOUSANDS = re.compile(r"^(([+-]?[0-9]{1,3})(?:,([0-9]{3}))*)?(?(1)\.[0-9]*|\.[0-9]+)?$")
+
+# Column type ranks, as in tabulate: the most generic type across a column wins
+_NONE, _BOOL, _INT, _FLOAT, _STR = range(5)
+
+_END = object()
+
+
+def _convertible(conv, value):
+    try:
+        conv(value)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def _is_number(value):
+    if type(value) in (float, int):
+        return True
+    if not _convertible(float, value):
+        return False
+    if not isinstance(value, str):
+        return True
+    number = float(value)
+    return not (math.isinf(number) or math.isnan(number)) or value.lower() in ('inf', '-inf', 'nan')
+
+
+def _is_int(value):
+    return type(value) is int or (isinstance(value, str) and _convertible(int, value))
+
+
+def _cell_type(value):
+    if type(value) is int:
+        return _INT
+    if value is None or (isinstance(value, str) and not value):
+        return _NONE
+    if hasattr(value, 'isoformat'):
+        return _STR
+    if type(value) is bool or (isinstance(value, str) and value in ('True', 'False')):
+        return _BOOL
+    if _is_int(value) or (isinstance(value, str) and '.' not in value and _THOUSANDS.match(value)):
+        return _INT
+    if _is_number(value) or (isinstance(value, str) and _THOUSANDS.match(value)):
+        return _FLOAT
+    return _STR
+
+
+def _after_point(text):
+    """Digits after the decimal point, -1 if there is none (tabulate's _afterpoint)."""
+    if text.isdigit():
+        return -1
+    if _is_number(text) or _THOUSANDS.match(text):
+        if _is_int(text):
+            return -1
+        pos = text.rfind('.')
+        pos = text.lower().rfind('e') if pos < 0 else pos
+        return len(text) - pos - 1 if pos >= 0 else -1
+    return -1
+
+
+def _format(value, column_type, styled, prefixed, any_styled):
+    """Cell text as tabulate would print it, before padding and colour."""
+    if value is None:
+        return ''
+    if isinstance(value, str) and not value:
+        return ''
+    if column_type == _INT:
+        text = format(value, '')
+        # tabulate re-formats coloured integers, which drops leading zeros
+        if prefixed and isinstance(value, str) and text.isdigit():
+            text = str(int(text))
+        return text
+    if column_type == _FLOAT:
+        if any_styled and isinstance(value, str):
+            try:
+                return format(float(value), 'g')
+            except (ValueError, TypeError):
+                return value
+        if isinstance(value, str) and ',' in value:
+            value = value.replace(',', '')
+        try:
+            return format(float(value), 'g')
+        except (ValueError, TypeError):
+            return f'{value}'
+    return f'{value}'
+
+
+def _width(text):
+    if wcwidth is not None and not text.isascii():
+        return wcwidth.wcswidth(text)
+    return len(text)
+
+
+@functools.lru_cache(maxsize=None)
+def _prefix(fg):
+    return click.style('', fg=fg, reset=False) if fg else ''
+
+
+def iter_plain_table(rows, headers=(), colalign=None, colors=None):
+    """Yield the lines of a tablefmt='plain' table, one string per line.
+
+    `rows` holds raw (unstyled) cell values. `colors` optionally gives, per
+    column, a function mapping a cell value to a click colour name (or None for
+    just a reset code) -- the equivalent of wrapping that column's cells in
+    click.style(str(value), fg=...).
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    headers = list(headers)
+    ncols = len(headers) if headers else (len(rows[0]) if rows else 0)
+    colors = list(colors or []) + [None] * (ncols - len(colors or []))
+    any_styled = bool(rows) and any(colors)
+
+    columns = []
+    for index in range(ncols):
+        column = _Column(rows, index, headers, colalign, colors[index], any_styled)
+        if column.multiline:
+            # Multiline cells are rare; let tabulate lay those tables out
+            yield from _tabulate_lines(rows, headers, colalign, colors)
+            return
+        columns.append(column)
+
+    yield from _laid_out_lines(columns, headers, len(rows))
+
+
+def iter_sampled_table(rows, headers=(), colalign=None, colors=None, sample=SAMPLE_ROWS):
+    """Like iter_plain_table, but lay the table out from its first `sample` rows and stream the rest.
+
+    A table that fits in the sample comes out exactly as iter_plain_table
+    writes it. For longer ones the first line is written once the sample is
+    in, and the column types, alignment and widths stay as the sample set
+    them. A later cell too wide for its column widens the column from that
+    line on; the lines above keep the narrower layout.
+    """
+    rows = iter(rows)
+    first = list(islice(rows, sample))
+    following = next(rows, _END)
+    headers = list(headers)
+    ncols = len(headers) if headers else (len(first[0]) if first else 0)
+    colors = list(colors or []) + [None] * (ncols - len(colors or []))
+    columns = [_Column(first, index, headers, colalign, colors[index], any(colors)) for index in range(ncols)]
+    if following is _END or any(column.multiline for column in columns):
+        # Nothing to stream (or multiline cells, which need every row): lay out the whole table
+        yield from iter_plain_table(first if following is _END else chain(first, [following], rows), headers, colalign, colors)
+        return
+
+    yield from _laid_out_lines(columns, headers, len(first))
+    for row in chain([following], rows):
+        cells = []
+        for column, value in zip(columns, row):
+            text, fg, width, trailing = column.cell(value)
+            if column.style:
+                text = _prefix(fg) + text + RESET
+            column.width = max(column.width, width + trailing)
+            cells.append(_pad(text + ' ' * trailing, width + trailing, column.width, column.align))
+        yield SEPARATOR.join(cells).rstrip()
+
+
+class _Column:
+    """Type, alignment and width of one column of `rows`, decided as tabulate decides them, plus its formatted cells."""
+
+    def __init__(self, rows, index, headers, colalign, style, any_styled):
+        self.style = style
+        self.any_styled = any_styled
+        values = [row[index] for row in rows]
+        # Styled cells are str(value) wrapped in codes, so type and format the string
+        if style:
+            values = [str(value) for value in values]
+        column_type = _BOOL
+        for value in values:
+            column_type = max(column_type, _cell_type(value))
+            if column_type == _STR:
+                break  # Nothing is more generic, so the rest of the column can't change it
+        self.type = column_type
+
+        self.fgs = [style(row[index]) for row in rows] if style else [None] * len(rows)
+        texts = [_format(value, column_type, bool(style), bool(fg), any_styled) for value, fg in zip(values, self.fgs)]
+        self.multiline = any('\n' in text for text in texts)
+
+        align = 'decimal' if column_type in (_INT, _FLOAT) else 'left'
+        if colalign and rows and index < len(colalign) and colalign[index] != 'global':
+            align = colalign[index]
+        self.align = align
+        self.texts = texts = [self._strip(text, fg) for text, fg in zip(texts, self.fgs)]
+
+        self.widths = [_width(text) for text in texts]
+        if align == 'decimal':
+            decimals = [_after_point(text) for text in texts]
+            self.decimals = max(decimals, default=-1)
+            self.trailing = [self.decimals - decimal for decimal in decimals]
+        else:
+            self.decimals = -1
+            self.trailing = [0] * len(texts)
+
+        width = max((w + t for w, t in zip(self.widths, self.trailing)), default=0)
+        if headers:
+            width = max(width, _width(str(headers[index])) + MIN_PADDING)
+        self.width = width
+
+    def _strip(self, text, fg):
+        # tabulate strips cells, but escape codes shield the whitespace they enclose
+        if self.align == 'decimal' or not self.align:
+            return text
+        if self.style:
+            # A styled cell always ends in a reset code, and starts with one only when coloured
+            return text if fg else text.lstrip()
+        return text.strip()
+
+    def cell(self, value):
+        """(text, colour, width, trailing padding) of a cell outside the rows the column was laid out from."""
+        fg = self.style(value) if self.style else None
+        text = self._strip(_format(str(value) if self.style else value, self.type, bool(self.style), bool(fg), self.any_styled), fg)
+        trailing = max(self.decimals - _after_point(text), 0) if self.align == 'decimal' else 0
+        return text, fg, _width(text), trailing
+
+
+def _laid_out_lines(columns, headers, nrows):
+    """The header line and the lines of the rows the columns were laid out from."""
+    if headers:
+        yield SEPARATOR.join(_pad(str(header), _width(str(header)), column.width, column.align)
+                             for header, column in zip(headers, columns)).rstrip()
+    for row_index in range(nrows):
+        cells = []
+        for column in columns:
+            text = column.texts[row_index]
+            if column.style:
+                text = _prefix(column.fgs[row_index]) + text + RESET
+            trailing = column.trailing[row_index]
+            cells.append(_pad(text + ' ' * trailing, column.widths[row_index] + trailing, column.width, column.align))
+        yield SEPARATOR.join(cells).rstrip()
+
+
+def _pad(text, width, column_width, align):
+    pad = column_width - width
+    if align == 'left':
+        return text + ' ' * pad
+    if align == 'center':
+        return ' ' * (pad // 2) + text + ' ' * (pad - pad // 2)
+    if not align:
+        return text
+    return ' ' * pad + text
+
+
+def _tabulate_lines(rows, headers, colalign, colors):
+    from tabulate import tabulate
+
+    styled = [[click.style(str(value), fg=style(value)) if style else value for value, style in zip(row, colors)]
+              for row in rows]
+    yield from tabulate(styled, headers, tablefmt='plain', colalign=colalign).split('\n')
+
+
+def echo_table(rows, headers=(), colalign=None, colors=None, file=None, sample=None):
+    """Write a plain table as it is built, in chunks, like click.echo(tabulate(...)) would.
+
+    With `sample`, the layout comes from that many first rows and the rest
+    are written as they arrive (see iter_sampled_table). click.echo still
+    decides whether the colour codes reach the terminal.
+    """
+    lines = iter_sampled_table(rows, headers, colalign, colors, sample) if sample else iter_plain_table(rows, headers, colalign, colors)
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_LINES:
+            click.echo('\n'.join(chunk), file=file)
+            chunk = []
+    if chunk:
+        click.echo('\n'.join(chunk), file=file)
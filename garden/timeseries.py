@@ -0,0 +1,306 @@
+"""Compact on-disk time series for `garden record` and `garden history`.
+
+Each recorded source, such as one plant's data, is a directory:
+
+    series.json    the fields, their column files and types, and the sample and string counts
+    time.blocks    int64 pairs per block of samples: first timestamp (ms) and first sample index
+    time.deltas    uint32 per sample: milliseconds since the previous sample of its block
+    c<N>           one column per field, a value per sample: float64 (NaN where the
+                   field was absent) or, for text, uint32 codes into its strings
+                   (MISSING where absent)
+    c<N>.strings   for text fields, the distinct values in code order, one JSON string per line
+
+Timestamps are kept in order (see SeriesWriter.append). Appends only ever
+add to the end of each file, and series.json is rewritten last, so its
+sample and string counts are what readers trust; anything past them is an
+append that didn't finish and is cut off when the series is opened for
+writing again.
+Readers memory-map the files and decode timestamps only
+for the blocks a query touches, so a query over millions of samples never
+builds a Python object per sample it doesn't return.
+"""
+import json
+import math
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+BLOCK = 4096  # Samples per timestamp block
+MAX_DELTA = 0xFFFFFFFF
+MISSING = 0xFFFFFFFF  # Text code for "no value in this sample"
+
+DURATION = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h|d|w)\s*$')
+UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def default_history_dir():
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.environ.get('GARDEN_HISTORY') or os.path.join(base, 'garden', 'history')
+
+
+def parse_duration(text):
+    """Seconds in a duration such as '90s', '15m', '2h' or '7d'. Raises ValueError."""
+    match = DURATION.match(text)
+    if not match:
+        raise ValueError(f"Invalid duration '{text}'; use a number with ms, s, m, h, d or w, e.g. 15m")
+    return float(match.group(1)) * UNITS[match.group(2)]
+
+
+def parse_time(text, now=None):
+    """Epoch milliseconds for a duration back from now ('2h') or an ISO date/time. Raises ValueError."""
+    from datetime import datetime
+
+    now = time.time() if now is None else now
+    try:
+        return int((now - parse_duration(text)) * 1000)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid time '{text}'; use a duration such as 2h or an ISO date/time such as 2024-06-01T12:00")
+    return int(moment.timestamp() * 1000)  # Times without an offset are local
+
+
+def _read_strings(path, count):
+    """The first `count` strings of a strings file, and how many bytes they take up."""
+    strings = []
+    size = 0
+    if count:
+        with open(path, 'rb') as f:
+            for line in f:
+                if len(strings) == count:
+                    break
+                strings.append(json.loads(line))
+                size += len(line)
+    return strings, size
+
+
+def _number(value):
+    if isinstance(value, (int, float)):  # bool included: True records as 1.0
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class SeriesWriter:
+    """Appends samples to the series in `directory`, creating it if needed.
+
+    Call append() per sample and flush() to make the appended samples
+    visible to readers. Raises OSError if another process is recording
+    the same series.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = open(os.path.join(directory, '.lock'), 'w')
+        try:
+            import fcntl
+
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:
+            pass  # No advisory locks on this platform
+        except OSError:
+            self._lock.close()
+            raise OSError(f'{directory} is already being recorded by another process')
+
+        self.manifest = _load_manifest(directory) or {'count': 0, 'blocks': 0, 'last': None, 'fields': {}}
+        self.count = self.manifest['count']
+        self.blocks = self.manifest['blocks']
+        self.last = self.manifest['last']
+        self.fields = self.manifest['fields']
+        self._files = {}
+        # Cut off whatever an interrupted append left past the committed count
+        self._open('time.blocks', 16 * self.blocks)
+        self._open('time.deltas', 4 * self.count)
+        self._codes = {}
+        for name, field in self.fields.items():
+            self._open(field['file'], (8 if field['type'] == 'f64' else 4) * self.count)
+            if field['type'] == 'text':
+                strings, size = _read_strings(os.path.join(directory, field['file'] + '.strings'), field['strings'])
+                self._open(field['file'] + '.strings', size)
+                self._codes[name] = {text: code for code, text in enumerate(strings)}
+
+    def _open(self, name, size):
+        path = os.path.join(self.directory, name)
+        with open(path, 'ab') as f:
+            f.truncate(size)
+        self._files[name] = open(path, 'ab')
+        return self._files[name]
+
+    def append(self, timestamp_ms, values):
+        """Add one sample: `values` maps field names to numbers or text. Fields missing from it record as absent.
+
+        Timestamps never go backwards within a series, since readers bisect
+        them: a sample stamped before the previous one, e.g. after the
+        clock was stepped back, is recorded at the previous one's time.
+        """
+        timestamp_ms = int(timestamp_ms)
+        if self.last is not None and timestamp_ms < self.last:
+            timestamp_ms = self.last
+        block_start = self.manifest.get('block_start', 0)
+        delta = None if self.last is None else timestamp_ms - self.last
+        if delta is None or not 0 <= delta <= MAX_DELTA or self.count - block_start >= BLOCK:
+            self._files['time.blocks'].write(array('q', (timestamp_ms, self.count)).tobytes())
+            self.blocks += 1
+            self.manifest['block_start'] = self.count
+            delta = 0
+        self._files['time.deltas'].write(array('I', (delta,)).tobytes())
+        self.last = timestamp_ms
+
+        for name, value in values.items():
+            if name not in self.fields and value is not None:
+                self._add_field(name, value)
+        for name, field in self.fields.items():
+            value = values.get(name)
+            if field['type'] == 'f64':
+                encoded = array('d', (math.nan if value is None else _number(value),))
+            else:
+                encoded = array('I', (MISSING if value is None else self._code(name, value),))
+            self._files[field['file']].write(encoded.tobytes())
+        self.count += 1
+
+    def _add_field(self, name, value):
+        # Numbers sent as strings ("12.5") still make a numeric field
+        kind = 'text' if math.isnan(_number(value)) else 'f64'
+        field = self.fields[name] = {'file': f'c{len(self.fields)}', 'type': kind}
+        column = self._open(field['file'], 0)
+        # Earlier samples didn't have the field
+        if kind == 'f64':
+            column.write(array('d', [math.nan]).tobytes() * self.count)
+        else:
+            field['strings'] = 0
+            self._codes[name] = {}
+            self._open(field['file'] + '.strings', 0)
+            column.write(array('I', [MISSING]).tobytes() * self.count)
+
+    def _code(self, name, value):
+        if not isinstance(value, str):
+            value = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            # New strings are appended to the field's file; series.json only keeps their count
+            code = codes[value] = len(codes)
+            self._files[self.fields[name]['file'] + '.strings'].write(json.dumps(value).encode() + b'\n')
+        return code
+
+    def flush(self):
+        """Commit the samples appended so far."""
+        for f in self._files.values():
+            f.flush()
+        for name, codes in self._codes.items():
+            self.fields[name]['strings'] = len(codes)
+        self.manifest.update(count=self.count, blocks=self.blocks, last=self.last, fields=self.fields)
+        path = os.path.join(self.directory, 'series.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._lock.close()
+
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, 'series.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class SeriesReader:
+    """Memory-mapped read access to the series in `directory`. Raises FileNotFoundError if nothing was recorded there."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        manifest = _load_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f'No recording in {directory}')
+        self.count = manifest['count']
+        self.fields = manifest['fields']
+        self._maps = []
+        blocks = self._map('time.blocks', 'q', 2 * manifest['blocks'])
+        self.block_times = blocks[0::2]
+        self.block_starts = blocks[1::2]
+        self.deltas = self._map('time.deltas', 'I', self.count)
+        self._strings = {}
+
+    def _map(self, name, typecode, length):
+        import mmap
+
+        if not length:
+            return memoryview(array(typecode))
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(typecode)[:length]
+
+    def timestamps(self, start_ms=None, end_ms=None):
+        """(index of the first sample, array of timestamps) for the samples from start_ms up to end_ms inclusive."""
+        times = self.block_times
+        first_block = 0 if start_ms is None else max(bisect_right(times, start_ms) - 1, 0)
+        last_block = len(times) if end_ms is None else bisect_right(times, end_ms)
+        if first_block >= last_block:
+            return 0, array('q')
+
+        decoded = array('q')
+        for block in range(first_block, last_block):
+            begin = self.block_starts[block]
+            end = self.block_starts[block + 1] if block + 1 < len(times) else self.count
+            decoded.extend(accumulate(self.deltas[begin + 1:end], initial=times[block]))
+        offset = self.block_starts[first_block]
+        low = 0 if start_ms is None else bisect_left(decoded, start_ms)
+        high = len(decoded) if end_ms is None else bisect_right(decoded, end_ms)
+        return offset + low, decoded[low:high]
+
+    def column(self, name):
+        """The field's values per sample: floats (NaN where absent) or text codes, see `strings`. Raises KeyError."""
+        field = self.fields[name]
+        return self._map(field['file'], 'd' if field['type'] == 'f64' else 'I', self.count)
+
+    def strings(self, name):
+        """The text values the codes of a text field index into, or None for a numeric field."""
+        field = self.fields[name]
+        if field['type'] != 'text':
+            return None
+        if name not in self._strings:
+            self._strings[name] = _read_strings(os.path.join(self.directory, field['file'] + '.strings'), field['strings'])[0]
+        return self._strings[name]
+
+    def close(self):
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # A caller still holds a view; the map goes when it does
+
+
+def windows(timestamps, values, every_ms):
+    """Yield (window start ms, count, min, max, avg) for numeric `values` aligned with `timestamps`.
+
+    Windows are aligned to multiples of `every_ms` since the epoch; empty
+    ones are skipped, and absent values (NaN) don't count.
+    """
+    position = 0
+    total = len(timestamps)
+    while position < total:
+        start = timestamps[position] // every_ms * every_ms
+        end = bisect_left(timestamps, start + every_ms, position)
+        chunk = values[position:end]
+        subtotal = sum(chunk)
+        if subtotal != subtotal:  # Only NaNs (or infinities cancelling out) make the sum NaN
+            chunk = [value for value in chunk if value == value]
+            subtotal = sum(chunk)
+        if chunk:
+            yield start, len(chunk), min(chunk), max(chunk), subtotal / len(chunk)
+        position = end
@@ -5,12 +5,16 @@ setup(
     version='0.1.0',
     packages=find_packages(),
     include_package_data=True,
+    python_requires='>=3.9',  # str.removeprefix, Executor.shutdown(cancel_futures=True)
     install_requires=[
         'click',
         'requests',
         'tabulate',
         'pyaml',
     ],
+    extras_require={
+        'fast': ['orjson'],  # Faster encoding for --output jsonl
+    },
     entry_points='''
         [console_scripts]
         garden=garden.cli:cli
@@ -0,0 +1,144 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from garden import batch as batch_module
+from garden.batch import MAX_IDS, parse_ids, run_batch
+from garden.retry import RetryPolicy
+
+
+@pytest.mark.parametrize('tokens, expected', [
+    ([], []),
+    (['5'], [5]),
+    (['1,2,3'], [1, 2, 3]),
+    (['10-13'], [10, 11, 12, 13]),
+    (['7-7'], [7]),
+    (['3', '1,2', '2-4'], [1, 2, 3, 4]),
+    ([' 4 , ,2 ', ''], [2, 4]),
+    (['0'], [0]),
+])
+def test_parse_ids(tokens, expected):
+    assert parse_ids(tokens) == expected
+
+
+@pytest.mark.parametrize('token', ['x', '-5', '5-', '1-2-3', '9-3', '1.5', 'all', '3-a'])
+def test_parse_ids_rejects(token):
+    with pytest.raises(ValueError, match='Invalid ID'):
+        parse_ids([token])
+
+
+def test_parse_ids_caps_ranges():
+    assert len(parse_ids([f'1-{MAX_IDS}'])) == MAX_IDS
+    with pytest.raises(ValueError, match='too large'):
+        parse_ids(['1-100000000'])
+    with pytest.raises(ValueError, match='too large'):
+        parse_ids([f'1-{MAX_IDS}', f'{MAX_IDS + 1}-{MAX_IDS + 1}'])  # Counted together with what came before
+
+
+def test_parse_ids_caps_single_ids(monkeypatch):
+    import garden.batch
+
+    monkeypatch.setattr(garden.batch, 'MAX_IDS', 3)
+    assert parse_ids(['1,2,3,3']) == [1, 2, 3]
+    with pytest.raises(ValueError, match='Too many IDs'):
+        parse_ids(['1,2,3,4'])
+
+
+def refused():
+    """The ConnectionError requests raises when nothing listens on the port."""
+    try:
+        requests.get('http://127.0.0.1:1/', timeout=1)
+    except requests.ConnectionError as e:
+        return e
+
+
+class Client:
+    """Answers executes per row value from a script of statuses, (status, headers) pairs or exceptions."""
+
+    def __init__(self, scripts):
+        self.scripts = {value: list(script) for value, script in scripts.items()}
+        self.retry = RetryPolicy(base_delay=0.01, max_delay=5)
+        self.calls = []
+
+    def get(self, path, idempotent=None, primary=False):
+        assert idempotent is False and primary
+        value = parse_qs(urlsplit(path).query)['params'][0]
+        self.calls.append(value)
+        script = self.scripts[value]
+        outcome = script.pop(0) if len(script) > 1 else script[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        page = requests.Response()
+        page.status_code = status
+        page._content = b'done'
+        page.headers.update(headers)
+        return page
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(batch_module.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def run(client, values, retries=2):
+    results = []
+    failed = run_batch(client, 1, ['x'], [(n, [value], None) for n, value in enumerate(values, start=2)], 2, retries,
+                       results.append)
+    return failed, {result['params']['x']: (result['ok'], result['status_code'], result['attempts']) for result in results}
+
+
+def test_only_rows_that_certainly_did_not_run_are_retried(sleeps):
+    client = Client({
+        'ok': [200],
+        'refused': [refused(), 200],
+        'connect-timeout': [requests.ConnectTimeout('slow connect', request=requests.Request()), 200],
+        'read-timeout': [requests.ReadTimeout('slow answer', request=requests.Request())],
+        'reset': [requests.ConnectionError('Connection aborted.', request=requests.Request())],
+        'breaker-open': [requests.ConnectionError('http://garden.test is failing'), 200],
+        'throttled': [429, 200],
+        'unavailable-with-retry-after': [(503, {'Retry-After': '2'}), 200],
+        'unavailable': [503],
+        'bad-gateway': [502],
+        'gateway-timeout': [504],
+        'error': [500],
+        'rejected': [400],
+    })
+    failed, results = run(client, list(client.scripts))
+    assert results == {
+        'ok': (True, 200, 1),
+        'refused': (True, 200, 2),
+        'connect-timeout': (True, 200, 2),
+        'read-timeout': (False, None, 1),
+        'reset': (False, None, 1),
+        'breaker-open': (True, 200, 2),
+        'throttled': (True, 200, 2),
+        'unavailable-with-retry-after': (True, 200, 2),
+        'unavailable': (False, 503, 1),
+        'bad-gateway': (False, 502, 1),
+        'gateway-timeout': (False, 504, 1),
+        'error': (False, 500, 1),
+        'rejected': (False, 400, 1),
+    }
+    assert failed == 7
+    assert len(sleeps) == 1 and sleeps[0] >= 2  # One backoff round, at least as long as the server asked
+
+
+def test_retries_are_bounded(sleeps):
+    client = Client({'throttled': [429]})
+    assert run(client, ['throttled'], retries=2) == (1, {'throttled': (False, 429, 3)})
+    assert client.calls == ['throttled'] * 3
+    client.calls.clear()
+    assert run(client, ['throttled'], retries=0) == (1, {'throttled': (False, 429, 1)})
+    assert client.calls == ['throttled']
+
+
+def test_invalid_rows_are_reported_without_executing(sleeps):
+    client = Client({})
+    results = []
+    assert run_batch(client, 1, ['x'], [(2, None, 'Missing value')], 2, 2, results.append) == 1
+    assert results == [{'row': 2, 'ok': False, 'status_code': None, 'latency_ms': None, 'attempts': 0, 'error': 'Missing value'}]
+    assert client.calls == []
@@ -0,0 +1,205 @@
+import os
+
+import pytest
+import requests
+
+from garden import cache as cache_module
+from garden.cache import MemoryCache, ResponseCache, build_response
+from garden.client import GardenClient
+
+HOST = 'http://garden.test'
+
+
+def response(body, status=200, etag=None):
+    page = requests.Response()
+    page.status_code = status
+    page._content = body.encode()
+    page.encoding = 'utf-8'
+    if etag:
+        page.headers['ETag'] = etag
+    page.headers['Content-Type'] = 'application/json'
+    return page
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path), ttls={'/plants/': 30, '/plants/1/data/': 5})
+
+
+class Server:
+    """Stands in for GardenClient.request: answers GETs from `bodies`, with ETags and 304s, and records the headers sent."""
+
+    def __init__(self):
+        self.bodies = {}
+        self.sent = []
+
+    def request(self, method, path, headers=None, **kwargs):
+        headers = headers or {}
+        self.sent.append((path, headers))
+        body = self.bodies[path]
+        etag = f'"{len(body)}-{hash(body) & 0xffff}"'
+        if headers.get('If-None-Match') == etag:
+            return response('', status=304, etag=etag)
+        return response(body, etag=etag)
+
+
+@pytest.fixture
+def client(cache, monkeypatch):
+    client = GardenClient(HOST)
+    client.cache = cache
+    client.server = Server()
+    monkeypatch.setattr(client, 'request', client.server.request)
+    return client
+
+
+def test_ttl_for_takes_the_longest_prefix(cache):
+    assert cache.ttl_for('/plants/1/data/') == 5
+    assert cache.ttl_for('/plants/1/') == 30
+    assert cache.ttl_for('/actions/') == 0
+
+
+def test_store_and_lookup(cache, clock):
+    url = f'{HOST}/plants/1/'
+    assert cache.lookup(url) is None
+    entry = cache.store(url, response('{"id": 1}', etag='"a"'))
+    assert cache.lookup(url) == entry
+    rebuilt = build_response(cache.lookup(url))
+    assert rebuilt.json() == {'id': 1} and rebuilt.headers['ETag'] == '"a"' and rebuilt.status_code == 200
+
+    assert cache.is_fresh(entry, '/plants/1/')
+    clock[0] += 30
+    assert not cache.is_fresh(entry, '/plants/1/')
+    cache.touch(url, entry)
+    assert cache.is_fresh(cache.lookup(url), '/plants/1/')
+
+
+def test_fresh_entries_are_served_without_a_request(client, clock):
+    client.server.bodies['/plants/1/'] = '{"id": 1}'
+    assert client.get('/plants/1/', cache=True).json() == {'id': 1}
+    clock[0] += 29
+    assert client.get('/plants/1/', cache=True).json() == {'id': 1}
+    assert len(client.server.sent) == 1
+
+
+def test_stale_entries_are_revalidated_with_their_etag(client, clock):
+    client.server.bodies['/plants/1/'] = '{"id": 1}'
+    first = client.get('/plants/1/', cache=True)
+    clock[0] += 31
+
+    assert client.get('/plants/1/', cache=True).json() == {'id': 1}  # A 304 answered from the cache
+    assert client.server.sent[-1][1]['If-None-Match'] == first.headers['ETag']
+    assert client.get('/plants/1/', cache=True) is not None and len(client.server.sent) == 2  # Fresh again after the 304
+
+    client.server.bodies['/plants/1/'] = '{"id": 1, "name": "new"}'
+    clock[0] += 31
+    assert client.get('/plants/1/', cache=True).json()['name'] == 'new'
+    assert client.get('/plants/1/', cache=True).json()['name'] == 'new'
+    assert len(client.server.sent) == 3
+
+
+def test_revalidate_and_refresh_always_ask(client):
+    client.server.bodies['/plants/1/'] = '{"id": 1}'
+    client.get('/plants/1/', cache=True)
+    client.get('/plants/1/', cache=True, revalidate=True)
+    client.refresh = True
+    client.get('/plants/1/', cache=True)
+    assert len(client.server.sent) == 3
+    assert all('If-None-Match' in headers for _, headers in client.server.sent[1:])
+
+
+def test_uncached_paths_always_ask(client):
+    client.server.bodies['/actions/'] = '[]'
+    client.get('/actions/', cache=True)
+    client.get('/actions/', cache=True)
+    assert len(client.server.sent) == 2
+
+
+def test_invalidate(cache):
+    urls = [f'{HOST}/plants/', f'{HOST}/plants/1/', f'{HOST}/plants/1/data/', f'{HOST}/plants/2/', f'{HOST}/workers/1/',
+            'http://other.test/plants/1/']
+    for url in urls:
+        cache.store(url, response('{}'))
+    cached = lambda: [url for url in urls if cache.lookup(url) is not None]
+
+    cache.invalidate(f'{HOST}/plants/1/')  # Narrower than a collection
+    assert cached() == [f'{HOST}/plants/', f'{HOST}/plants/2/', f'{HOST}/workers/1/', 'http://other.test/plants/1/']
+    cache.invalidate(f'{HOST}/plants/')  # A whole collection
+    assert cached() == [f'{HOST}/workers/1/', 'http://other.test/plants/1/']
+    cache.invalidate(f'{HOST}/')  # Wider than a collection
+    assert cached() == ['http://other.test/plants/1/']
+    cache.clear()
+    assert cached() == []
+
+
+def test_writes_invalidate_the_collection(client, monkeypatch):
+    client.server.bodies['/plants/'] = '[]'
+    client.get('/plants/', cache=True)
+    monkeypatch.undo()  # The real request(), with a session that answers the PATCH
+    session = client._get_session()
+    monkeypatch.setattr(session, 'request', lambda method, url, **kwargs: response('{}'))
+    client.patch('/plants/1/update/', json={})
+    assert client.cache.lookup(f'{HOST}/plants/') is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000)
+    body = 'x' * 2000
+    for n in range(4):
+        url = f'{HOST}/plants/{n}/'
+        cache.store(url, response(body))
+        path = cache._entry_path(url)
+        os.utime(path, (n, n))
+    cache.lookup(f'{HOST}/plants/0/')  # Now the most recently used
+    cache.store(f'{HOST}/plants/9/', response(body))
+    kept = [n for n in (0, 1, 2, 3, 9) if cache.lookup(f'{HOST}/plants/{n}/') is not None]
+    assert kept == [0, 2, 3, 9]
+
+
+def test_stores_under_budget_do_not_list_the_cache(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000)
+    scans = []
+    stat_entries = cache._stat_entries
+    monkeypatch.setattr(cache, '_stat_entries', lambda: scans.append(1) or stat_entries())
+    for n in range(4):
+        cache.store(f'{HOST}/plants/{n}/', response('x' * 1000))
+    assert len(scans) == 1  # The first store counts what is on disk; the rest add to it
+    assert cache._size == sum(os.path.getsize(cache._entry_path(f'{HOST}/plants/{n}/')) for n in range(4))
+
+    cache.store(f'{HOST}/plants/0/', response('x' * 10))  # Replacing an entry only adds the difference
+    assert cache._size == sum(os.path.getsize(cache._entry_path(f'{HOST}/plants/{n}/')) for n in range(4))
+
+    for n in range(4, 12):
+        cache.store(f'{HOST}/plants/{n}/', response('x' * 1000))
+    assert len(scans) > 1 and cache._size <= 10_000  # Over budget: listed and evicted
+    assert len(os.listdir(os.path.dirname(cache._entry_path(f'{HOST}/plants/0/')))) < 12
+
+
+def test_size_is_rescanned_for_other_writers(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, 'RESCAN_EVERY', 2)
+    cache, other = ResponseCache(str(tmp_path), max_bytes=5_000), ResponseCache(str(tmp_path), max_bytes=10**9)
+    cache.store(f'{HOST}/plants/1/', response('{}'))
+    for n in range(2, 8):
+        other.store(f'{HOST}/plants/{n}/', response('x' * 1000))
+    for n in range(1, 8):
+        os.utime(cache._entry_path(f'{HOST}/plants/{n}/'), (n, n))
+    cache.store(f'{HOST}/plants/8/', response('{}'))
+    oldest = cache._entry_path(f'{HOST}/plants/2/')
+    assert os.path.exists(oldest)  # Not noticed yet
+    cache.store(f'{HOST}/plants/9/', response('{}'))  # The second store since the first scan rescans, and finds the cache over budget
+    assert not os.path.exists(oldest) and cache._size <= 5_000
+
+
+def test_memory_cache_follows_invalidation(tmp_path):
+    memory = MemoryCache(ResponseCache(str(tmp_path)))
+    url = f'{HOST}/plants/1/'
+    memory.store(url, response('{}'))
+    assert memory.lookup(url) is not None
+    memory.invalidate(f'{HOST}/plants/')
+    assert memory.lookup(url) is None
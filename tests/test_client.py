@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from garden.client import GardenClient
+
+
+def response(body, status=200, headers=None):
+    page = requests.Response()
+    page.status_code = status
+    page._content = json.dumps(body).encode()
+    page._content_consumed = True
+    page.headers.update(headers or {})
+    return page
+
+
+class Session:
+    """Answers GETs from `pages` (URL -> body or Response), recording the URL and keyword arguments of each request."""
+
+    def __init__(self, pages=None):
+        self.pages = pages or {}
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.sent.append((method, url, kwargs))
+        page = self.pages.get(url, {})
+        return page if isinstance(page, requests.Response) else response(page)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = GardenClient('http://garden.test/')
+    client.session = client.fake = Session()
+    monkeypatch.setattr(client, '_build_session', lambda: Session())
+    return client
+
+
+def test_session_is_built_once_and_shared():
+    client = GardenClient('http://garden.test', pool_size=4)
+    session = client._get_session()
+    assert client._get_session() is session
+    adapter = session.get_adapter('http://garden.test/')
+    assert adapter._pool_maxsize == 4 and adapter._pool_connections == 4
+    assert session.headers['Accept'] == 'application/json'
+
+    client.configure(pool_size=4, connect_timeout=1, read_timeout=2)
+    assert client._get_session() is session  # Nothing about the pool changed
+    client.configure(pool_size=8)
+    rebuilt = client._get_session()
+    assert rebuilt is not session and rebuilt.get_adapter('http://garden.test/')._pool_maxsize == 8
+    client.close()
+    assert client.session is None
+
+
+def test_requests_go_through_the_session_with_timeouts(client):
+    client.configure(connect_timeout=1.5, read_timeout=9)
+    client.get('/plants/')
+    client.post('/plants/add/', json={'name': 'x'})
+    client.get('/plants/1/', timeout=3)
+    assert [(method, url) for method, url, _ in client.fake.sent] == [
+        ('GET', 'http://garden.test/plants/'), ('POST', 'http://garden.test/plants/add/'), ('GET', 'http://garden.test/plants/1/')]
+    assert [kwargs['timeout'] for _, _, kwargs in client.fake.sent] == [(1.5, 9), (1.5, 9), 3]
+    assert client.fake.sent[1][2]['json'] == {'name': 'x'}
+    assert client.request_count == 3
+
+
+def test_url():
+    client = GardenClient('http://garden.test:8500/')
+    assert client.url('/plants/') == 'http://garden.test:8500/plants/'
+    assert client.url('https://elsewhere.test/plants/?page=2') == 'https://elsewhere.test/plants/?page=2'
+
+
+def test_concurrent_requests_share_one_session(client):
+    client.session = None
+    sessions = set()
+    threads = [threading.Thread(target=lambda: sessions.add(id(client._get_session()))) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sessions) == 1
+
+
+class SlowSession(Session):
+    """A Session whose requests take `delay` seconds, tracking how many are in flight at once."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.in_flight = self.most_in_flight = 0
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return super().request(method, url, **kwargs)
+
+
+def test_get_many_fetches_each_path_once(client):
+    client.fake.pages = {f'http://garden.test/plants/{n}/': {'id': n} for n in range(1, 4)}
+    responses = client.get_many(['/plants/2/', '/plants/1/', '/plants/2/', '/plants/3/', '/plants/1/'])
+    assert list(responses) == ['/plants/2/', '/plants/1/', '/plants/3/']
+    assert {path: page.json()['id'] for path, page in responses.items()} == {'/plants/2/': 2, '/plants/1/': 1, '/plants/3/': 3}
+    assert sorted(url for _, url, _ in client.fake.sent) == [f'http://garden.test/plants/{n}/' for n in range(1, 4)]
+
+
+def test_get_many_bounds_concurrency(client):
+    client.session = client.fake = SlowSession(0.05)
+    started = time.monotonic()
+    responses = client.get_many([f'/plants/{n}/' for n in range(12)], concurrency=4)
+    assert len(responses) == 12 and client.fake.most_in_flight == 4
+    assert time.monotonic() - started < 12 * 0.05  # Overlapped, unlike one request after another
+
+    client.fake.most_in_flight = 0
+    client.get_many([f'/plants/{n}/' for n in range(3)], concurrency=1)
+    assert client.fake.most_in_flight == 1
+
+
+def test_get_many_returns_failed_responses_without_raising(client):
+    client.fake.pages = {'http://garden.test/plants/2/': response({'detail': 'Not found.'}, status=404)}
+    responses = client.get_many(['/plants/1/', '/plants/2/'])
+    assert [page.status_code for page in responses.values()] == [200, 404]
+
+
+def paged(pages, style, page_size=2):
+    """The pages of a collection as `style` serves them: a results/next envelope or a bare list with a Link header."""
+    served = {}
+    for number, items in enumerate(pages):
+        url = f'http://garden.test/plants/?limit={page_size}&offset=0' if number == 0 else f'http://garden.test/plants/?page={number}'
+        next_url = f'http://garden.test/plants/?page={number + 1}' if number + 1 < len(pages) else None
+        if style == 'envelope':
+            served[url] = response({'count': 9, 'next': next_url, 'results': items})
+        else:
+            served[url] = response(items, headers={'Link': f'<{next_url}>; rel="next"'} if next_url else {})
+    return served
+
+
+@pytest.mark.parametrize('style', ['envelope', 'link'])
+def test_iter_items_follows_next_links(client, style):
+    client.fake.pages = paged([[1, 2], [3, 4], [5]], style)
+    assert list(client.iter_items('/plants/', page_size=2)) == [1, 2, 3, 4, 5]
+    assert [url for _, url, _ in client.fake.sent] == [
+        'http://garden.test/plants/?limit=2&offset=0', 'http://garden.test/plants/?page=1', 'http://garden.test/plants/?page=2']
+
+
+def test_iter_items_from_a_server_that_does_not_paginate(client):
+    client.fake.pages = {'http://garden.test/plants/?limit=500&offset=0': [1, 2, 3]}
+    assert list(client.iter_items('/plants/')) == [1, 2, 3]
+    assert len(client.fake.sent) == 1
+
+
+def test_iter_items_stops_at_the_limit(client):
+    client.fake.pages = paged([[1, 2, 3], [4, 5]], 'envelope', page_size=3)
+    assert list(client.iter_items('/plants/', page_size=500, limit=3)) == [1, 2, 3]  # Pages no larger than the limit
+    assert [url for _, url, _ in client.fake.sent] == ['http://garden.test/plants/?limit=3&offset=0']
+    client.fake.sent.clear()
+    client.fake.pages = paged([[1, 2], [3, 4], [5]], 'envelope')
+    assert list(client.iter_items('/plants/', page_size=2, limit=2)) == [1, 2]
+    assert len(client.fake.sent) == 1  # No prefetch past the limit
+
+
+def test_iter_items_prefetches_the_next_page(client):
+    client.fake.pages = paged([[1, 2], [3, 4], [5]], 'envelope')
+    items = client.iter_items('/plants/', page_size=2)
+    assert next(items) == 1
+    deadline = time.monotonic() + 2
+    while len(client.fake.sent) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(client.fake.sent) == 2  # Page 2 was asked for while page 1 was being used
+    assert list(items) == [2, 3, 4, 5]
+
+
+def test_iter_items_raises_for_a_failed_page(client):
+    client.retry.retries = 0
+    client.fake.pages = paged([[1, 2], [3, 4]], 'envelope')
+    client.fake.pages['http://garden.test/plants/?page=1'] = response({}, status=500)
+    items = client.iter_items('/plants/', page_size=2)
+    assert [next(items), next(items)] == [1, 2]
+    with pytest.raises(requests.HTTPError):
+        next(items)
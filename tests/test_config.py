@@ -0,0 +1,127 @@
+import pytest
+import requests
+from click.testing import CliRunner
+
+from garden import cli
+from garden.client import GardenClient
+from garden.config import default_config_path, load_profile
+
+CONFIG = """
+[default]
+primary = http://primary.test:8500/
+replicas =
+    http://replica-1.test:8500
+    http://replica-2.test:8500
+
+[lab]
+primary = http://lab.test:8500
+probe = /health/
+
+[broken]
+replicas = http://replica-1.test:8500
+"""
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    path = tmp_path / 'config.ini'
+    path.write_text(CONFIG)
+    monkeypatch.setenv('GARDEN_CONFIG', str(path))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return path
+
+
+def test_default_profile(config):
+    assert load_profile() == {'primary': 'http://primary.test:8500/',
+                              'replicas': ['http://replica-1.test:8500', 'http://replica-2.test:8500'], 'probe': '/'}
+
+
+def test_named_profile(config):
+    assert load_profile('lab') == {'primary': 'http://lab.test:8500', 'replicas': [], 'probe': '/health/'}
+
+
+def test_an_explicit_path_wins_over_the_environment(config, tmp_path):
+    other = tmp_path / 'other.ini'
+    other.write_text('[default]\nprimary = http://other.test\n')
+    assert load_profile(path=str(other))['primary'] == 'http://other.test'
+
+
+def test_default_config_path(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path))
+    assert default_config_path() == str(tmp_path / 'garden' / 'config.ini')
+
+
+def test_nothing_configured_is_not_an_error(tmp_path, monkeypatch):
+    monkeypatch.setenv('GARDEN_CONFIG', str(tmp_path / 'missing.ini'))
+    assert load_profile() is None
+    (tmp_path / 'lab-only.ini').write_text('[lab]\nprimary = http://lab.test\n')
+    assert load_profile(path=str(tmp_path / 'lab-only.ini')) is None  # No [default] section
+
+
+@pytest.mark.parametrize('name, message', [
+    ('staging', "No profile 'staging' in .*; found: default, lab, broken"),
+    ('broken', "Profile 'broken' in .* has no primary endpoint"),
+])
+def test_unusable_named_profiles(config, name, message):
+    with pytest.raises(ValueError, match=message):
+        load_profile(name)
+
+
+def test_named_profile_without_a_config_file(tmp_path):
+    with pytest.raises(ValueError, match="Profile 'lab' requested, but there is no config file"):
+        load_profile('lab', path=str(tmp_path / 'missing.ini'))
+
+
+class Session:
+    """Answers every request with an empty list."""
+
+    def request(self, method, url, **kwargs):
+        page = requests.Response()
+        page.status_code = 200
+        page._content = b'[]'
+        page._content_consumed = True
+        return page
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def garden(config, monkeypatch):
+    client = GardenClient(cli.API_BASE_URL)
+    monkeypatch.setattr(cli, 'client', client)
+    monkeypatch.setattr(client, '_build_session', Session)
+    monkeypatch.delenv('GARDEN_API_URL', raising=False)
+    monkeypatch.delenv('GARDEN_API_PROFILE', raising=False)
+
+    def run(*args):
+        result = CliRunner().invoke(cli.cli, ['--no-cache', *args, 'list-actions'])
+        endpoints = client.endpoints
+        return result, client.base_url, [endpoint.url for endpoint in endpoints.endpoints[1:]], endpoints.probe_path
+    return run
+
+
+def test_cli_uses_the_default_profile(garden):
+    result, primary, replicas, probe = garden()
+    assert result.exit_code == 0, result.output
+    assert (primary, replicas, probe) == ('http://primary.test:8500', ['http://replica-1.test:8500', 'http://replica-2.test:8500'], '/')
+
+
+def test_cli_uses_a_named_profile(garden, monkeypatch):
+    assert garden('--profile', 'lab')[1:] == ('http://lab.test:8500', [], '/health/')
+    monkeypatch.setenv('GARDEN_API_PROFILE', 'lab')
+    assert garden()[1:] == ('http://lab.test:8500', [], '/health/')
+
+
+def test_api_url_overrides_the_profile(garden):
+    assert garden('--api-url', 'http://explicit.test/', '--profile', 'lab')[1:] == ('http://explicit.test', [], '/')
+
+
+def test_cli_falls_back_to_the_built_in_url(garden, monkeypatch, tmp_path):
+    monkeypatch.setenv('GARDEN_CONFIG', str(tmp_path / 'missing.ini'))
+    assert garden()[1:] == (cli.API_BASE_URL.rstrip('/'), [], '/')
+
+
+def test_cli_rejects_an_unusable_profile(garden):
+    result = garden('--profile', 'staging')[0]
+    assert result.exit_code == 2 and "No profile 'staging'" in result.output
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from garden.dashboard import Dashboard, Target, lookup
+
+
+def run_once(targets, fetch, concurrency=None):
+    frames = []
+    dashboard = Dashboard(targets, fetch, frames.append, concurrency=concurrency)
+    dashboard.run(once=True)
+    return dashboard, frames[-1]
+
+
+def test_a_slow_target_times_out_without_holding_up_the_rest():
+    release = threading.Event()
+
+    def fetch(target):
+        if target.id == 2:
+            release.wait(5)
+        return {'value': target.id}
+
+    targets = [Target('plant', target_id, 1, 0.2) for target_id in (1, 2, 3)]
+    started = time.monotonic()
+    try:
+        dashboard, lines = run_once(targets, fetch)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+    assert [target.error for target in targets] == [None, 'timed out after 0.2s', None]
+    assert [target.values for target in targets] == [{'value': 1}, {}, {'value': 3}]
+    assert any('ERROR' in line and 'plant 2' in line for line in lines)
+    assert lines[-1] == '  plant 2: timed out after 0.2s'
+
+
+def test_timeout_runs_from_when_the_fetch_starts():
+    def fetch(target):
+        time.sleep(0.15)
+        return {'value': target.id}
+
+    # One thread for three targets: the last one waits 0.3s for it, longer than its timeout
+    targets = [Target('plant', target_id, 1, 0.25) for target_id in (1, 2, 3)]
+    run_once(targets, fetch, concurrency=1)
+    assert [target.error for target in targets] == [None, None, None]
+    assert all(0.1 < target.latency < 0.25 for target in targets)
+
+
+def test_fetch_errors_are_shown_per_target():
+    def fetch(target):
+        if target.id == 1:
+            raise ValueError('Response Code: 502')
+        raise KeyError
+
+    targets = [Target('package', target_id, 1, 1) for target_id in (1, 2)]
+    run_once(targets, fetch)
+    assert [target.error for target in targets] == ['Response Code: 502', 'KeyError']
+
+
+def test_lookup():
+    values = {'response.temp': 20, '7.response.level': 3, 'status': 'ON'}
+    assert lookup(values, 'status') == 'ON'
+    assert lookup(values, 'temp') == 20 and lookup(values, 'response.temp') == 20
+    assert lookup(values, 'level') == 3
+    assert lookup(values, 'missing') == ''
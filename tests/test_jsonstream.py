@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from garden.jsonstream import TruncatedJSONError, iter_json_items
+
+DOC = {
+    'took': 3,
+    'skip': {'nested': [1, {'deep': '}]'}], 'text': 'a "quoted" ] value'},
+    'hits': {'total': 4, 'hits': [
+        {'message': 'café ☃ \U0001f331', 'escaped': 'tab\there "q" \\ /', 'n': -12.5e-3},
+        {'message': '', 'n': 1234567890, 'flags': [True, False, None]},
+        [],
+        -0.25,
+    ]},
+}
+
+
+def split(data, *offsets):
+    bounds = [0, *offsets, len(data)]
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def test_every_chunk_boundary():
+    data = json.dumps(DOC, ensure_ascii=False).encode()
+    expected = DOC['hits']['hits']
+    for offset in range(1, len(data)):
+        assert list(iter_json_items(split(data, offset), ('hits', 'hits'))) == expected, offset
+    assert list(iter_json_items([bytes([byte]) for byte in data], ('hits', 'hits'))) == expected
+
+
+@pytest.mark.parametrize('text, cut', [
+    ('{"a": ["he said \\"hi\\""]}', 'he said \\'),  # Inside an escaped quote
+    ('{"a": ["\\u00e9t\\u00e9"]}', '\\u00'),  # Inside a \uXXXX escape
+    ('{"a": ["\\ud83c\\udf31"]}', '\\ud83c\\'),  # Between the halves of a surrogate pair
+    ('{"a": [12.5e-3, 7]}', '12.'),  # Inside a number that would still decode as 12
+    ('{"a": [12.5e-3, 7]}', '12.5e'),
+    ('{"a": [true, null]}', 'tr'),
+])
+def test_splits_inside_a_token(text, cut):
+    data = text.encode()
+    offset = data.index(cut.encode()) + len(cut)
+    assert list(iter_json_items(split(data, offset), ('a',))) == json.loads(text)['a']
+
+
+def test_split_inside_a_utf8_sequence():
+    data = json.dumps({'a': ['\U0001f331']}, ensure_ascii=False).encode()
+    start = data.index('\U0001f331'.encode())
+    for offset in range(start + 1, start + 4):
+        assert list(iter_json_items(split(data, offset), ('a',))) == ['\U0001f331']
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'{"hits": {"hits": [',
+    b'{"hits": {"hits": [{"n": 1}, ',
+    b'{"hits": {"hits": [{"message": "half a str',
+    b'{"hits": {"hits": [{"message": "escape \\',
+    b'{"hits": {"hits": [{"message": "escape \\u00',
+    b'{"hits": {"hits": [{"n": tr',
+    b'{"hits": {"hits": [{"n": -',
+    b'{"hits": {"hits": [12',  # Would decode as 12 of a longer number
+    b'{"hits": {"hits": [12.5e',
+    b'{"hits": {"hits": [{"n": 1}',
+])
+def test_truncated_stream(data):
+    with pytest.raises(TruncatedJSONError):
+        list(iter_json_items(split(data, len(data) // 2), ('hits', 'hits')))
+
+
+def test_items_before_the_cut_are_complete():
+    data = b'{"hits": {"hits": [{"n": 1}, {"n": 2}, {"n": 3'
+    seen = []
+    with pytest.raises(TruncatedJSONError):
+        for item in iter_json_items([data], ('hits', 'hits')):
+            seen.append(item)
+    assert seen == [{'n': 1}, {'n': 2}]
+
+
+@pytest.mark.parametrize('data', [
+    b'<html>Bad gateway</html>',
+    b'{"hits": {"hits": [1 2]}}',
+    b'{"hits": {"hits": [{"n": 1x}]}}',
+    b'{"hits": {"hits": [nope]}}',
+])
+def test_malformed_stream_is_not_truncation(data):
+    with pytest.raises(ValueError) as raised:
+        list(iter_json_items([data], ('hits', 'hits')))
+    assert not isinstance(raised.value, TruncatedJSONError)
+
+
+def test_missing_path():
+    assert list(iter_json_items([b'{"hits": {"total": 0}}'], ('hits', 'hits'))) == []
+    assert list(iter_json_items([b'{"hits": {"hits": null}}'], ('hits', 'hits'))) == []
@@ -0,0 +1,106 @@
+import io
+import json
+
+import click
+import pytest
+import requests
+
+from garden import cli
+from garden.live import AdaptiveInterval, LiveView
+
+
+def test_adaptive_interval_backs_off_and_recovers():
+    pacer = AdaptiveInterval(1, max_backoff=4)
+    assert pacer.update(0.25) == 0.75  # Healthy: the rest of the interval
+    assert [pacer.update(0, ok=False) for _ in range(3)] == [2, 4, 4]  # Doubles up to the cap
+    assert pacer.update(1.5) == 2.5  # Slower than the interval counts as trouble too
+    assert [pacer.update(0) for _ in range(3)] == [2, 1, 1]  # Halves back down to the interval
+    assert AdaptiveInterval(1).update(5, ok=False) == 0  # Never negative
+
+
+class Terminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_live_view_rewrites_only_changed_lines():
+    screen = Terminal()
+    view = LiveView(screen)
+    view.update(['a', 'b', 'c'])
+    assert screen.getvalue() == 'a\nb\nc\n'
+
+    screen.seek(0)
+    screen.truncate()
+    view.update(['a', 'B', 'c'])
+    assert screen.getvalue() == '\x1b[2A\r\x1b[2KB\r\x1b[2B'
+
+    screen.seek(0)
+    screen.truncate()
+    view.update(['x'])  # A different height redraws the block
+    assert screen.getvalue() == '\x1b[3A\r\x1b[Jx\n'
+
+
+def test_live_view_appends_changes_when_not_a_terminal():
+    out = io.StringIO()
+    view = LiveView(out)
+    view.update(['a', 'b'])
+    view.update(['a', 'B'])
+    view.update(['a', 'B'])
+    assert out.getvalue() == 'a\nb\nB\n' and '\x1b' not in out.getvalue()
+
+
+def response(body, status=200):
+    page = requests.Response()
+    page.status_code = status
+    page._content = json.dumps(body).encode()
+    return page
+
+
+@pytest.fixture
+def polls(monkeypatch):
+    answers = []
+
+    def get(path):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def sleep(seconds):
+        if not answers:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(cli.client, 'get', get)
+    monkeypatch.setattr(cli.time, 'sleep', sleep)
+    return answers
+
+
+class Records:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def flush(self):
+        pass
+
+
+def test_follow_writes_only_values_that_change(polls, capsys):
+    polls.extend([
+        response({'response.temp': 20, 'metrics': {'m0': 1}}),
+        response({'response.temp': 20, 'metrics': {'m0': 2}}),
+        requests.ConnectionError('refused'),
+        response({}, status=503),
+        response({'response.temp': 21, 'metrics': {'m0': 2}, 'new': 'x'}),
+    ])
+    writer = Records()
+    cli.stream_plant_data(7, True, 1, writer)
+    assert writer.records == [(7, 'temp', 20), (7, 'metrics.m0', 1), (7, 'metrics.m0', 2), (7, 'temp', 21), (7, 'new', 'x')]
+    errors = capsys.readouterr().err
+    assert 'Request failed: refused' in errors and 'Response Code: 503' in errors
+
+
+def test_without_follow_a_failed_poll_fails_the_command(polls):
+    polls.append(response({}, status=404))
+    with pytest.raises(click.ClickException, match='Response Code: 404'):
+        cli.stream_plant_data(7, False, 1, Records())
@@ -0,0 +1,138 @@
+import json
+
+import click
+import pytest
+import requests
+
+from garden import cli
+from garden.cli import LogCursor, show_logs
+
+
+def hit(timestamp, beat):
+    return {'_source': {'timestamp': timestamp, 'beat': beat}}
+
+
+def beats(hits):
+    return [hit['_source']['beat'] for hit in hits]
+
+
+def broken(hits, error):
+    yield from hits
+    raise error
+
+
+def test_cursor_skips_hits_already_shown():
+    cursor = LogCursor()
+    assert beats(cursor.new_hits([hit('t2', 3), hit('t2', 2), hit('t1', 1)])) == [3, 2, 1]
+    assert cursor.timestamp == 't2'
+    # The server sends everything at or after the cursor again, plus what is new
+    assert beats(cursor.new_hits([hit('t3', 5), hit('t2', 4), hit('t2', 3), hit('t2', 2)])) == [5, 4]
+    assert beats(cursor.new_hits([hit('t3', 5)])) == []
+    assert beats(cursor.new_hits([hit('t3', 6), hit('t3', 5), hit('t1', 0)])) == [6]  # Same timestamp, new beat
+    assert cursor.timestamp == 't3'
+
+
+def test_cursor_stays_put_when_the_stream_breaks():
+    cursor = LogCursor()
+    list(cursor.new_hits([hit('t1', 1)]))
+    shown = []
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        for entry in cursor.new_hits(broken([hit('t4', 4), hit('t3', 3)], requests.exceptions.ChunkedEncodingError())):
+            shown.append(entry)
+    assert beats(shown) == [4, 3]
+    assert cursor.timestamp == 't1'  # t2 hits may still be unread behind the break
+    assert beats(cursor.new_hits([hit('t4', 4), hit('t3', 3), hit('t2', 2), hit('t1', 1)])) == [2]
+    assert cursor.timestamp == 't4'
+
+
+class Body:
+    """A streamed response whose body arrives in `chunks`; an exception among them is raised at that point."""
+
+    def __init__(self, chunks, status_code=200):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def window(*beats):
+    return json.dumps({'hits': {'hits': [hit(f't{beat}', beat) for beat in beats]}}).encode()
+
+
+class Stop(Exception):
+    pass
+
+
+class Polls:
+    """Serves show_logs one scripted answer per poll, recording the params sent, and ends --follow once they run out."""
+
+    def __init__(self):
+        self.answers = []
+        self.params = []
+
+    def get(self, url, params=None, stream=False):
+        assert stream
+        self.params.append(params)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def sleep(self, seconds):
+        if not self.answers:
+            raise Stop
+
+
+@pytest.fixture
+def polls(monkeypatch):
+    polls = Polls()
+    monkeypatch.setattr(cli.client, 'get', polls.get)
+    monkeypatch.setattr(cli.time, 'sleep', polls.sleep)
+    return polls
+
+
+def run(follow=True):
+    printed = []
+    try:
+        show_logs('/plants/logs/1/10/', lambda index, hit: printed.append(hit['_source']['beat']), follow, 1)
+    except Stop:
+        pass
+    return printed
+
+
+def test_follow_survives_failed_and_broken_polls(polls, capsys):
+    body = window(3, 2, 1)
+    polls.answers.extend([
+        Body([window(2, 1)]),
+        requests.ConnectionError('refused'),
+        Body([body[:30], requests.exceptions.ChunkedEncodingError('connection broken')]),  # Cut inside the first hit
+        Body([body[:65], requests.ConnectionError('reset')]),  # Cut after the first hit
+        Body([body[:70]]),  # Ends mid-window
+        Body([b'<html>oops</html>']),
+        Body([], status_code=502),
+        Body([window(4, 3, 2, 1)]),
+    ])
+    assert run() == [2, 1, 3, 4]
+    errors = capsys.readouterr().err
+    assert errors.count('Failed to read logs') == 4 and 'Request failed' in errors and 'Response Code: 502' in errors
+    assert polls.params == [None] + [{'since': 't2'}] * 6 + [{'since': 't2'}]
+
+
+def test_without_follow_a_broken_body_fails_the_command(polls):
+    polls.answers.append(Body([window(2, 1)[:40]]))
+    with pytest.raises(click.ClickException, match='Failed to read logs'):
+        run(follow=False)
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+import requests
+
+from garden import monitor
+from garden.client import GardenClient
+from garden.monitor import CollectionWatch, Debouncer, Hook
+
+
+def response(body, status=200):
+    page = requests.Response()
+    page.status_code = status
+    page._content = body if isinstance(body, bytes) else json.dumps(body).encode()
+    return page
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A client whose GETs answer from `pages` (path -> body or Response)."""
+    client = GardenClient('http://garden.test')
+    client.pages = {}
+    monkeypatch.setattr(client, 'get', lambda path, **kwargs: client.pages[path] if isinstance(client.pages[path], requests.Response)
+                        else response(client.pages[path]))
+    return client
+
+
+def plant(plant_id, status):
+    return {'id': plant_id, 'name': f'plant-{plant_id}', 'status': status}
+
+
+def test_poll_reports_transitions(server):
+    server.pages['/plants/?limit=2&offset=0'] = {'results': [plant(1, 'ONLINE'), plant(2, 'ONLINE')], 'next': '/plants/?limit=2&offset=2'}
+    server.pages['/plants/?limit=2&offset=2'] = {'results': [plant(3, 'STOP')], 'next': None}
+    watch = CollectionWatch(server, 'plants', 2, concurrency=1)
+    assert watch.poll() == []
+    assert sorted(watch.entities) == [1, 2, 3]
+
+    server.pages['/plants/?limit=2&offset=0'] = {'results': [plant(1, 'DOWN'), plant(2, 'ONLINE')], 'next': '/plants/?limit=2&offset=2'}
+    server.pages['/plants/?limit=2&offset=2'] = {'results': [plant(4, 'ONLINE')], 'next': None}
+    events = watch.poll()
+    assert [(event['id'], event['from'], event['to']) for event in events] == [(1, 'ONLINE', 'DOWN'), (4, None, 'ONLINE'), (3, 'STOP', None)]
+
+    events = watch.poll()
+    assert events == [] and watch.decoded == 0  # Same bytes: nothing decoded
+
+
+@pytest.mark.parametrize('page', [
+    response(b'<html>Bad gateway</html>'),
+    {'count': 3},
+    {'results': [{'name': 'no id'}]},
+    {'results': 5},
+    ['not', 'entities'],
+], ids=['not-json', 'no-results', 'no-id', 'results-not-a-list', 'list-of-strings'])
+def test_malformed_page_fails_the_poll_and_keeps_state(server, page):
+    first = '/plants/?limit=10&offset=0'
+    server.pages[first] = [plant(1, 'ONLINE')]
+    watch = CollectionWatch(server, 'plants', 10, concurrency=1)
+    watch.poll()
+    before = dict(watch.entities), dict(watch.pages)
+
+    server.pages[first] = page
+    with pytest.raises(ValueError, match='malformed page'):
+        watch.poll()
+    assert (watch.entities, watch.pages) == before
+
+    server.pages[first] = [plant(1, 'DOWN')]
+    assert [event['to'] for event in watch.poll()] == ['DOWN']
+
+
+def event(entity_id, old, new):
+    return {'collection': 'plants', 'id': entity_id, 'name': None, 'from': old, 'to': new}
+
+
+def test_debouncer(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(monitor.time, 'monotonic', lambda: now[0])
+    debouncer = Debouncer(5)
+    assert debouncer.push([event(1, 'ONLINE', 'DOWN'), event(2, 'ONLINE', 'STOP')]) == []
+    now[0] += 3
+    assert debouncer.push([event(1, 'DOWN', 'ONLINE'), event(2, 'STOP', 'DOWN')]) == []  # 1 flipped back, 2 changed again
+    assert debouncer.suppressed == 1
+    now[0] += 4
+    assert debouncer.push([]) == []  # 2 changed 4s ago
+    now[0] += 1
+    assert debouncer.push([]) == [event(2, 'ONLINE', 'DOWN')]
+    assert debouncer.held == {}
+
+    assert Debouncer(0).push([event(1, 'A', 'B')]) == [event(1, 'A', 'B')]
+
+
+def test_hook_allow(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(monitor.time, 'monotonic', lambda: now[0])
+    hook = Hook('h', command='true', rate=2)
+    assert [hook.allow() for _ in range(3)] == [True, True, False]
+    assert hook.dropped == 1
+    now[0] += 30  # Half a minute refills one run
+    assert [hook.allow() for _ in range(2)] == [True, False]
+    now[0] += 600  # Never more than `rate` saved up
+    assert [hook.allow() for _ in range(3)] == [True, True, False]
+    assert hook.dropped == 3
+
+    unlimited = Hook('u', command='true', rate=0)
+    assert all(unlimited.allow() for _ in range(1000)) and unlimited.dropped == 0
+
+
+def test_hook_matches():
+    hook = Hook('h', command='true', collections=['plants'], ids=[1, 2], from_values=['online'], to_values=['down', 'stop'])
+    assert hook.matches(event(1, 'ONLINE', 'DOWN'))
+    assert not hook.matches(event(3, 'ONLINE', 'DOWN'))
+    assert not hook.matches(event(1, 'ONLINE', None))
+    assert not hook.matches(dict(event(1, 'ONLINE', 'DOWN'), collection='workers'))
+    assert Hook('any', command='true').matches(event(9, None, None))
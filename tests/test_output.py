@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+import sys
+
+import pytest
+
+from garden.output import RecordWriter, json_encoder
+
+RECORDS = [
+    [1, 'plain', None],
+    [2, 'comma, "quotes"', 1.5],
+    [3, 'tab\there', True],
+    [4, 'line\nbreak', {'a': [1, 'x,y']}],
+    [5, 'café ☃', [1, 2]],
+]
+
+
+def written(output, records=RECORDS):
+    out = io.StringIO()
+    RecordWriter(output, ['id', 'name', 'value'], file=out).write_many(records)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('output, delimiter', [('csv', ','), ('tsv', '\t')])
+def test_delimited_output_round_trips(output, delimiter):
+    text = written(output)
+    rows = list(csv.reader(io.StringIO(text), delimiter=delimiter))
+    assert rows == [
+        ['id', 'name', 'value'],
+        ['1', 'plain', ''],
+        ['2', 'comma, "quotes"', '1.5'],
+        ['3', 'tab\there', 'True'],
+        ['4', 'line\nbreak', '{"a":[1,"x,y"]}'],
+        ['5', 'café ☃', '[1,2]'],
+    ]
+
+
+def test_csv_quotes_only_what_needs_it():
+    assert written('csv').splitlines()[:4] == [
+        'id,name,value', '1,plain,', '2,"comma, ""quotes""",1.5', '3,tab\there,True']
+
+
+def test_tsv_quotes_tabs_and_quotes_but_not_commas():
+    assert written('tsv').splitlines()[:4] == [
+        'id\tname\tvalue', '1\tplain\t', '2\t"comma, ""quotes"""\t1.5', '3\t"tab\there"\tTrue']
+    assert written('tsv', [[6, 'a,b', 'c']]).splitlines()[1] == '6\ta,b\tc'
+
+
+def test_jsonl():
+    lines = written('jsonl').splitlines()
+    assert [json.loads(line) for line in lines] == [dict(zip(['id', 'name', 'value'], record)) for record in RECORDS]
+    assert lines[4] == '{"id":5,"name":"café ☃","value":[1,2]}'
+
+
+def test_json_encoder_falls_back_for_what_orjson_refuses(monkeypatch):
+    class Orjson:
+        @staticmethod
+        def dumps(record):
+            if any(isinstance(value, int) and value > 2 ** 63 for value in record.values()):
+                raise TypeError('Integer exceeds 64-bit range')
+            return json.dumps(record, separators=(',', ':')).encode()
+
+    monkeypatch.setitem(sys.modules, 'orjson', Orjson)
+    dumps = json_encoder()
+    assert dumps({'n': 2 ** 70}) == '{"n":1180591620717411303424}'
+    assert dumps({'n': 1}) == '{"n":1}'
@@ -0,0 +1,192 @@
+import json
+
+import pytest
+import requests
+
+from garden import cli
+from garden.picks import MAX_PARTIAL_REQUESTS, PickChanges, validate_picks
+
+ORIGINAL = [{'plant_id': 1, 'paths': ['a']}, {'plant_id': 2, 'paths': ['b', 'c']}, {'plant_id': 3, 'paths': []}]
+
+
+def edit(*changes):
+    picks = [dict(pick, paths=list(pick['paths'])) for pick in ORIGINAL]
+    for change in changes:
+        change(picks)
+    return PickChanges(ORIGINAL, picks)
+
+
+def test_unchanged():
+    changes = edit()
+    assert not changes
+    assert not changes.upserts and not changes.removals and not changes.replace
+
+
+def test_changed_paths_are_one_upsert():
+    changes = edit(lambda picks: picks[1]['paths'].append('d'), lambda picks: picks[2]['paths'].append('e'))
+    assert changes and not changes.replace
+    assert changes.upserts == [{'plant_id': 2, 'paths': ['b', 'c', 'd']}, {'plant_id': 3, 'paths': ['e']}]
+    assert changes.removals == []
+    assert changes.summary() == '2 added or changed'
+
+
+def test_appended_pick_is_an_upsert():
+    changes = edit(lambda picks: picks.append({'plant_id': 9, 'paths': ['z']}))
+    assert not changes.replace
+    assert changes.upserts == [{'plant_id': 9, 'paths': ['z']}]
+
+
+def test_single_removal():
+    changes = edit(lambda picks: picks.pop(0))
+    assert not changes.replace
+    assert changes.removals == [1] and changes.upserts == []
+    assert changes.summary() == '1 removed'
+
+
+def test_removals_and_an_upsert_are_partial_writes():
+    changes = edit(lambda picks: picks.pop(0), lambda picks: picks.pop(0), lambda picks: picks[0]['paths'].append('d'))
+    assert not changes.replace and changes.reason is None
+    assert changes.upserts == [{'plant_id': 3, 'paths': ['d']}] and changes.removals == [1, 2]
+    assert changes.writes == 3
+    assert changes.summary() == '1 added or changed, 2 removed'
+
+
+@pytest.mark.parametrize('change, reason', [
+    (lambda picks: picks.reverse(), 'the order changed'),
+    (lambda picks: picks.insert(0, {'plant_id': 9, 'paths': []}), 'the order changed'),
+    (lambda picks: picks.append({'plant_id': 1, 'paths': ['dup']}), 'duplicate plant IDs'),
+], ids=['reordered', 'inserted', 'duplicate'])
+def test_edits_partial_writes_cannot_make_replace_the_list(change, reason):
+    changes = edit(change)
+    assert changes and changes.replace and changes.reason == reason
+    assert changes.summary() == f'replacing all {len(changes.edited)} picks, {reason}'
+
+
+def test_too_many_writes_replace_the_list():
+    original = [{'plant_id': n, 'paths': []} for n in range(MAX_PARTIAL_REQUESTS + 2)]
+    assert not PickChanges(original, original[MAX_PARTIAL_REQUESTS:]).replace
+    changes = PickChanges(original, original[MAX_PARTIAL_REQUESTS + 1:])
+    assert changes.replace and changes.reason == f'more than {MAX_PARTIAL_REQUESTS} writes'
+
+
+def test_edited_keeps_only_plant_id_and_paths():
+    changes = PickChanges([], [{'plant_id': 4, 'paths': ['x'], 'extra': True}])
+    assert changes.edited == [{'plant_id': 4, 'paths': ['x']}]
+
+
+def test_validate_picks():
+    assert validate_picks(None) == []
+    assert validate_picks(ORIGINAL) is ORIGINAL
+    for bad in [{}, [{'paths': []}], [{'plant_id': 1}], [{'plant_id': 1, 'paths': 'a'}]]:
+        with pytest.raises(ValueError):
+            validate_picks(bad)
+
+
+def response(body, status=200, etag=None):
+    page = requests.Response()
+    page.status_code = status
+    page._content = json.dumps(body).encode()
+    if etag:
+        page.headers['ETag'] = etag
+    return page
+
+
+class Server:
+    """Stands in for the client in save_picks: applies pick writes to one worker, versioned by a counter."""
+
+    def __init__(self, picks, etags=True):
+        self.picks = [dict(pick, paths=list(pick['paths'])) for pick in picks]
+        self.version = 1
+        self.etags = etags
+        self.sent = []
+
+    @property
+    def etag(self):
+        return f'"v{self.version}"' if self.etags else None
+
+    def worker(self):
+        return response({'id': 1, 'package': {'picks': self.picks}}, etag=self.etag)
+
+    def get(self, path, **kwargs):
+        return self.worker()
+
+    def request(self, method, url, json=None, headers=None):
+        self.sent.append((method, url.rsplit('/', 2)[-2], headers.get('If-Match')))
+        if headers.get('If-Match') not in (None, self.etag):
+            return response({'detail': 'Precondition failed.'}, status=412)
+        if url.endswith('/remove-pick/'):
+            self.picks = [pick for pick in self.picks if pick['plant_id'] != json['plant_id']]
+        elif method == 'PATCH':
+            self.picks = json['picks']
+        else:
+            for pick in json['picks']:
+                existing = [old for old in self.picks if old['plant_id'] == pick['plant_id']]
+                if existing:
+                    existing[0]['paths'] = pick['paths']
+                else:
+                    self.picks.append(dict(pick))
+        self.version += 1
+        return self.worker()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    def serve(etags=True):
+        server = Server(ORIGINAL, etags)
+        monkeypatch.setattr(cli, 'client', server)
+        monkeypatch.setattr(cli, 'update_stored_worker', lambda worker_id: None)
+        return server
+    return serve
+
+
+def save(server, *changes):
+    edited = edit(*changes)
+    return cli.save_picks(1, server.etag, ORIGINAL, edited), edited
+
+
+def test_save_sends_one_write_per_removal_chained_by_version(server):
+    server = server()
+    saved, edited = save(server, lambda picks: picks.pop(0), lambda picks: picks.pop(0), lambda picks: picks[0]['paths'].append('d'))
+    assert saved and server.picks == edited.edited
+    assert server.sent == [('PUT', 'update', '"v1"'), ('PUT', 'remove-pick', '"v2"'), ('PUT', 'remove-pick', '"v3"')]
+
+
+def test_save_reports_how_far_a_conflicting_edit_got(server, capsys):
+    server = server()
+    original_request = server.request
+
+    def racing(method, url, json=None, headers=None):
+        if len(server.sent) == 1:
+            server.version += 1  # Someone else writes between our first and second write
+        return original_request(method, url, json, headers)
+    server.request = racing
+    saved, _ = save(server, lambda picks: picks.pop(0), lambda picks: picks.pop(0))
+    assert not saved and len(server.sent) == 2
+    assert '1 of 2 writes had been applied' in capsys.readouterr().out
+
+
+def test_save_without_etags_sends_the_whole_list(server, capsys):
+    plain = server(etags=False)
+    saved, edited = save(plain, lambda picks: picks.pop(0), lambda picks: picks.pop(0))
+    assert saved and plain.picks == edited.edited
+    assert plain.sent == [('PATCH', 'update', None)]
+    assert 'sending the whole pick list instead' in capsys.readouterr().out
+
+    plain = server(etags=False)
+    saved, _ = save(plain, lambda picks: picks.pop(0))
+    assert saved and plain.sent == [('PUT', 'remove-pick', None)]  # A single write needs nothing to chain on
+
+
+def test_save_falls_back_when_a_write_comes_back_without_an_etag(server, capsys):
+    server = server()
+    original_request = server.request
+
+    def forgetful(method, url, json=None, headers=None):
+        answer = original_request(method, url, json, headers)
+        del answer.headers['ETag']
+        return answer
+    server.request = forgetful
+    saved, edited = save(server, lambda picks: picks.pop(0), lambda picks: picks.pop(0), lambda picks: picks[0]['paths'].append('d'))
+    assert saved and server.picks == edited.edited
+    assert server.sent == [('PUT', 'update', '"v1"'), ('PATCH', 'update', None)]
+    assert 'sending the whole pick list instead' in capsys.readouterr().out
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from garden.profile import Tracer
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.reset(origin=100.0)
+    return tracer
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span('render'):
+        pass
+    tracer.add('GET /plants/', 'http', 0, 1)
+    assert tracer.spans == []
+
+
+def test_summary_lists_requests_and_totals_the_rest(tracer):
+    tracer.add('GET /plants/', 'http', 100.0, 100.25, method='GET', url='/plants/', status=200, bytes=512, ttfb_ms=200.0)
+    tracer.add('GET /plants/1/', 'http', 100.25, 100.5, method='GET', url='/plants/1/', status=404, bytes=None, ttfb_ms=10.0)
+    tracer.add('json decode', 'json', 100.5, 100.501)
+    tracer.add('json decode', 'json', 100.6, 100.603)
+    lines = tracer.summary()
+    assert lines[:3] == [
+        'Timings (ms):',
+        '  GET /plants/ -> 200  512 B  ttfb 200.0  total 250.0',
+        '  GET /plants/1/ -> 404  ? B  ttfb 10.0  total 250.0',
+    ]
+    assert lines[3].split() == ['http', '(all', 'requests)', '500.0', 'x2']
+    assert lines[4].split() == ['json', 'decode', '4.0', 'x2']
+    assert lines[5].split()[0] == 'wall'
+
+
+def test_span_times_the_block_even_when_it_raises(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span('table build', rows=3):
+            raise ValueError
+    [span] = tracer.spans
+    assert span['name'] == 'table build' and span['cat'] == 'cli' and span['args'] == {'rows': 3}
+    assert span['end'] >= span['start']
+
+
+def test_chrome_trace(tracer, tmp_path):
+    tracer.add('GET /plants/', 'http', 100.5, 100.75, url='/plants/')
+    path = tmp_path / 'trace.json'
+    tracer.write_chrome_trace(str(path))
+    trace = json.loads(path.read_text())
+    [event] = trace['traceEvents']
+    assert event['ph'] == 'X' and event['ts'] == 500000.0 and event['dur'] == 250000.0
+    assert event['args'] == {'url': '/plants/'} and trace['displayTimeUnit'] == 'ms'
@@ -0,0 +1,96 @@
+import pytest
+
+from garden.query import Column, ListingQuery
+
+COLUMNS = [
+    Column('ID', 'id'),
+    Column('NAME', 'name'),
+    Column('STATUS', 'status'),
+    Column('SINCE', 'since'),
+    Column('PICKS', get=lambda item: len(item.get('picks', []))),
+]
+
+ITEMS = [
+    {'id': 1, 'name': 'Alpha', 'status': 'ONLINE', 'since': '2024-01-03', 'picks': [1]},
+    {'id': 2, 'name': 'beta', 'status': 'DOWN', 'since': None, 'picks': [1, 2, 3]},
+    {'id': 10, 'name': 'Gamma', 'status': 'DOWN', 'since': '2024-01-01'},
+    {'id': 3, 'name': 'delta', 'status': 1, 'since': '2024-01-02', 'picks': [1, 2]},
+]
+
+
+def ids(query, items=ITEMS, limit=None):
+    return [row[0] for row in ListingQuery(COLUMNS, fields='id', **query).apply(iter(items), limit)]
+
+
+@pytest.mark.parametrize('where, expected', [
+    (['status=DOWN'], [2, 10]),
+    (['STATUS!=DOWN'], [1, 3]),
+    (['id>2'], [10, 3]),
+    (['id<=2'], [1, 2]),
+    (['id>=2.5'], [10, 3]),
+    (['name~ET'], [2]),
+    (['since>2024-01-01'], [1, 3]),  # Text compares as text; a missing value is ''
+    (['status=1'], [3]),  # Equality is on the text of the value
+    (['picks>1'], [2, 3]),  # Derived columns filter too
+    (['status=DOWN', 'id>5'], [10]),
+    (['id>abc'], []),  # Numbers compared with text never match
+])
+def test_where(where, expected):
+    assert ids({'where': where}) == expected
+
+
+@pytest.mark.parametrize('sort, expected', [
+    ('id', [1, 2, 3, 10]),  # Numerically, not as text
+    ('-id', [10, 3, 2, 1]),
+    ('since', [10, 3, 1, 2]),  # Missing values last
+    ('-since', [1, 3, 10, 2]),  # Last either way
+    ('status,-id', [3, 10, 2, 1]),  # Numbers before text, then ties by the second key
+    ('-picks,id', [2, 3, 1, 10]),
+])
+def test_sort(sort, expected):
+    assert ids({'sort': sort}) == expected
+
+
+def test_fields_and_limit():
+    query = ListingQuery(COLUMNS, where=['status=DOWN'], fields='name, ID,picks')
+    assert query.headers == ['NAME', 'ID', 'PICKS']
+    assert list(query.apply(iter(ITEMS))) == [['beta', 2, 3], ['Gamma', 10, 0]]
+    assert list(query.apply(iter(ITEMS), limit=1)) == [['beta', 2, 3]]
+    assert ListingQuery(COLUMNS).headers == ['ID', 'NAME', 'STATUS', 'SINCE', 'PICKS']
+
+
+def test_apply_is_lazy_without_sort():
+    consumed = []
+
+    def items():
+        for item in ITEMS:
+            consumed.append(item['id'])
+            yield item
+    rows = ListingQuery(COLUMNS, where=['status=DOWN']).apply(items(), limit=1)
+    assert [row[0] for row in rows] == [2] and consumed == [1, 2]
+
+
+def test_path_pushes_equality_and_sort_down():
+    query = ListingQuery(COLUMNS, where=['status=DOWN', 'id>2', 'name~a'], sort='-since,id')
+    assert query.path('/plants/') == '/plants/?status=DOWN&ordering=-since%2Cid'
+    assert query.path('/plants/?x=1') == '/plants/?x=1&status=DOWN&ordering=-since%2Cid'
+    assert ListingQuery(COLUMNS, sort='picks').path('/plants/') == '/plants/'  # Derived columns sort locally only
+    assert ListingQuery(COLUMNS, where=['picks=2']).equals() == []
+
+
+def test_fetch_limit():
+    assert ListingQuery(COLUMNS).fetch_limit(5) == 5
+    assert ListingQuery(COLUMNS, where=['id=1']).fetch_limit(5) is None
+    assert ListingQuery(COLUMNS, sort='id').fetch_limit(5) is None
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'where': ['nope=1']}, "Unknown column 'nope'"),
+    ({'where': ['status']}, "Can't parse 'status'"),
+    ({'where': ['=DOWN']}, "Can't parse"),
+    ({'sort': 'id,-bogus'}, "Unknown column 'bogus'"),
+    ({'fields': 'id,,size'}, "Unknown column 'size'. Choose from: id, name, status, since, picks"),
+])
+def test_invalid_queries(kwargs, message):
+    with pytest.raises(ValueError, match=message.replace('(', r'\(')):
+        ListingQuery(COLUMNS, **kwargs)
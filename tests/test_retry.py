@@ -0,0 +1,199 @@
+import random
+
+import pytest
+import requests
+
+from garden import client as client_module, retry as retry_module
+from garden.client import GardenClient
+from garden.retry import CircuitBreaker, RetryPolicy, retry_after
+
+
+def response(status=200, headers=None):
+    page = requests.Response()
+    page.status_code = status
+    page._content = b'{}'
+    page._content_consumed = True
+    page.headers.update(headers or {})
+    return page
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(retry_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_delays_are_jittered_within_bounds():
+    random.seed(1)
+    policy = RetryPolicy(base_delay=0.1, max_delay=2.0)
+    delays = policy.delays()
+    previous = policy.base_delay
+    for _ in range(200):
+        delay = next(delays)
+        assert policy.base_delay <= delay <= min(policy.max_delay, previous * 3)
+        previous = delay
+    assert len({round(next(policy.delays()), 6) for _ in range(20)}) > 1  # Clients don't retry in lockstep
+
+
+def test_retry_budget():
+    policy = RetryPolicy(budget_ratio=0.5, budget_min=2)
+    assert [policy.spend() for _ in range(3)] == [True, True, False]
+    for _ in range(4):
+        policy.record_request()
+    assert [policy.spend() for _ in range(3)] == [True, True, False]
+
+
+def test_breaker_opens_after_threshold_and_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow() and breaker.retry_in() == 10
+
+    clock[0] += 10
+    assert breaker.allow()  # The trial
+    assert not breaker.allow()  # Everything else waits for it
+    breaker.record_failure()  # A failed trial reopens at once
+    clock[0] += 5
+    assert not breaker.allow() and breaker.retry_in() == 5
+
+    clock[0] += 5
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.failures == 0 and breaker.retry_in() == 0
+
+
+def test_breaker_success_resets_the_count():
+    breaker = CircuitBreaker(threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_breaker_threshold_zero_never_opens():
+    breaker = CircuitBreaker(threshold=0)
+    for _ in range(100):
+        breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_retry_after():
+    assert retry_after(response(429, {'Retry-After': '3'}), 5) == 3
+    assert retry_after(response(503, {'Retry-After': '60'}), 5) == 5
+    assert retry_after(response(503, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}), 5) is None
+    assert retry_after(response(503), 5) is None
+
+
+class Session:
+    """Answers requests from a script of statuses or exceptions, recording each one."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append((method, url))
+        outcome = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return response(*outcome) if isinstance(outcome, tuple) else response(outcome)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = GardenClient('http://garden.test')
+    client.sleeps = []
+    monkeypatch.setattr(client_module.time, 'sleep', client.sleeps.append)
+
+    def serve(*script):
+        session = Session(*script)
+        monkeypatch.setattr(client, '_get_session', lambda: session)
+        return session
+    client.serve = serve
+    return client
+
+
+def test_retries_unavailable_then_succeeds(client):
+    session = client.serve(503, 502, 200)
+    assert client.get('/plants/').status_code == 200
+    assert len(session.sent) == 3 and len(client.sleeps) == 2
+
+
+def test_gives_up_after_the_configured_retries(client):
+    client.configure(retries=1)
+    session = client.serve(504)
+    assert client.get('/plants/').status_code == 504
+    assert len(session.sent) == 2
+
+
+def test_honours_retry_after(client):
+    client.serve((429, {'Retry-After': '2'}), 200)
+    assert client.get('/plants/').status_code == 200
+    assert client.sleeps == [2]
+
+
+@pytest.mark.parametrize('status', [400, 404, 500])
+def test_other_statuses_are_not_retried(client, status):
+    session = client.serve(status)
+    assert client.get('/plants/').status_code == status
+    assert len(session.sent) == 1
+
+
+def test_connection_errors_are_retried_for_idempotent_requests_only(client):
+    session = client.serve(requests.ConnectionError('refused'), 200)
+    assert client.get('/plants/').status_code == 200
+    assert len(session.sent) == 2
+
+    session = client.serve(requests.ConnectionError('refused'))
+    with pytest.raises(requests.ConnectionError):
+        client.get('/actions/1/execute/?params=', idempotent=False)
+    assert len(session.sent) == 1
+
+    session = client.serve(503)
+    assert client.post('/plants/add/', json={}).status_code == 503
+    assert client.put('/plants/1/update/', json={}, idempotent=True).status_code == 503
+    assert len(session.sent) == 1 + 3
+
+
+def test_open_breaker_fails_fast(client):
+    client.configure(retries=0, breaker_threshold=2)
+    session = client.serve(requests.ConnectionError('refused'))
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError, match='refused'):
+            client.get('/plants/')
+    with pytest.raises(requests.ConnectionError, match='is failing'):
+        client.get('/plants/')
+    assert len(session.sent) == 2
+
+
+def test_primary_reads_and_breakers_per_endpoint(client, monkeypatch):
+    import time
+
+    client.configure(retries=0, replicas=['http://replica-1.test', 'http://replica-2.test'])
+    for endpoint, latency in zip(client.endpoints.endpoints, [0.3, 0.01, 0.2]):
+        endpoint.latency, endpoint.checked_at = latency, time.time()  # No probes: replica-1 is fastest
+
+    class Replicas(Session):
+        def request(self, method, url, **kwargs):
+            self.sent.append(url)
+            if url.startswith('http://replica-1'):
+                raise requests.ConnectionError('replica-1 is down')
+            return response(200)
+    session = Replicas()
+    monkeypatch.setattr(client, '_get_session', lambda: session)
+
+    client.get('/actions/1/execute/?params=', idempotent=False, primary=True)
+    client.get('/plants/1/', primary=True)
+    assert session.sent == ['http://garden.test/actions/1/execute/?params=', 'http://garden.test/plants/1/']
+
+    session.sent.clear()
+    for _ in range(client.breaker_threshold):
+        with pytest.raises(requests.ConnectionError):
+            client.get('/plants/1/')
+    client.get('/plants/1/')  # replica-1's breaker is open: routed to replica-2
+    client.patch('/plants/1/update/', json={})
+    assert session.sent[-2:] == ['http://replica-2.test/plants/1/', 'http://garden.test/plants/1/update/']
+    assert [endpoint.breaker.allow() for endpoint in client.endpoints.endpoints] == [True, False, True]
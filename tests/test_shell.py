@@ -0,0 +1,85 @@
+import pytest
+import requests
+from click.testing import CliRunner
+
+from garden import cli
+from garden.client import GardenClient
+
+
+def response(body=b'[]', status=200):
+    page = requests.Response()
+    page.status_code = status
+    page._content = body
+    page._content_consumed = True
+    return page
+
+
+class Session:
+    """Answers every request with an empty list, except paths listed in `failing`, which raise."""
+
+    built = []
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self.sent = []
+        self.failing = set()
+        Session.built.append(self)
+
+    def request(self, method, url, **kwargs):
+        self.sent.append(url)
+        if any(path in url for path in self.failing):
+            raise requests.ConnectionError(f'{url} refused')
+        return response()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def garden(monkeypatch, tmp_path):
+    monkeypatch.setenv('GARDEN_CONFIG', str(tmp_path / 'none.ini'))
+    client = GardenClient('http://garden.test')
+    monkeypatch.setattr(cli, 'client', client)
+    monkeypatch.setattr(client, '_build_session', lambda: Session(client.pool_size))
+    Session.built = []
+
+    def run(*lines, args=()):
+        return CliRunner().invoke(cli.cli, ['--api-url', 'http://garden.test', '--no-cache', *args, 'shell'],
+                                  input=''.join(line + '\n' for line in lines))
+    run.client = client
+    return run
+
+
+def test_one_session_for_the_whole_shell(garden):
+    result = garden('list-actions', 'list-workers', 'list-actions')
+    assert result.exit_code == 0, result.output
+    assert len(Session.built) == 1 and len(Session.built[0].sent) == 3
+
+
+def test_connection_options_typed_in_the_shell_stay_in_effect(garden):
+    result = garden('--pool-size 20 list-actions', 'list-actions', '--read-timeout 3 list-actions', 'list-actions',
+                    args=['--pool-size', '5', '--connect-timeout', '2'])
+    assert result.exit_code == 0, result.output
+    assert [session.pool_size for session in Session.built] == [20]  # Only the pool size change rebuilt the session
+    assert garden.client.pool_size == 20
+    assert (garden.client.connect_timeout, garden.client.read_timeout) == (2, 3)
+    assert garden.client.base_url == 'http://garden.test'
+
+
+def test_shell_keeps_going_after_failed_commands(garden, monkeypatch):
+    monkeypatch.setattr(cli.client.retry, 'retries', 0)
+    build = cli.client._build_session
+
+    def refusing_workers():
+        session = build()
+        session.failing = {'/workers/'}
+        return session
+    monkeypatch.setattr(cli.client, '_build_session', refusing_workers)
+    result = garden('list-workers', 'no-such-command', 'list-plants --limit x', "list-plants 'unclosed", 'shell', 'list-actions')
+    assert result.exit_code == 0
+    assert 'Error: ConnectionError: http://garden.test/workers/' in result.output
+    assert "No such command 'no-such-command'" in result.output
+    assert "Invalid value for '--limit'" in result.output
+    assert 'Error: No closing quotation' in result.output
+    assert 'Already in the Garden shell.' in result.output
+    assert Session.built[0].sent[-1].startswith('http://garden.test/actions/')  # The last line still ran
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+import pytest
+
+# Imported only by the commands that use them, see benchmarks/startup.py
+LAZY_MODULES = ['requests', 'urllib3', 'yaml', 'tabulate', 'sqlite3', 'asyncio', 'concurrent.futures']
+
+CHECK = f"""
+import sys
+from garden.cli import cli
+try:
+    cli(sys.argv[1:], prog_name='garden')
+except SystemExit:
+    pass
+print(' '.join(name for name in {LAZY_MODULES!r} if name in sys.modules), file=sys.stderr)
+"""
+
+
+@pytest.mark.parametrize('args', [['--help'], ['start', '--help'], ['list-plants', '--help'], ['record', '--help']])
+def test_help_imports_no_heavy_dependencies(args):
+    # A fresh interpreter: this one has already imported everything the other tests use
+    result = subprocess.run([sys.executable, '-c', CHECK, *args], capture_output=True, text=True, check=True)
+    assert 'Usage: garden' in result.stdout
+    assert result.stderr.strip() == ''
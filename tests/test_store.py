@@ -0,0 +1,115 @@
+import sqlite3
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from garden.store import STOP_AFTER, FleetStore
+
+
+def worker(worker_id, since, plant_ids=()):
+    picks = [{'plant_id': plant_id, 'paths': [f'p{plant_id}.a', f'p{plant_id}.b']} for plant_id in plant_ids]
+    return {'id': worker_id, 'name': f'worker-{worker_id}', 'resume': 'ON', 'since': since, 'package': {'picks': picks}}
+
+
+class Server:
+    """Serves a collection the way the API does, honouring since__gte and ordering; counts the entries it sends."""
+
+    def __init__(self, entries, sorts=True):
+        self.entries = {entry['id']: entry for entry in entries}
+        self.sorts = sorts
+        self.paths = []
+        self.sent = 0
+
+    def fetch(self, path):
+        self.paths.append(path)
+        query = dict(parse_qsl(urlsplit(path).query, keep_blank_values=True))
+        entries = list(self.entries.values())
+        if self.sorts and 'ordering' in query:
+            entries.sort(key=lambda entry: entry['since'], reverse=True)
+        for entry in entries:
+            self.sent += 1
+            yield entry
+
+
+@pytest.fixture
+def store(tmp_path):
+    with FleetStore(str(tmp_path / 'fleet.sqlite3')) as store:
+        yield store
+
+
+def test_first_sync_is_full(store):
+    server = Server([worker(1, '2024-01-01', [10]), worker(2, '2024-01-02', [10, 11])])
+    assert store.sync_state('workers') is None
+    assert store.sync('workers', server.fetch) == (2, 0, True)
+    assert server.paths == ['/workers/']
+    assert store.sync_state('workers')[0] == '2024-01-02'
+    assert [entry['id'] for entry in store.iter_items('workers')] == [1, 2]
+    assert store.get('workers', 2) == server.entries[2]
+
+
+def test_incremental_sync_stops_at_the_cursor(store):
+    server = Server([worker(n, f'2024-01-{n:02}') for n in range(1, 29)] + [worker(n, f'2023-06-{n - 28:02}') for n in range(29, 59)])
+    store.sync('workers', server.fetch)
+    server.entries[100] = worker(100, '2024-02-01', [7])
+    server.entries[3] = worker(3, '2024-02-02', [7])
+    server.sent = 0
+
+    written, removed, full = store.sync('workers', server.fetch)
+    assert not full and removed == 0
+    assert server.paths[-1] == '/workers/?since__gte=2024-01-28&ordering=-since'
+    # The two changes, the entry at the cursor, then STOP_AFTER + 1 older ones before giving up
+    assert server.sent == 2 + 1 + STOP_AFTER + 1
+    assert written == server.sent - 1
+    assert store.sync_state('workers')[0] == '2024-02-02'
+    assert {use['worker_id'] for use in store.who_uses([7])} == {3, 100}
+
+
+def test_incremental_sync_reads_everything_from_servers_that_do_not_sort(store):
+    server = Server([worker(n, f'2024-01-{n:02}') for n in range(1, 29)], sorts=False)
+    store.sync('workers', server.fetch)
+    server.sent = 0
+    store.sync('workers', server.fetch)
+    assert server.sent == 28
+
+
+def test_full_sync_drops_entries_the_server_no_longer_has(store):
+    server = Server([worker(1, '2024-01-01', [5]), worker(2, '2024-01-02', [5])])
+    store.sync('workers', server.fetch)
+    del server.entries[1]
+    assert store.sync('workers', server.fetch)[1] == 0  # Incremental syncs don't see deletions
+    assert store.sync('workers', server.fetch, full=True) == (1, 1, True)
+    assert [entry['id'] for entry in store.iter_items('workers')] == [2]
+    assert [use['worker_id'] for use in store.who_uses([5])] == [2]
+
+
+def test_who_uses_and_put(store):
+    store.sync('workers', Server([worker(1, '2024-01-01', [5, 6]), worker(2, '2024-01-02', [6])]).fetch)
+    assert store.who_uses([6]) == [
+        {'plant_id': 6, 'worker_id': 1, 'worker': 'worker-1', 'resume': 'ON', 'pick': 2, 'paths': ['p6.a', 'p6.b']},
+        {'plant_id': 6, 'worker_id': 2, 'worker': 'worker-2', 'resume': 'ON', 'pick': 1, 'paths': ['p6.a', 'p6.b']},
+    ]
+    store.put('workers', worker(2, '2024-01-02', [5]))
+    assert [use['worker_id'] for use in store.who_uses([6])] == [1]
+    assert [use['worker_id'] for use in store.who_uses([5])] == [1, 2]
+
+
+def test_who_uses_takes_more_ids_than_sqlite_has_variables(store):
+    store.sync('workers', Server([worker(1, '2024-01-01', [5, 39_999]), worker(2, '2024-01-02', [40_000])]).fetch)
+    uses = store.who_uses(range(1, 40_001))
+    assert [(use['plant_id'], use['worker_id'], use['paths']) for use in uses] == [
+        (5, 1, ['p5.a', 'p5.b']), (39_999, 1, ['p39999.a', 'p39999.b']), (40_000, 2, ['p40000.a', 'p40000.b'])]
+    assert store.who_uses([]) == []
+
+
+def test_iter_items_narrows_on_indexed_columns(store):
+    entries = [dict(worker(1, '2024-01-01'), resume='OFF'), worker(2, '2024-01-02'), worker(3, '2024-01-03')]
+    store.sync('workers', Server(entries).fetch)
+    assert [entry['id'] for entry in store.iter_items('workers', [('resume', 'ON')])] == [2, 3]
+    assert [entry['id'] for entry in store.iter_items('workers', [('unindexed', 'x')])] == [1, 2, 3]
+
+
+def test_context_manager_closes(tmp_path):
+    with FleetStore(str(tmp_path / 'fleet.sqlite3')) as store:
+        pass
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.sync_state('workers')
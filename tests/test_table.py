@@ -0,0 +1,95 @@
+import random
+from itertools import islice
+
+import click
+import pytest
+from tabulate import tabulate
+
+from garden.table import iter_plain_table, iter_sampled_table
+
+VALUES = [
+    0, 7, -12, 123456, 3.5, -0.25, 1e-07, 2.0, float('nan'), True, False, None, '',
+    '42', '007', '3.14', '1,234', '1,234.5', '-8', 'inf', 'True', 'DOWN', 'plant-00001', 'x y', '  padded ',
+    'ünïcödé', '2024-06-25T22:06:00+00:00',
+]
+COLORS = [None, lambda value: 'red', lambda value: 'cyan' if str(value).startswith('p') else None]
+
+
+def tabulate_plain(rows, headers, colalign, colors):
+    styled = [[click.style(str(value), fg=style(value)) if style else value for value, style in zip(row, colors)]
+              for row in rows]
+    return tabulate(styled, headers, tablefmt='plain', colalign=colalign)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_matches_tabulate(seed):
+    rng = random.Random(seed)
+    ncols = rng.randint(1, 5)
+    # Columns mostly of one kind, as in real listings, with the odd stray value
+    kinds = [rng.sample(VALUES, rng.randint(1, 4)) for _ in range(ncols)]
+    rows = [[rng.choice(kinds[column]) for column in range(ncols)] for _ in range(rng.randint(0, 12))]
+    headers = [f'H{column}' * rng.randint(0, 3) for column in range(ncols)] if rng.random() < 0.8 else []
+    colors = [rng.choice(COLORS) for _ in range(ncols)]
+    colalign = tuple(rng.choice(['left', 'right', 'center', 'decimal']) for _ in range(ncols)) if rng.random() < 0.3 else None
+    if not rows and not headers:
+        return
+
+    expected = tabulate_plain(rows, headers, colalign, colors)
+    assert '\n'.join(iter_plain_table(rows, headers, colalign, colors)) == expected
+
+
+def test_listing_layout():
+    rows = [[1, 'plant-00001', 2, 33, 'DOWN'], [12, 'plant-00012', 10, 7, 'ONLINE']]
+    headers = ['ID', 'NAME', 'WORKERS', 'FIELDS', 'STATUS']
+    colors = [None, None, None, None, {'DOWN': 'red', 'ONLINE': 'cyan'}.get]
+    assert '\n'.join(iter_plain_table(rows, headers, colors=colors)) == tabulate_plain(rows, headers, None, colors)
+
+
+def test_multiline_cells_fall_back_to_tabulate():
+    rows = [['a\nb', 1], ['c', 22]]
+    assert '\n'.join(iter_plain_table(rows, ['X', 'Y'])) == tabulate(rows, ['X', 'Y'], tablefmt='plain')
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_sampled_table_within_the_sample_is_exact(seed):
+    rng = random.Random(seed)
+    rows = [[rng.choice(VALUES) for _ in range(3)] for _ in range(rng.randint(0, 20))]
+    colors = [rng.choice(COLORS) for _ in range(3)]
+    expected = list(iter_plain_table(rows, ['A', 'B', 'C'], colors=colors))
+    assert list(iter_sampled_table(iter(rows), ['A', 'B', 'C'], colors=colors, sample=20)) == expected
+
+
+def test_sampled_table_writes_before_the_last_row():
+    consumed = []
+
+    def rows():
+        for n in range(1, 100):
+            consumed.append(n)
+            yield [n, f'plant-{n}']
+
+    lines = iter_sampled_table(rows(), ['ID', 'NAME'], sample=10)
+    assert next(lines) == '  ID  NAME'
+    assert len(consumed) == 11  # The sample and the row that shows there is more
+    assert list(islice(lines, 10)) == list(iter_plain_table([[n, f'plant-{n}'] for n in range(1, 11)], ['ID', 'NAME']))[1:]
+    assert next(lines) == '  11  plant-11'
+    assert len(list(lines)) == 88
+
+
+def test_sampled_table_widens_columns_that_overflow():
+    rows = [[1, 'a', 'DOWN'], [22, 'b', 'ONLINE'], [333, 'c', 'DOWN'], [4, 'dd', 'STOP'], [55555, 'e', 'DOWN']]
+    colors = [None, None, {'DOWN': 'red'}.get]
+    lines = [click.unstyle(line) for line in iter_sampled_table(rows, ['ID', 'N', 'S'], colors=colors, sample=2)]
+    assert lines == [
+        '  ID  N    S',
+        '   1  a    DOWN',
+        '  22  b    ONLINE',
+        ' 333  c    DOWN',
+        '   4  dd   STOP',
+        '55555  e    DOWN',
+    ]
+
+
+def test_sampled_table_keeps_the_sample_decimal_alignment():
+    rows = [[1.5, 'a'], [2.25, 'b'], [3.125, 'c'], [10, 'd']]
+    # Later numbers line up on the point as far as the sample's digits allow, widening the column if they must
+    assert list(iter_sampled_table(rows, ['X', 'Y'], sample=2)) == ['   X  Y', '1.5   a', '2.25  b', '3.125  c', '10     d']
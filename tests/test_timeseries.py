@@ -0,0 +1,142 @@
+import math
+
+import pytest
+
+from garden.timeseries import BLOCK, MAX_DELTA, MISSING, SeriesReader, SeriesWriter, parse_duration, parse_time, windows
+
+
+def write(directory, samples):
+    writer = SeriesWriter(str(directory))
+    for timestamp, values in samples:
+        writer.append(timestamp, values)
+    writer.close()
+
+
+def read_times(directory, start=None, end=None):
+    reader = SeriesReader(str(directory))
+    try:
+        first, times = reader.timestamps(start, end)
+        return first, list(times)
+    finally:
+        reader.close()
+
+
+def test_round_trip(tmp_path):
+    samples = [(1000 + 250 * n, {'temp': 20.5 + n, 'state': 'ON' if n % 2 else 'OFF'}) for n in range(10)]
+    samples[3][1].pop('temp')
+    samples[4] = (samples[4][0], {'temp': 1, 'state': None, 'late': 'x'})
+    write(tmp_path, samples)
+
+    reader = SeriesReader(str(tmp_path))
+    assert reader.count == 10
+    assert list(reader.timestamps()[1]) == [timestamp for timestamp, _ in samples]
+    temps = list(reader.column('temp'))
+    assert math.isnan(temps[3]) and temps[4] == 1.0 and temps[9] == 29.5
+    strings = reader.strings('state')
+    assert [None if code == MISSING else strings[code] for code in reader.column('state')][:6] == \
+        ['OFF', 'ON', 'OFF', 'ON', None, 'ON']
+    assert [code == MISSING for code in reader.column('late')] == [True] * 4 + [False] + [True] * 5
+    with pytest.raises(KeyError):
+        reader.column('nope')
+    reader.close()
+
+
+def test_reopened_series_appends(tmp_path):
+    write(tmp_path, [(1000, {'a': 1})])
+    write(tmp_path, [(2000, {'a': 2, 'b': 'x'})])
+    reader = SeriesReader(str(tmp_path))
+    assert list(reader.timestamps()[1]) == [1000, 2000]
+    assert list(reader.column('a')) == [1.0, 2.0]
+    assert reader.strings('b') == ['x']
+    reader.close()
+
+
+def test_unflushed_appends_are_cut_off(tmp_path):
+    writer = SeriesWriter(str(tmp_path))
+    writer.append(1000, {'a': 1})
+    writer.flush()
+    writer.append(2000, {'a': 2})
+    for f in writer._files.values():
+        f.close()
+    writer._lock.close()  # Dies without flushing
+    write(tmp_path, [(3000, {'a': 3})])
+    reader = SeriesReader(str(tmp_path))
+    assert list(reader.timestamps()[1]) == [1000, 3000]
+    assert list(reader.column('a')) == [1.0, 3.0]
+    reader.close()
+
+
+def test_strings_are_appended_not_rewritten(tmp_path):
+    writer = SeriesWriter(str(tmp_path))
+    writer.append(1000, {'state': 'ON'})
+    writer.flush()
+    manifest = (tmp_path / 'series.json').read_text()
+    writer.append(2000, {'state': 'ON'})
+    writer.flush()
+    assert (tmp_path / 'series.json').read_text().replace('2000', '1000').replace('"count": 2', '"count": 1') == manifest
+    writer.append(3000, {'state': 'line\nbreak'})
+    writer.append(4000, {'state': 'OFF'})  # Never flushed
+    for f in writer._files.values():
+        f.close()
+    writer._lock.close()
+
+    write(tmp_path, [(5000, {'state': 'DOWN'})])
+    reader = SeriesReader(str(tmp_path))
+    strings = reader.strings('state')
+    assert strings == ['ON', 'DOWN'] and [strings[code] for code in reader.column('state')] == ['ON', 'ON', 'DOWN']
+    reader.close()
+
+
+def test_numeric_strings_make_a_numeric_field(tmp_path):
+    write(tmp_path, [(1000, {'level': '12.5', 'state': 'ON', 'flag': True}), (2000, {'level': 3, 'state': '7', 'flag': 'n/a'})])
+    reader = SeriesReader(str(tmp_path))
+    assert {name: field['type'] for name, field in reader.fields.items()} == {'level': 'f64', 'state': 'text', 'flag': 'f64'}
+    assert list(reader.column('level')) == [12.5, 3.0] and reader.strings('level') is None
+    assert reader.strings('state') == ['ON', '7']
+    assert math.isnan(reader.column('flag')[1])
+    reader.close()
+
+
+def test_ranges_across_blocks(tmp_path):
+    times = [n * 10 for n in range(BLOCK * 2 + 5)] + [BLOCK * 100 + MAX_DELTA + 1]  # Full blocks, then a gap too long for a delta
+    write(tmp_path, [(timestamp, {}) for timestamp in times])
+    assert read_times(tmp_path) == (0, times)
+    assert read_times(tmp_path, 40995, 41010) == (4100, [41000, 41010])
+    assert read_times(tmp_path, times[-1]) == (len(times) - 1, [times[-1]])
+    assert read_times(tmp_path, end=-1) == (0, [])
+
+
+def test_backwards_clock_is_clamped(tmp_path):
+    write(tmp_path, [(timestamp, {'v': timestamp}) for timestamp in (1000, 2000, 3000, 500, 600, 4000)])
+    assert read_times(tmp_path) == (0, [1000, 2000, 3000, 3000, 3000, 4000])
+    first, times = read_times(tmp_path, 1500)
+    assert (first, times) == (1, [2000, 3000, 3000, 3000, 4000])
+    reader = SeriesReader(str(tmp_path))
+    assert list(reader.column('v'))[first:first + len(times)] == [2000, 3000, 500, 600, 4000]
+    reader.close()
+
+
+def test_second_writer_is_refused(tmp_path):
+    writer = SeriesWriter(str(tmp_path))
+    try:
+        with pytest.raises(OSError):
+            SeriesWriter(str(tmp_path))
+    finally:
+        writer.close()
+
+
+def test_windows():
+    times = [0, 400, 999, 1000, 3500]
+    values = [1.0, 3.0, math.nan, math.nan, 5.0]
+    assert list(windows(times, values, 1000)) == [(0, 2, 1.0, 3.0, 2.0), (3000, 1, 5.0, 5.0, 5.0)]
+
+
+def test_parse_duration_and_time():
+    assert parse_duration('90s') == 90 and parse_duration('1.5h') == 5400 and parse_duration('250ms') == 0.25
+    assert parse_time('2m', now=1000) == 880_000
+    assert parse_time('1970-01-01T00:00:01+00:00') == 1000
+    for bad in ('', '5', 'soon', '5y'):
+        with pytest.raises(ValueError):
+            parse_duration(bad)
+    with pytest.raises(ValueError):
+        parse_time('yesterday')
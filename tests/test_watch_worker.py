@@ -0,0 +1,82 @@
+import json
+
+import pytest
+import requests
+from click.testing import CliRunner
+
+from garden import cli
+from garden.client import GardenClient
+
+PLANTS = [{'id': n, 'name': f'plant-{n}', 'status': 1, 'collect': n % 2} for n in range(1, 31)]
+
+
+def response(body, status=200):
+    page = requests.Response()
+    page.status_code = status
+    page._content = json.dumps(body).encode()
+    page._content_consumed = True
+    return page
+
+
+class Server:
+    """Answers /plants/ (unpaginated), /plants/<id>/ and /workers/1/, recording the paths asked for."""
+
+    def __init__(self, listing_status=200):
+        self.listing_status = listing_status
+        self.paths = []
+
+    def request(self, method, url, **kwargs):
+        path = url[len('http://garden.test'):]
+        self.paths.append(path)
+        if path.startswith('/plants/?'):
+            return response(PLANTS, self.listing_status)
+        if path.startswith('/plants/'):
+            plant_id = int(path.split('/')[2])
+            plants = [plant for plant in PLANTS if plant['id'] == plant_id]
+            return response(plants[0]) if plants else response({'detail': 'Not found.'}, 404)
+        if path == '/workers/1/':
+            picks = [{'plant_id': plant_id, 'paths': [f'p{plant_id}']} for plant_id in (1, 2, 2, 99)]
+            return response({'name': 'w', 'description': '', 'package': {'description': '', 'picks': picks}})
+        return response({}, 404)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    def serve(**kwargs):
+        server = Server(**kwargs)
+        client = GardenClient('http://garden.test')
+        client.retry.retries = 0
+        monkeypatch.setattr(client, '_get_session', lambda: server)
+        monkeypatch.setattr(cli, 'client', client)
+        return server
+    return serve
+
+
+def test_few_plants_are_fetched_one_by_one(server):
+    server = server()
+    plants = cli.fetch_plants([3, 1, 3, 99], bulk_threshold=3)
+    assert {plant_id: plant and plant['name'] for plant_id, plant in plants.items()} == {3: 'plant-3', 1: 'plant-1', 99: None}
+    assert sorted(server.paths) == ['/plants/1/', '/plants/3/', '/plants/99/']
+
+
+def test_many_plants_come_from_one_listing(server):
+    server = server()
+    plants = cli.fetch_plants(list(range(1, 11)) + [99], bulk_threshold=3)
+    assert [plant and plant['id'] for plant in plants.values()] == list(range(1, 11)) + [None]
+    assert len(server.paths) == 1 and server.paths[0].startswith('/plants/?limit=')
+
+
+def test_failed_listing_falls_back_to_single_lookups(server):
+    server = server(listing_status=500)
+    plants = cli.fetch_plants([1, 2, 3, 4], bulk_threshold=3)
+    assert [plant['id'] for plant in plants.values()] == [1, 2, 3, 4]
+    assert server.paths[0].startswith('/plants/?') and sorted(server.paths[1:]) == [f'/plants/{n}/' for n in (1, 2, 3, 4)]
+
+
+@pytest.mark.parametrize('threshold, lookups', [(5, 3), (2, 1)])
+def test_watch_worker_looks_each_plant_up_once(server, threshold, lookups):
+    server = server()
+    result = CliRunner().invoke(cli.watch_worker, ['1', '--bulk-threshold', str(threshold)])
+    assert result.exit_code == 0, result.output
+    assert result.output.count('plant-2') == 2 and 'NOT FOUND' in result.output
+    assert len([path for path in server.paths if path.startswith('/plants/')]) == lookups